@@ -1,29 +1,21 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, Header, Request, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from decimal import Decimal
 
-from app.core.database import SessionLocal
-from app.api.deps import get_db
-from app.services.checkout_service import CheckoutService
+from app.api.deps import get_async_db
+from app.services.payment_queue import PaymentQueue
 from app.services.security_services import SecurityService
 from app.services.router_services import RouterService
-from app.models.app_models import User
+from app.services.credential_cache import merchant_credentials
 
 router = APIRouter()
 
-async def run_background_orchestrator(tx_id: str, provider: str, destination: str, amount: Decimal):
-    # Isolated session for background tasks to avoid thread-safety issues
-    with SessionLocal() as db:
-        service = CheckoutService(db)
-        await service.process_with_retry(tx_id, provider, destination, amount)
-
 @router.post("")
 async def create_checkout(
     request: Request,
-    background_tasks: BackgroundTasks, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_signature: str = Header(...)
 ):
     body = await request.json()
@@ -33,16 +25,16 @@ async def create_checkout(
     if not merchant_id:
         raise HTTPException(status_code=400, detail="merchant_id is required")
 
-    # 1. Look for the merchant in the UNIFIED 'users' table
+    # 1. Look for the merchant in the UNIFIED 'users' table (cached credentials)
     # We check for role='merchant' to ensure an admin isn't accidentally used as a merchant
-    merchant = db.query(User).filter(
-        User.id == merchant_id, 
-        User.role == "merchant"
-    ).first()
+    merchant = await merchant_credentials.get_merchant(db, merchant_id)
 
-    if not merchant:
+    if not merchant or merchant.role != "merchant":
         raise HTTPException(status_code=404, detail="Merchant not found or invalid role")
 
+    if not merchant.is_active:
+        raise HTTPException(status_code=403, detail="Merchant account is inactive")
+
     # 2. Verify Signature using the unified table's hashed key
     # Ensure your SecurityService.verify_signature handles the hashed comparison correctly
     SecurityService.verify_signature(
@@ -58,7 +50,7 @@ async def create_checkout(
     tx_id = f"KP-{uuid.uuid4().hex[:8].upper()}"
     try:
         # Note: Ensure ledger.transactions table has a foreign key pointing to ledger.users(id)
-        db.execute(text("""
+        await db.execute(text("""
             INSERT INTO ledger.transactions (id, merchant_id, amount, provider, status, destination)
             VALUES (:id, :m_id, :amount, :provider, 'PENDING', :dest)
         """), {
@@ -68,21 +60,14 @@ async def create_checkout(
             "provider": provider_type, 
             "dest": destination
         })
-        db.commit()
+        # 5. Queue the provider push in the same commit, so it survives restarts
+        await db.run_sync(PaymentQueue.enqueue, tx_id, provider_type, destination, amount)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"CRITICAL: Transaction Init Failed: {e}")
         raise HTTPException(status_code=500, detail="Internal processing error")
 
-    # 5. Offload to background orchestrator
-    background_tasks.add_task(
-        run_background_orchestrator, 
-        tx_id, 
-        provider_type, 
-        destination, 
-        amount
-    )
-
     return {
         "status": "processing",
         "tx_ref": tx_id,
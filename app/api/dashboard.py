@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import secrets
 import hashlib
-from app.api.deps import get_db
-from app.auth.router import get_current_user
+from app.api.deps import get_db, get_async_db, get_reporting_db, get_current_user, get_current_principal, Principal
 from app.models.app_models import User
+from app.core.metrics import metrics
+from app.core.http_cache import validator_headers, is_not_modified, not_modified_response
+from app.services.credential_cache import merchant_credentials
+from app.services.merchant_stats import MerchantStatsService
+from app.services.platform_rollups import PlatformRollups
+from app.services.payment_link_cache import payment_links
 
 router = APIRouter()
 
@@ -14,35 +20,23 @@ router = APIRouter()
 
 @router.get("/api/merchant/stats")
 async def get_merchant_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user) # Now returns a User object
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    # 1. Available Balance (Now directly on the User object!)
-    balance = current_user.balance or 0
-
-    # 2. Today's Sales (Querying transactions table)
-    sales_query = text("""
-        SELECT SUM(amount) FROM ledger.transactions 
-        WHERE merchant_id = :mid AND status = 'SUCCESS' 
-        AND created_at >= CURRENT_DATE
-    """)
-    sales = db.execute(sales_query, {"mid": current_user.id}).scalar() or 0
-
-    # 3. Success Rate
-    rate_query = text("""
-        SELECT 
-            COUNT(*) FILTER (WHERE status = 'SUCCESS')::float / 
-            NULLIF(COUNT(*), 0) * 100
-        FROM ledger.transactions WHERE merchant_id = :mid
-    """)
-    rates = db.execute(rate_query, {"mid": current_user.id}).scalar() or 0
+    # 1. Available Balance (fresh read; the cached principal doesn't carry it)
+    balance = (await db.execute(
+        text("SELECT balance FROM ledger.users WHERE id = :mid"), {"mid": current_user.id}
+    )).scalar() or 0
+
+    # 2. Today's Sales, Success Rate and Provider Split (maintained counters, no scan)
+    stats = await MerchantStatsService.read(db, current_user.id)
 
     return {
         "business_name": current_user.business_name,
         "balance": float(balance),
-        "sales": float(sales),
-        "success_rate": round(rates, 1) if rates else 0,
-        "provider_split": {"Airtel": 70, "TNM": 30}
+        "sales": stats["sales"],
+        "success_rate": stats["success_rate"],
+        "provider_split": stats["provider_split"]
     }
 
 @router.post("/api/merchant/generate-keys")
@@ -59,6 +53,7 @@ async def generate_keys(
     current_user.api_key_hashed = hashed_secret # Fixed column name
     
     db.commit()
+    merchant_credentials.invalidate(current_user.id)
     
     return {
         "public_key": new_public_key,
@@ -69,22 +64,17 @@ async def generate_keys(
 
 @router.get("/api/admin/stats")
 async def get_admin_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_reporting_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     if current_user.role not in ["admin", "super_admin"]:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    # 1. Total Volume (Sum of all successful transactions)
-    volume = db.execute(text(
-        "SELECT SUM(amount) FROM ledger.transactions WHERE status = 'SUCCESS'"
-    )).scalar() or 0
-
-    # 2. System Health (Check if any transactions failed in the last hour)
-    recent_fails = db.execute(text("""
-        SELECT COUNT(*) FROM ledger.transactions 
-        WHERE status = 'FAILED' AND created_at > NOW() - INTERVAL '1 hour'
-    """)).scalar() or 0
+    # 1. Total Volume and 2. System Health (failures in the last hour),
+    # both from the platform rollups rather than scanning ledger.transactions
+    rollup = PlatformRollups.admin_stats(db)
+    volume = rollup["volume"]
+    recent_fails = rollup["recent_fails"]
     
     health_status = "Optimal" if recent_fails < 5 else "Degraded"
 
@@ -93,12 +83,19 @@ async def get_admin_dashboard_stats(
         "system_health": health_status
     }
 
+@router.get("/api/admin/metrics")
+async def get_admin_metrics(current_user: Principal = Depends(get_current_principal)):
+    """Process-local metrics: DB pool occupancy, checkout waits, connection ages."""
+    if current_user.role not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    return metrics.snapshot()
 
 @router.post("/api/merchant/create-link")
 async def create_payment_link(
     data: dict, 
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     short_code = secrets.token_urlsafe(6)
     
@@ -120,15 +117,20 @@ async def create_payment_link(
     return {"url": f"https://kwikpesa.onrender.com/pay/{short_code}"}
 
 @router.get("/payment/{short_code}", response_class=HTMLResponse)
-async def checkout_page(short_code: str, db: Session = Depends(get_db)):
-    # 1. Look up the link details from the DB
-    link = db.execute(text("SELECT * FROM ledger.payment_links WHERE short_code = :c"), {"c": short_code}).fetchone()
+async def checkout_page(short_code: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # 1. Look up the link details (shared short-code cache with /pay/{short_code})
+    link = await payment_links.resolve(db, short_code)
     
     if not link:
         return "<h1>Link Not Found</h1>"
 
+    etag = f'"{link.version}"'
+    headers = validator_headers(etag, cache_control="public, no-cache")
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+
     # 2. Return a simple, mobile-friendly HTML page
-    return f"""
+    return HTMLResponse(headers=headers, content=f"""
     <html>
         <head>
             <meta name="viewport" content="width=device-width, initial-scale=1">
@@ -166,4 +168,4 @@ async def checkout_page(short_code: str, db: Session = Depends(get_db)):
             </script>
         </body>
     </html>
-    """
\ No newline at end of file
+    """)
@@ -1,17 +1,20 @@
-from typing import Generator
+import uuid
+from dataclasses import dataclass
+from typing import Generator, AsyncGenerator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from app.core.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import SessionLocal, ReportingSessionLocal, AsyncSessionLocal
 from app.models.app_models import User
-import os
+from app.models.auth_utils import SECRET_KEY, ALGORITHM
+from app.core.cache import TTLCache
+from app.config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-SECRET_KEY = os.getenv("SECRET_KEY", "KWACHAPOINT_SUPER_SECRET_KEY_2026")
-ALGORITHM = "HS256"
-
 def get_db() -> Generator:
     db = SessionLocal()
     try:
@@ -19,10 +22,39 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-async def get_current_user(
+def get_reporting_db() -> Generator:
+    """Session on the reporting pool (replica when DATABASE_REPORTING_URL is set)."""
+    db = ReportingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller: just what authorization checks need."""
+    id: uuid.UUID
+    email: str
+    role: str
+    is_verified: bool
+    is_active: bool
+    business_name: Optional[str] = None
+
+
+_principals = TTLCache("principals", settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+
+def invalidate_principal(user_id):
+    _principals.pop(str(user_id))
+
+async def get_current_principal(
     token: str = Depends(oauth2_scheme), 
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """Validates the JWT and resolves the caller, from cache when possible."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials. Please log in again.",
@@ -31,20 +63,55 @@ async def get_current_user(
     
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
+        user_id: str = payload.get("user_id")
+        email: str = payload.get("sub")
         
-        if user_id is None:
+        if user_id is None and email is None:
             raise credentials_exception
             
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == user_id).first()
-    
-    if user is None:
-        raise credentials_exception
+    # Tokens carry user_id; older ones only have the email in 'sub'
+    cache_key = user_id or email
+    principal = _principals.get(cache_key)
+
+    if principal is None:
+        row = (await db.execute(text(f"""
+            SELECT id, email, role, is_verified, is_active, business_name
+            FROM ledger.users WHERE {"id" if user_id else "email"} = :key
+        """), {"key": cache_key})).fetchone()
+
+        if row is None:
+            raise credentials_exception
+
+        principal = Principal(
+            id=row.id,
+            email=row.email,
+            role=row.role,
+            is_verified=bool(row.is_verified),
+            is_active=bool(row.is_active),
+            business_name=row.business_name
+        )
+        _principals.set(cache_key, principal)
         
-    if not user.is_active:
+    if not principal.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+
+    if not principal.is_verified:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account not verified")
+        
+    return principal
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+) -> User:
+    """Loads the full ORM User. Only for handlers that read or change User columns."""
+    user = db.get(User, principal.id)
+    
+    if user is None:
+        invalidate_principal(principal.id)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User no longer exists")
         
     return user
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_current_principal, Principal
+from app.services.transaction_export import TransactionExport
+
+router = APIRouter()
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv_chunks"),
+    "ndjson": ("application/x-ndjson", "ndjson_chunks"),
+}
+
+@router.get("/api/merchant/transactions/export")
+def export_transactions(
+    format: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Streams the merchant's transactions as CSV or NDJSON.
+
+    `status` takes a comma-separated list, e.g. SUCCESS,FAILED.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    statuses = [s.strip().upper() for s in status.split(",") if s.strip()] if status else None
+    export = TransactionExport(current_user.id, start, end, statuses)
+    media_type, chunks = EXPORT_FORMATS[format]
+
+    # A sync generator: Starlette pulls it in the threadpool, one chunk at a time
+    return StreamingResponse(
+        getattr(export, chunks)(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=transactions.{format}"}
+    )
@@ -1,16 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+import csv
+from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+from datetime import date
+import io
+from typing import List, Optional
+from sqlalchemy import text
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
-from app.models.app_models import User
+from app.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.pagination import Keyset
+from app.services.invoice_pdf import invoice_pdfs
+from app.services.invoice_import import InvoiceImport
 import uuid
-from fpdf import FPDF
 
 router = APIRouter(prefix="/api/invoices", tags=["Invoice"])
 
 @router.get("/dashboard-stats")
-def get_invoice_stats(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
-    stats = db.execute("""
+def get_invoice_stats(
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    db: Session = Depends(deps.get_db),
+    current_user: deps.Principal = Depends(deps.get_current_principal)
+):
+    # The stats aggregate already visits every invoice, so the list total rides along
+    stats = db.execute(text("""
         SELECT 
+            COUNT(*) as total_count,
             COALESCE(SUM(total_amount), 0) as total_invoiced,
             COUNT(CASE WHEN status = 'paid' THEN 1 END) as paid_count,
             COALESCE(SUM(CASE WHEN status = 'paid' THEN total_amount ELSE 0 END), 0) as paid_amount,
@@ -18,20 +35,24 @@ def get_invoice_stats(db: Session = Depends(deps.get_db), current_user: User = D
             COALESCE(SUM(CASE WHEN status = 'pending' THEN total_amount ELSE 0 END), 0) as pending_amount
         FROM ledger.invoices 
         WHERE merchant_id = :mid
-    """, {"mid": current_user.id}).fetchone()
+    """), {"mid": current_user.id}).fetchone()
 
-    result = db.execute("""
+    keyset = Keyset(cursor, limit)
+    result = db.execute(text(f"""
         SELECT 
             id, 
             invoice_number, 
             client_name, 
             total_amount, 
             status, 
-            issue_date 
+            issue_date,
+            created_at 
         FROM ledger.invoices 
-        WHERE merchant_id = :mid 
-        ORDER BY created_at DESC
-    """, {"mid": current_user.id}).fetchall()
+        WHERE merchant_id = :mid {keyset.where}
+        ORDER BY {keyset.order_by}
+        LIMIT :page_limit
+    """), {"mid": current_user.id, **keyset.params}).fetchall()
+    result, next_cursor, prev_cursor = keyset.page(result)
     
     invoices_list = [
         {
@@ -51,49 +72,43 @@ def get_invoice_stats(db: Session = Depends(deps.get_db), current_user: User = D
             "pending_count": stats.pending_count,
             "pending_amount": float(stats.pending_amount)
         },
-        "invoices": invoices_list
+        "invoices": invoices_list,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "total_count": stats.total_count
     }
 
 @router.post("/create")
-def create_invoice(data: dict, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
+def create_invoice(data: dict, db: Session = Depends(deps.get_db), current_user: deps.Principal = Depends(deps.get_current_principal)):
+    # Same path as bulk: invoice and all its items in two statements
+    result = InvoiceImport(db, current_user.id).run(InvoiceImport.from_payloads([data]))
+    if result["failed"]:
+        raise HTTPException(status_code=400, detail=result["errors"][0]["error"])
+    return {"status": "success", "message": "Invoice Created"}
+
+@router.post("/bulk")
+def create_invoices_bulk(data: List[dict], db: Session = Depends(deps.get_db), current_user: deps.Principal = Depends(deps.get_current_principal)):
+    """Creates many invoices (create_invoice shape); bad entries are reported, not fatal."""
+    return InvoiceImport(db, current_user.id).run(InvoiceImport.from_payloads(data))
+
+@router.post("/import")
+def import_invoices_csv(file: UploadFile = File(...), db: Session = Depends(deps.get_db), current_user: deps.Principal = Depends(deps.get_current_principal)):
+    """CSV import, one row per line item: invoice_number, client_name, client_email,
+    client_phone, issue_date, due_date, notes, description, quantity, rate.
+    """
+    # Read straight off the spooled upload; rows are parsed and written as they stream past
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
     try:
-        inv_query = """
-            INSERT INTO ledger.invoices (merchant_id, invoice_number, client_name, client_email, client_phone, issue_date, due_date, notes, total_amount)
-            VALUES (:mid, :num, :name, :email, :phone, :issue, :due, :notes, :total)
-            RETURNING id
-        """
-        inv_id = db.execute(inv_query, {
-            "mid": current_user.id,
-            "num": data['invoiceNumber'],
-            "name": data['clientName'],
-            "email": data['clientEmail'],
-            "phone": data['clientPhone'],
-            "issue": data['issueDate'],
-            "due": data['dueDate'],
-            "notes": data['notes'],
-            "total": sum(item['quantity'] * item['rate'] for item in data['items'])
-        }).fetchone()[0]
-
-        for item in data['items']:
-            db.execute("""
-                INSERT INTO ledger.invoice_items (invoice_id, description, quantity, rate, amount)
-                VALUES (:inv_id, :desc, :qty, :rate, :amt)
-            """, {
-                "inv_id": inv_id,
-                "desc": item['description'],
-                "qty": item['quantity'],
-                "rate": item['rate'],
-                "amt": item['quantity'] * item['rate']
-            })
-        
-        db.commit()
-        return {"status": "success", "message": "Invoice Created"}
-    except Exception as e:
-        db.rollback()
+        return InvoiceImport(db, current_user.id).run(InvoiceImport.from_csv(lines))
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8")
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV: {e}")
 
 @router.patch("/{invoice_id}/pay")
-def mark_invoice_as_paid(invoice_id: str, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
+def mark_invoice_as_paid(invoice_id: str, db: Session = Depends(deps.get_db), current_user: deps.Principal = Depends(deps.get_current_principal)):
     db.execute(
         "UPDATE ledger.invoices SET status = 'paid' WHERE id = :id AND merchant_id = :mid",
         {"id": invoice_id, "mid": current_user.id}
@@ -101,58 +116,68 @@ def mark_invoice_as_paid(invoice_id: str, db: Session = Depends(deps.get_db), cu
     db.commit()
     return {"message": "Invoice marked as paid"}
 
+async def _invoices_with_items(db: AsyncSession, invoices) -> list:
+    """Pairs invoice rows with their items in one query."""
+    if not invoices:
+        return []
+    items = (await db.execute(
+        text("SELECT * FROM ledger.invoice_items WHERE invoice_id = ANY(:ids)"),
+        {"ids": [inv["id"] for inv in invoices]}
+    )).mappings().fetchall()
+
+    by_invoice = {}
+    for item in items:
+        by_invoice.setdefault(item["invoice_id"], []).append(item)
+    return [(inv, by_invoice.get(inv["id"], [])) for inv in invoices]
+
 @router.get("/{invoice_id}/download")
-def download_invoice(invoice_id: str, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
-    invoice = db.execute(
-        "SELECT * FROM ledger.invoices WHERE id = :id AND merchant_id = :mid",
+async def download_invoice(invoice_id: str, db: AsyncSession = Depends(deps.get_async_db), current_user: deps.Principal = Depends(deps.get_current_principal)):
+    invoice = (await db.execute(
+        text("SELECT * FROM ledger.invoices WHERE id = :id AND merchant_id = :mid"),
         {"id": invoice_id, "mid": current_user.id}
-    ).fetchone()
-    
-    items = db.execute(
-        "SELECT * FROM ledger.invoice_items WHERE invoice_id = :id",
-        {"id": invoice_id}
-    ).fetchall()
+    )).mappings().fetchone()
 
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
 
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 16)
-    
-    pdf.cell(0, 10, f"INVOICE: {invoice.invoice_number}", ln=True)
-    pdf.set_font("Helvetica", "", 10)
-    pdf.cell(0, 10, f"Date: {invoice.issue_date} | Due: {invoice.due_date}", ln=True)
-    pdf.ln(10)
-
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 10, "Bill To:", ln=True)
-    pdf.set_font("Helvetica", "", 12)
-    pdf.cell(0, 10, f"{invoice.client_name}", ln=True)
-    pdf.cell(0, 10, f"Email: {invoice.client_email or 'N/A'}", ln=True)
-    pdf.ln(10)
-
-    pdf.set_fill_color(240, 240, 240)
-    pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(100, 10, "Description", border=1, fill=True)
-    pdf.cell(30, 10, "Qty", border=1, fill=True)
-    pdf.cell(30, 10, "Rate", border=1, fill=True)
-    pdf.cell(30, 10, "Total", border=1, fill=True, ln=True)
-
-    pdf.set_font("Helvetica", "", 10)
-    for item in items:
-        pdf.cell(100, 10, item.description, border=1)
-        pdf.cell(30, 10, str(item.quantity), border=1)
-        pdf.cell(30, 10, f"{item.rate:,.2f}", border=1)
-        pdf.cell(30, 10, f"{item.amount:,.2f}", border=1, ln=True)
+    [(invoice, items)] = await _invoices_with_items(db, [invoice])
 
-    pdf.ln(5)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(160, 10, "GRAND TOTAL (MWK):", align="R")
-    pdf.cell(30, 10, f"{invoice.total_amount:,.2f}", align="R", ln=True)
+    # Cached by content version; a miss renders in the process pool, off the event loop
+    pdf = await invoice_pdfs.render(invoice, items)
 
     return Response(
-        content=pdf.output(),
+        content=pdf,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=Invoice_{invoice.invoice_number}.pdf"}
+        headers={"Content-Disposition": f"attachment; filename=Invoice_{invoice['invoice_number']}.pdf"}
+    )
+
+@router.get("/bulk-download")
+async def bulk_download_invoices(
+    start: date,
+    end: date,
+    current_user: deps.Principal = Depends(deps.get_current_principal)
+):
+    """Streams a ZIP of every invoice issued in [start, end], rendered in parallel."""
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    async def fetch_window(after):
+        keyset = "AND (issue_date, id) > (:after_date, :after_id)" if after else ""
+        params = {"mid": current_user.id, "start": start, "end": end, "window": settings.PDF_BULK_WINDOW}
+        if after:
+            params["after_date"], params["after_id"] = after
+        # Own short-lived session per window: the request's session is closed before streaming starts
+        async with AsyncSessionLocal() as db:
+            invoices = (await db.execute(text(f"""
+                SELECT * FROM ledger.invoices
+                WHERE merchant_id = :mid AND issue_date BETWEEN :start AND :end {keyset}
+                ORDER BY issue_date, id
+                LIMIT :window
+            """), params)).mappings().fetchall()
+            return await _invoices_with_items(db, invoices)
+
+    return StreamingResponse(
+        invoice_pdfs.zip_stream(fetch_window),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=Invoices_{start}_{end}.zip"}
     )
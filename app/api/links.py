@@ -1,11 +1,11 @@
 import string
 import secrets
-from app.api.deps import get_db
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import text
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_user
-from app.models.app_models import User
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_current_principal, Principal
+from app.core.pagination import Keyset, capped_count_query, capped_total
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -18,8 +18,8 @@ class PaymentLinkRequest(BaseModel):
 @router.post("/api/merchant/create-link")
 async def create_link(
     data: PaymentLinkRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     code = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(10))
 
@@ -28,29 +28,40 @@ async def create_link(
         VALUES (:code, :mid, :amount, :desc)
     """)
 
-    db.execute(query, {
+    await db.execute(query, {
         "code": code, 
         "mid": current_user.id, 
         "amount": data.amount, 
         "desc": data.description
     })
-    db.commit()
+    await db.commit()
     
     return {"url": f"https://kwikpesa.onrender.com/pay/{code}"}
 
 @router.get("/api/merchant/my-links")
 async def get_my_links(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    query = text("""
-        SELECT short_code, amount, description, created_at 
+    keyset = Keyset(cursor, limit)
+
+    query = text(f"""
+        SELECT id, short_code, amount, description, created_at 
         FROM ledger.payment_links 
-        WHERE merchant_id = :mid
-        ORDER BY created_at DESC
+        WHERE merchant_id = :mid {keyset.where}
+        ORDER BY {keyset.order_by}
+        LIMIT :page_limit
     """)
     
-    result = db.execute(query, {"mid": current_user.id}).fetchall()
+    result = (await db.execute(query, {"mid": current_user.id, **keyset.params})).fetchall()
+    result, next_cursor, prev_cursor = keyset.page(result)
+
+    count = (await db.execute(
+        capped_count_query("ledger.payment_links WHERE merchant_id = :mid"), {"mid": current_user.id}
+    )).scalar()
+
     links = [
         {
             "short_code": row.short_code,
@@ -61,4 +72,9 @@ async def get_my_links(
         for row in result
     ]
     
-    return links
+    return {
+        "links": links,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        **capped_total(count)
+    }
@@ -1,61 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.api.deps import get_db
-from app.auth.router import get_current_user
-from app.models.app_models import User
+from app.api.deps import get_db, get_async_db, get_current_principal, Principal
+from app.core.pagination import Keyset
+from app.services.merchant_stats import MerchantStatsService
+from app.services.settlements import Settlements
 from app.schemas.merchant import MerchantStatsResponse # Import the schema above
 
 router = APIRouter()
 
 @router.get("/api/merchant/stats", response_model=MerchantStatsResponse)
 async def get_merchant_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Fetches real-time statistics for the logged-in merchant.
     """
     try:
-        # 1. Get Balance (Ensure it's a float for JSON)
-        balance = float(current_user.balance) if current_user.balance else 0.0
-
-        # 2. Today's Sales (Strictly for this merchant and today)
-        # We use DATE(created_at) to ensure we only get today's data
-        sales_query = text("""
-            SELECT SUM(amount) FROM ledger.transactions 
-            WHERE merchant_id = :mid 
-            AND status = 'SUCCESS' 
-            AND DATE(created_at) = CURRENT_DATE
-        """)
-        sales_result = db.execute(sales_query, {"mid": current_user.id}).scalar()
-        sales = float(sales_result) if sales_result else 0.0
-
-        # 3. Success Rate Calculation
-        rate_query = text("""
-            SELECT 
-                COUNT(*) FILTER (WHERE status = 'SUCCESS')::float / 
-                NULLIF(COUNT(*), 0) * 100
-            FROM ledger.transactions 
-            WHERE merchant_id = :mid
-        """)
-        rate_result = db.execute(rate_query, {"mid": current_user.id}).scalar()
-        success_rate = round(float(rate_result), 1) if rate_result else 0.0
-
-        # 4. Provider Split (Real distribution from transaction history)
-        # This replaces the hardcoded 70/30 with actual data
-        split_query = text("""
-            SELECT provider, 
-                   (COUNT(*)::float / SUM(COUNT(*)) OVER ()) * 100 as percentage
-            FROM ledger.transactions 
-            WHERE merchant_id = :mid AND status = 'SUCCESS'
-            GROUP BY provider
-        """)
-        split_results = db.execute(split_query, {"mid": current_user.id}).fetchall()
-        
-        # Convert DB rows to a clean Dictionary
-        # Default to empty split if no transactions exist
-        provider_split = {row[0]: round(row[1], 1) for row in split_results} if split_results else {"Airtel": 0, "TNM": 0}
+        # 1. Get Balance (Ensure it's a float for JSON; read fresh, not from the cached principal)
+        balance_result = (await db.execute(
+            text("SELECT balance FROM ledger.users WHERE id = :mid"), {"mid": current_user.id}
+        )).scalar()
+        balance = float(balance_result) if balance_result else 0.0
+
+        # 2-4. Today's Sales, Success Rate and Provider Split
+        # Read from the trigger-maintained counters instead of scanning ledger.transactions
+        stats = await MerchantStatsService.read(db, current_user.id)
+        sales = stats["sales"]
+        success_rate = stats["success_rate"]
+
+        # Always carries AIRTEL and TNM, at 0 when there are no payments yet
+        provider_split = stats["provider_split"]
 
         return {
             "id": current_user.id,
@@ -73,7 +50,7 @@ async def get_merchant_stats(
         raise HTTPException(status_code=500, detail="Internal Server Error fetching statistics")
 
 
-from typing import List, Optional
+from typing import List, Optional, Dict
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -81,55 +58,76 @@ from datetime import datetime
 class TransactionSchema(BaseModel):
     id: str
     amount: float
-    currency: str
     status: str
-    provider: str
-    customer_phone: str
+    provider: Optional[str]
+    destination: Optional[str]
+    provider_reference: Optional[str]
     created_at: datetime
 
 @router.get("/api/merchant/transactions", response_model=Dict)
 async def get_merchant_transactions(
-    page: int = 1,
+    cursor: Optional[str] = None,
     limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    offset = (page - 1) * limit
-    
-    # 1. Fetch total count for pagination math
-    count_query = text("SELECT COUNT(*) FROM ledger.transactions WHERE merchant_id = :mid")
-    total_count = db.execute(count_query, {"mid": current_user.id}).scalar()
+    keyset = Keyset(cursor, limit)
 
-    # 2. Fetch the specific page of transactions
-    tx_query = text("""
-        SELECT id, amount, currency, status, provider, customer_phone, created_at 
+    # 1. Total comes from the stats counters, not a COUNT(*) over the history
+    total_count = await MerchantStatsService.transaction_count(db, current_user.id)
+
+    # 2. Fetch one page after/before the cursor (served by idx_transactions_merchant_created)
+    tx_query = text(f"""
+        SELECT id, amount, status, provider, destination, provider_reference, created_at 
         FROM ledger.transactions 
-        WHERE merchant_id = :mid 
-        ORDER BY created_at DESC 
-        LIMIT :limit OFFSET :offset
+        WHERE merchant_id = :mid {keyset.where}
+        ORDER BY {keyset.order_by}
+        LIMIT :page_limit
     """)
     
-    results = db.execute(tx_query, {
-        "mid": current_user.id, 
-        "limit": limit, 
-        "offset": offset
-    }).fetchall()
+    results = (await db.execute(tx_query, {"mid": current_user.id, **keyset.params})).fetchall()
+    results, next_cursor, prev_cursor = keyset.page(results)
 
     # Map to list of dicts
     transactions = [
         {
             "id": row.id,
             "amount": float(row.amount),
-            "currency": row.currency,
             "status": row.status,
             "provider": row.provider,
-            "customer_phone": row.customer_phone,
+            "destination": row.destination,
+            "provider_reference": row.provider_reference,
             "created_at": row.created_at
         } for row in results
     ]
 
     return {
         "transactions": transactions,
-        "total_pages": (total_count + limit - 1) // limit,
-        "current_page": page
-    }
\ No newline at end of file
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "total_count": total_count
+    }
+
+
+@router.get("/api/merchant/settlements", response_model=Dict)
+async def get_merchant_settlements(
+    limit: int = 30,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """The merchant's most recent end-of-day settlement statements."""
+    statements = await Settlements.statements(db, current_user.id, min(max(limit, 1), 100))
+    return {"settlements": statements}
+
+
+@router.get("/api/merchant/settlements/{batch_id}", response_model=Dict)
+async def get_merchant_settlement(
+    batch_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """One settlement statement with its per-provider breakdown."""
+    statement = await Settlements.statement(db, current_user.id, batch_id)
+    if statement is None:
+        raise HTTPException(status_code=404, detail="Settlement not found")
+    return statement
@@ -7,18 +7,11 @@ import uuid
 from sqlalchemy import text
 
 from app.core.fastapi_security import validate_api_key
-from app.db.session import SessionLocal
+from app.api.deps import get_db
 from app.services.checkout_service import CheckoutService
 
 router = APIRouter(prefix="/v1/payments", tags=["Payments"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 class PaymentInitiateRequest(BaseModel):
     amount: Decimal = Field(..., gt=0, description="Amount must be greater than 0")
     phone: str = Field(..., pattern=r"^(?:\+265|0)[89]\d{8}$", description="Valid Malawian Phone")
@@ -5,6 +5,7 @@ from fastapi import APIRouter, Background_Tasks, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.api.deps import get_db
+from app.services.partitions import ACTIVE_TRANSACTIONS
 
 router = APIRouter()
 
@@ -94,7 +95,7 @@ async def mno_callback(data: dict, background_tasks: Background_Tasks, db: Sessi
 
     if status == "SUCCESS":
         # 1. Update Ledger status
-        db.execute(text("UPDATE ledger.transactions SET status = 'SUCCESS' WHERE id = :id"), {"id": ref})
+        db.execute(text(f"UPDATE ledger.transactions SET status = 'SUCCESS' WHERE id = :id AND {ACTIVE_TRANSACTIONS}"), {"id": ref})
         db.commit()
 
         # 2. Fetch Merchant & Transaction details for notifications
@@ -1,12 +1,11 @@
 import uuid
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from pydantic import BaseModel
 from typing import List, Optional
 
-from app.api.deps import get_db, get_current_user
-from app.models.app_models import User
+from app.api.deps import get_async_db, get_current_principal, Principal
 
 router = APIRouter()
 
@@ -28,8 +27,8 @@ class StoreDashboardResponse(BaseModel):
 @router.post("/api/store/add-product")
 async def add_product(
     item: ProductCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Creates a new product in the store."""
     try:
@@ -38,43 +37,43 @@ async def add_product(
             VALUES (:mid, :name, :price, :stock, :desc)
             RETURNING id
         """)
-        result = db.execute(query, {
+        result = (await db.execute(query, {
             "mid": current_user.id,
             "name": item.name,
             "price": item.price,
             "stock": item.stock,
             "desc": item.description
-        }).fetchone()
-        db.commit()
+        })).fetchone()
+        await db.commit()
         return {"status": "success", "product_id": result.id}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Store Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to add product")
 
 @router.get("/api/store/dashboard", response_model=StoreDashboardResponse)
 async def get_store_dashboard(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
+    # One indexed pass: active products by merchant, sales by product_id primary key,
+    # summary totals as window aggregates over the same rows
     products_query = text("""
         SELECT 
             p.id, p.name, p.price, p.stock, p.description,
-            COALESCE(SUM(t.amount), 0) as revenue,
-            COUNT(t.id) as sales_count
+            COALESCE(s.revenue, 0) as revenue,
+            COALESCE(s.sales_count, 0) as sales_count,
+            COUNT(*) OVER () as total_products,
+            SUM(COALESCE(s.revenue, 0)) OVER () as total_revenue,
+            SUM(COALESCE(s.sales_count, 0)) OVER () as total_orders
         FROM ledger.products p
-        LEFT JOIN ledger.transactions t 
-            ON t.metadata->>'product_id' = CAST(p.id AS TEXT) 
-            AND t.status = 'SUCCESS'
+        LEFT JOIN ledger.product_sales s ON s.product_id = p.id
         WHERE p.merchant_id = :mid AND p.is_active = TRUE
-        GROUP BY p.id
         ORDER BY p.created_at DESC
     """)
     
-    products = db.execute(products_query, {"mid": current_user.id}).fetchall()
-    total_products = len(products)
-    total_revenue = sum(p.revenue for p in products)
-    total_orders = sum(p.sales_count for p in products)
+    products = (await db.execute(products_query, {"mid": current_user.id})).fetchall()
+    totals = products[0] if products else None
 
     product_list = [
         {
@@ -91,9 +90,9 @@ async def get_store_dashboard(
 
     return {
         "summary": {
-            "total_products": total_products,
-            "total_revenue": total_revenue,
-            "total_orders": total_orders
+            "total_products": totals.total_products if totals else 0,
+            "total_revenue": float(totals.total_revenue) if totals else 0.0,
+            "total_orders": int(totals.total_orders) if totals else 0
         },
         "products": product_list
     }
\ No newline at end of file
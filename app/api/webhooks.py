@@ -1,8 +1,11 @@
 import logging
 from fastapi import APIRouter, Request, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
-from app.api.deps import get_db
-from app.services.ledger_service import LedgerService
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db
+from app.services.ledger_service import LedgerService, AWAITING_CONFIRMATION
+from app.services.webhook_inbox import WebhookInbox
+from app.services.partitions import ACTIVE_TRANSACTIONS
+from app.config import settings
 from decimal import Decimal
 
 
@@ -12,7 +15,7 @@ logger = logging.getLogger("KwachaPoint.Webhooks")
 @router.post("/airtel")
 async def airtel_webhook(
     request: Request, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     payload = await request.json()
     tx_id = payload.get("transaction", {}).get("id")
@@ -24,26 +27,33 @@ async def airtel_webhook(
 
     logger.info(f"Received Webhook for TX: {tx_id} - Status: {status}")
 
+    if settings.WEBHOOK_INBOX_MODE:
+        await WebhookInbox.append(db, "airtel", payload)
+        return {"status": "QUEUED"}
+
     if status != "SUCCESS":
         from sqlalchemy import text
-        db.execute(text("UPDATE ledger.transactions SET status = 'FAILED' WHERE id = :id"), {"id": tx_id})
-        db.commit()
+        await db.execute(text(
+            f"UPDATE ledger.transactions SET status = 'FAILED' WHERE id = :id AND {AWAITING_CONFIRMATION} AND {ACTIVE_TRANSACTIONS}"
+        ), {"id": tx_id})
+        await db.commit()
         return {"status": "FAILED_ACKNOWLEDGED"}
 
     try:
         from sqlalchemy import text
-        tx_data = db.execute(text(
-            "SELECT amount FROM ledger.transactions WHERE id = :id AND status = 'PENDING'"
-        ), {"id": tx_id}).fetchone()
+        tx_data = (await db.execute(text(
+            f"SELECT amount, provider FROM ledger.transactions WHERE id = :id AND {AWAITING_CONFIRMATION} AND {ACTIVE_TRANSACTIONS}"
+        ), {"id": tx_id})).fetchone()
 
         if not tx_data:
             logger.warning(f"TX {tx_id} already processed or not found.")
             return {"status": "ALREADY_PROCESSED"}
 
-        LedgerService.record_successful_payment(
-            db=db,
+        await db.run_sync(
+            LedgerService.record_successful_payment,
             transaction_id=tx_id,
-            amount=tx_data.amount
+            amount=tx_data.amount,
+            provider=tx_data.provider
         )
         
         return {"status": "SUCCESS_ACKNOWLEDGED"}
@@ -57,7 +67,7 @@ async def airtel_webhook(
 @router.post("/tnm")
 async def tnm_webhook(
     request: Request, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     payload = await request.json()
     tx_id = payload.get("transaction", {}).get("id")
@@ -69,26 +79,33 @@ async def tnm_webhook(
 
     logger.info(f"Received Webhook for TX: {tx_id} - Status: {status}")
 
+    if settings.WEBHOOK_INBOX_MODE:
+        await WebhookInbox.append(db, "tnm", payload)
+        return {"status": "QUEUED"}
+
     if status != "SUCCESS":
         from sqlalchemy import text
-        db.execute(text("UPDATE ledger.transactions SET status = 'FAILED' WHERE id = :id"), {"id": tx_id})
-        db.commit()
+        await db.execute(text(
+            f"UPDATE ledger.transactions SET status = 'FAILED' WHERE id = :id AND {AWAITING_CONFIRMATION} AND {ACTIVE_TRANSACTIONS}"
+        ), {"id": tx_id})
+        await db.commit()
         return {"status": "FAILED_ACKNOWLEDGED"}
 
     try:
         from sqlalchemy import text
-        tx_data = db.execute(text(
-            "SELECT amount FROM ledger.transactions WHERE id = :id AND status = 'PENDING'"
-        ), {"id": tx_id}).fetchone()
+        tx_data = (await db.execute(text(
+            f"SELECT amount, provider FROM ledger.transactions WHERE id = :id AND {AWAITING_CONFIRMATION} AND {ACTIVE_TRANSACTIONS}"
+        ), {"id": tx_id})).fetchone()
 
         if not tx_data:
             logger.warning(f"TX {tx_id} already processed or not found.")
             return {"status": "ALREADY_PROCESSED"}
 
-        LedgerService.record_successful_payment(
-            db=db,
+        await db.run_sync(
+            LedgerService.record_successful_payment,
             transaction_id=tx_id,
-            amount=tx_data.amount
+            amount=tx_data.amount,
+            provider=tx_data.provider
         )
         
         return {"status": "SUCCESS_ACKNOWLEDGED"}
@@ -99,11 +116,20 @@ async def tnm_webhook(
 
 
 @router.post("/bank")
-async def bank_webhook(data: dict, db: Session = Depends(get_db)):
+async def bank_webhook(data: dict, db: AsyncSession = Depends(get_async_db)):
     """Simulates Bank Transfer (Standard/National/NBS)"""
+    if settings.WEBHOOK_INBOX_MODE:
+        await WebhookInbox.append(db, "bank", data)
+        return {"message": "Bank Received"}
+
     tx_id = data.get("ext_ref")
     amount = Decimal(data.get("amount_cents", 0)) / 100 
     
     if data.get("payment_status") == "COMPLETED":
-        LedgerService.record_successful_payment(db, tx_id, amount)
+        from sqlalchemy import text
+        # Bank routes (BANK_NBM, BANK_STD, ...) carry different provider rates
+        provider = (await db.execute(text(
+            f"SELECT provider FROM ledger.transactions WHERE id = :id AND {ACTIVE_TRANSACTIONS}"
+        ), {"id": tx_id})).scalar()
+        await db.run_sync(LedgerService.record_successful_payment, tx_id, amount, provider)
     return {"message": "Bank Received"}
\ No newline at end of file
@@ -7,7 +7,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from jose import JWTError, jwt
-from app.api.deps import get_db
+from app.api.deps import get_db, get_current_user, invalidate_principal
 from app.models.app_models import User, OTP
 from app.models.auth_utils import verify_password, create_access_token, hash_password
 from .schemas import UserCreate, LoginRequest, Token, VerifyOTPRequest, ForgotPasswordRequest, ResetPasswordSubmit
@@ -103,6 +103,7 @@ async def verify_otp_login(payload: VerifyOTPRequest, db: Session = Depends(get_
     otp_record.is_used = True
     user.is_verified = True 
     db.commit()
+    invalidate_principal(user.id)
 
     access_token = create_access_token(data={
         "sub": user.email, 
@@ -148,25 +149,3 @@ async def reset_password(payload: ResetPasswordSubmit, db: Session = Depends(get
     db.commit()
 
     return {"message": "Password updated successfully. You can now login."}
-
-
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("user_id")
-        
-        if user_id is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-            
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-
-    user = db.query(User).filter(User.id == user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User no longer exists")
-        
-    if not user.is_verified:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account not verified")
-        
-    return user
\ No newline at end of file
@@ -1,5 +1,139 @@
+import os
+
+
 class Settings:
     MOCK_GATEWAY_URL = "https://kwachapoint.free.beeceptor.com"
-    WEBHOOK_BASE_URL = "https://kwachapoint.onrender.com/api/webhook"  
-    
-settings = Settings()
\ No newline at end of file
+    WEBHOOK_BASE_URL = "https://kwachapoint.onrender.com/api/webhook"
+
+    # --- PROVIDER HTTP TRANSPORT ---
+    # One keep-alive client per provider; these bound its connection pool.
+    PROVIDER_MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "50"))
+    PROVIDER_MAX_KEEPALIVE = int(os.getenv("PROVIDER_MAX_KEEPALIVE", "20"))
+    PROVIDER_KEEPALIVE_EXPIRY = float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "30"))
+    PROVIDER_CONNECT_TIMEOUT = float(os.getenv("PROVIDER_CONNECT_TIMEOUT", "5"))
+    PROVIDER_HTTP2 = os.getenv("PROVIDER_HTTP2", "false").lower() == "true"
+
+    # Read timeouts (seconds) per provider code
+    PROVIDER_TIMEOUTS = {
+        "AIRTEL": float(os.getenv("AIRTEL_TIMEOUT", "10")),
+        "TNM": float(os.getenv("TNM_TIMEOUT", "10")),
+        "BANK": float(os.getenv("BANK_TIMEOUT", "15")),
+    }
+
+    # --- DATABASE POOLS (per process, per role) ---
+    DB_OLTP_POOL_SIZE = int(os.getenv("DB_OLTP_POOL_SIZE", "5"))
+    DB_OLTP_MAX_OVERFLOW = int(os.getenv("DB_OLTP_MAX_OVERFLOW", "5"))
+    DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "10"))
+    DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "5"))
+    DB_REPORTING_POOL_SIZE = int(os.getenv("DB_REPORTING_POOL_SIZE", "2"))
+    DB_REPORTING_MAX_OVERFLOW = int(os.getenv("DB_REPORTING_MAX_OVERFLOW", "2"))
+    DB_BACKGROUND_POOL_SIZE = int(os.getenv("DB_BACKGROUND_POOL_SIZE", "3"))
+    DB_BACKGROUND_MAX_OVERFLOW = int(os.getenv("DB_BACKGROUND_MAX_OVERFLOW", "2"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+
+    # --- LEDGER ---
+    # Balance slots per high fan-in system account (revenue, provider expense)
+    SYSTEM_ACCOUNT_SLOTS = int(os.getenv("SYSTEM_ACCOUNT_SLOTS", "16"))
+
+    # Journal batches with at least this many lines are written with COPY instead of INSERT
+    LEDGER_COPY_THRESHOLD = int(os.getenv("LEDGER_COPY_THRESHOLD", "5000"))
+
+    # --- CACHES ---
+    CREDENTIAL_CACHE_TTL = float(os.getenv("CREDENTIAL_CACHE_TTL", "60"))
+    CREDENTIAL_CACHE_SIZE = int(os.getenv("CREDENTIAL_CACHE_SIZE", "10000"))
+
+    PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+    PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+    PAYMENT_LINK_CACHE_TTL = float(os.getenv("PAYMENT_LINK_CACHE_TTL", "60"))
+    PAYMENT_LINK_CACHE_SIZE = int(os.getenv("PAYMENT_LINK_CACHE_SIZE", "20000"))
+
+    # --- PAYMENT JOB QUEUE ---
+    PAYMENT_JOB_MAX_ATTEMPTS = int(os.getenv("PAYMENT_JOB_MAX_ATTEMPTS", "3"))
+    PAYMENT_JOB_RETRY_SECONDS = int(os.getenv("PAYMENT_JOB_RETRY_SECONDS", "30"))
+    PAYMENT_JOB_LEASE_SECONDS = int(os.getenv("PAYMENT_JOB_LEASE_SECONDS", "120"))
+    PAYMENT_WORKER_CONCURRENCY = int(os.getenv("PAYMENT_WORKER_CONCURRENCY", "10"))
+    PAYMENT_WORKER_POLL_INTERVAL = float(os.getenv("PAYMENT_WORKER_POLL_INTERVAL", "1"))
+    # Tries at recording an accepted push before the job is parked (never pushed again)
+    PAYMENT_RECORD_ATTEMPTS = int(os.getenv("PAYMENT_RECORD_ATTEMPTS", "3"))
+    # Run a worker inside each web process; disable when using dedicated worker processes
+    RUN_PAYMENT_WORKERS = os.getenv("RUN_PAYMENT_WORKERS", "true").lower() == "true"
+
+    # --- WEBHOOK INBOX ---
+    # When on, provider callbacks are stored and acknowledged immediately,
+    # and WebhookInboxConsumer does the ledger work in batches
+    WEBHOOK_INBOX_MODE = os.getenv("WEBHOOK_INBOX_MODE", "false").lower() == "true"
+    RUN_WEBHOOK_CONSUMER = os.getenv("RUN_WEBHOOK_CONSUMER", "true").lower() == "true"
+    WEBHOOK_INBOX_BATCH_SIZE = int(os.getenv("WEBHOOK_INBOX_BATCH_SIZE", "200"))
+    WEBHOOK_INBOX_POLL_INTERVAL = float(os.getenv("WEBHOOK_INBOX_POLL_INTERVAL", "0.5"))
+
+    # --- PLATFORM ROLLUPS ---
+    RUN_ROLLUP_FOLDER = os.getenv("RUN_ROLLUP_FOLDER", "true").lower() == "true"
+    ROLLUP_FOLD_INTERVAL = float(os.getenv("ROLLUP_FOLD_INTERVAL", "5"))
+    ROLLUP_FOLD_BATCH_SIZE = int(os.getenv("ROLLUP_FOLD_BATCH_SIZE", "5000"))
+    ROLLUP_MINUTE_RETENTION_HOURS = int(os.getenv("ROLLUP_MINUTE_RETENTION_HOURS", "48"))
+    ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "90"))
+
+    # --- PAGINATION ---
+    PAGINATION_MAX_LIMIT = int(os.getenv("PAGINATION_MAX_LIMIT", "100"))
+    # List counts stop here and are reported as an estimate beyond it
+    PAGINATION_COUNT_CAP = int(os.getenv("PAGINATION_COUNT_CAP", "1000"))
+
+    # --- EXPORTS ---
+    # Rows per read window (one short read each, held in memory while it streams) and per streamed chunk
+    EXPORT_WINDOW_ROWS = int(os.getenv("EXPORT_WINDOW_ROWS", "10000"))
+    EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "500"))
+
+    # --- INVOICE PDFS ---
+    PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+    PDF_CACHE_SIZE = int(os.getenv("PDF_CACHE_SIZE", "500"))
+    PDF_CACHE_TTL = float(os.getenv("PDF_CACHE_TTL", "3600"))
+    # Invoices fetched and rendered per step of a bulk ZIP export
+    PDF_BULK_WINDOW = int(os.getenv("PDF_BULK_WINDOW", "50"))
+
+    # --- INVOICE IMPORT ---
+    INVOICE_IMPORT_BATCH_SIZE = int(os.getenv("INVOICE_IMPORT_BATCH_SIZE", "500"))
+    INVOICE_IMPORT_MAX_ERRORS = int(os.getenv("INVOICE_IMPORT_MAX_ERRORS", "1000"))
+
+    # --- LEDGER VERIFICATION ---
+    # Entries younger than this may still belong to uncommitted transactions; left for the next run
+    LEDGER_VERIFY_SETTLE_SECONDS = int(os.getenv("LEDGER_VERIFY_SETTLE_SECONDS", "300"))
+    LEDGER_VERIFY_BATCH_SIZE = int(os.getenv("LEDGER_VERIFY_BATCH_SIZE", "50000"))
+    LEDGER_VERIFY_PERIOD = os.getenv("LEDGER_VERIFY_PERIOD", "hour")
+
+    # --- FEES & SETTLEMENT ---
+    # Platform fee on each successful payment (FeeSchedule); provider rates are per provider in code.
+    # 1.5% is what webhook postings have always credited merchants with; changing it is a pricing change.
+    MERCHANT_FEE_RATE = os.getenv("MERCHANT_FEE_RATE", "0.015")
+    # Successful transactions created this long before a window still join it if not yet settled
+    SETTLEMENT_LOOKBACK_DAYS = int(os.getenv("SETTLEMENT_LOOKBACK_DAYS", "3"))
+
+    # --- PARTITIONING (ledger.transactions, ledger.ledger_entries) ---
+    # Months created ahead by the partitions cron; inserts fail once it has not run for this long
+    PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+    # Older months are detached into the ledger_archive schema
+    PARTITION_RETAIN_MONTHS = int(os.getenv("PARTITION_RETAIN_MONTHS", "24"))
+    # Status changes, webhooks and postings only look this far back by created_at (partition pruning)
+    TRANSACTION_ACTIVE_DAYS = int(os.getenv("TRANSACTION_ACTIVE_DAYS", "35"))
+
+    # --- STALE TRANSACTION EXPIRY ---
+    STALE_TX_CHUNK_SIZE = int(os.getenv("STALE_TX_CHUNK_SIZE", "500"))
+    # Provider status checks in flight at once during a sweep
+    STALE_TX_POLL_CONCURRENCY = int(os.getenv("STALE_TX_POLL_CONCURRENCY", "20"))
+    # Past this age a transaction is failed even if its provider can't be reached
+    STALE_TX_HARD_EXPIRE_HOURS = int(os.getenv("STALE_TX_HARD_EXPIRE_HOURS", "24"))
+
+    # --- BALANCE DRIFT DETECTION ---
+    # UUID ranges the account space is cut into, and processes checking them (reporting engine)
+    DRIFT_SHARDS = int(os.getenv("DRIFT_SHARDS", "64"))
+    DRIFT_WORKERS = int(os.getenv("DRIFT_WORKERS", "4"))
+    DRIFT_REPORT_DIR = os.getenv("DRIFT_REPORT_DIR", "reports")
+
+    # --- SETTLEMENT RECONCILIATION ---
+    # Transactions this far either side of the statement day may still match (late settlement)
+    SETTLEMENT_MATCH_SLACK_HOURS = int(os.getenv("SETTLEMENT_MATCH_SLACK_HOURS", "24"))
+    SETTLEMENT_FETCH_ROWS = int(os.getenv("SETTLEMENT_FETCH_ROWS", "20000"))
+    SETTLEMENT_REPORT_DIR = os.getenv("SETTLEMENT_REPORT_DIR", "reports")
+
+settings = Settings()
@@ -0,0 +1,136 @@
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.core.http_cache import is_not_modified
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+logger = logging.getLogger("KwachaPoint.Assets")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+# Below this, compression headers cost more than they save
+MIN_COMPRESS_BYTES = 512
+
+
+@dataclass
+class Asset:
+    logical: str
+    hashed: str
+    media_type: str
+    etag: str
+    identity: bytes
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+    def body(self, accept_encoding: str):
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if self.gzip is not None and "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.identity, None
+
+
+class AssetManifest:
+    """Build-free asset pipeline, run once at startup.
+
+    Every file under the static directory is hashed and served at a
+    fingerprinted URL (js/auth.js -> js/auth.<hash>.js) with an immutable
+    one-year cache. It is also precompressed with gzip, plus brotli when the
+    module is installed. Templates link assets through asset_url(). Plain
+    unhashed paths still work, but must revalidate.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.by_logical: Dict[str, Asset] = {}
+        self.by_hashed: Dict[str, Asset] = {}
+        self.version = ""
+
+    def build(self):
+        self.by_logical.clear()
+        self.by_hashed.clear()
+        if not os.path.isdir(self.directory):
+            logger.warning(f"No static directory at {self.directory}")
+            return self
+
+        for root, _, files in os.walk(self.directory):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                logical = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    content = f.read()
+                asset = self._fingerprint(logical, content)
+                self.by_logical[logical] = asset
+                self.by_hashed[asset.hashed] = asset
+
+        self.version = hashlib.sha256(
+            "".join(sorted(self.by_hashed)).encode()
+        ).hexdigest()[:8]
+        logger.info(f"Fingerprinted {len(self.by_logical)} static assets (brotli: {brotli is not None})")
+        return self
+
+    @staticmethod
+    def _fingerprint(logical: str, content: bytes) -> Asset:
+        digest = hashlib.sha256(content).hexdigest()[:10]
+        stem, ext = os.path.splitext(logical)
+        media_type = mimetypes.guess_type(logical)[0] or "application/octet-stream"
+        asset = Asset(
+            logical=logical, hashed=f"{stem}.{digest}{ext}",
+            media_type=media_type, etag=f'"{digest}"', identity=content
+        )
+        if len(content) >= MIN_COMPRESS_BYTES and _compressible(media_type):
+            asset.gzip = gzip.compress(content, compresslevel=9, mtime=0)
+            if brotli is not None:
+                asset.br = brotli.compress(content, quality=11)
+        return asset
+
+    def url(self, logical: str) -> str:
+        """Template helper: the fingerprinted URL, or the plain one for unknown files."""
+        asset = self.by_logical.get(logical)
+        return f"/static/{asset.hashed if asset else logical}"
+
+    def response(self, request: Request, path: str) -> Response:
+        asset = self.by_hashed.get(path)
+        cache_control = IMMUTABLE
+        if asset is None:
+            asset = self.by_logical.get(path)
+            cache_control = REVALIDATE
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Asset not found")
+
+        headers = {"ETag": asset.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if is_not_modified(request, asset.etag):
+            return Response(status_code=304, headers=headers)
+
+        body, encoding = asset.body(request.headers.get("accept-encoding", ""))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=asset.media_type, headers=headers)
+
+
+def _compressible(media_type: str) -> bool:
+    return media_type.startswith("text/") or media_type in (
+        "application/javascript", "application/json", "image/svg+xml"
+    )
+
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "static")
+
+assets = AssetManifest(STATIC_DIR)
+
+router = APIRouter()
+
+@router.get("/static/{path:path}", include_in_schema=False)
+async def static_asset(path: str, request: Request):
+    return assets.response(request, path)
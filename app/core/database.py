@@ -1,21 +1,141 @@
 import os
-from sqlalchemy import create_engine
+import time
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.config import settings
+from app.core.metrics import metrics
+
+load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica for reporting queries; falls back to the primary
+DATABASE_REPORTING_URL = os.getenv("DATABASE_REPORTING_URL") or DATABASE_URL
+
+
+def normalize_url(url: str) -> str:
+    if url and url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+DATABASE_URL = normalize_url(DATABASE_URL)
+DATABASE_REPORTING_URL = normalize_url(DATABASE_REPORTING_URL)
+
+def to_async_url(url: str) -> str:
+    """postgresql://... -> postgresql+asyncpg://... (asyncpg spells sslmode as ssl)."""
+    url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url.replace("sslmode=", "ssl=")
+
+
+# --- POOL INSTRUMENTATION ---
+
+class _TimedCheckout:
+    """Pool mixin that records how long callers wait for a connection."""
+    role = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe("db_pool_checkout_wait_seconds", time.perf_counter() - start, pool=self.role)
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def _pool_class(base, role: str):
+    # A subclass per role keeps the label across pool.recreate()
+    return type(f"{role.title()}{base.__name__}", (base,), {"role": role})
 
+def _instrument(role: str, sync_engine):
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_conn, record):
+        record.info["connected_at"] = time.monotonic()
+        metrics.inc("db_pool_connections_opened_total", pool=role)
+        if sync_engine.pool.overflow() > 0:
+            metrics.inc("db_pool_overflow_connections_total", pool=role)
 
-if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_conn, record, proxy):
+        connected_at = record.info.get("connected_at")
+        if connected_at is not None:
+            metrics.observe("db_pool_connection_age_seconds", time.monotonic() - connected_at, pool=role)
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
-    pool_recycle=300,
+
+# --- ENGINE REGISTRY ---
+# One pool per role, sized from settings. Worst-case connections per process
+# is the sum of pool_size + max_overflow over every role (see pool_stats()).
+
+POOL_ROLES = {
+    "oltp": (DATABASE_URL, settings.DB_OLTP_POOL_SIZE, settings.DB_OLTP_MAX_OVERFLOW),
+    "reporting": (DATABASE_REPORTING_URL, settings.DB_REPORTING_POOL_SIZE, settings.DB_REPORTING_MAX_OVERFLOW),
+    "background": (DATABASE_URL, settings.DB_BACKGROUND_POOL_SIZE, settings.DB_BACKGROUND_MAX_OVERFLOW),
+}
+
+_engines = {}
+
+def get_engine(role: str = "oltp"):
+    if role not in _engines:
+        url, pool_size, max_overflow = POOL_ROLES[role]
+        _engines[role] = create_engine(
+            url,
+            poolclass=_pool_class(InstrumentedQueuePool, role),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+        _instrument(role, _engines[role])
+    return _engines[role]
+
+engine = get_engine("oltp")
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReportingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine("reporting"))
+BackgroundSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine("background"))
+Base = declarative_base()
+
+# --- ASYNC PATH (asyncpg) ---
+# Used by the hot async routes so queries don't block the event loop
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL),
+    poolclass=_pool_class(InstrumentedAsyncQueuePool, "oltp_async"),
+    pool_size=settings.DB_ASYNC_POOL_SIZE,
+    max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
     pool_pre_ping=True
 )
+_instrument("oltp_async", async_engine.sync_engine)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def pool_stats() -> dict:
+    """Live pool occupancy per role, plus the per-process connection ceiling."""
+    pools = {role: get_engine(role).pool for role in POOL_ROLES}
+    pools["oltp_async"] = async_engine.sync_engine.pool
+
+    stats = {}
+    for role, pool in pools.items():
+        stats[role] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        }
+    stats["max_connections_per_process"] = sum(
+        s["size"] + s["max_overflow"] for s in stats.values()
+    )
+    return stats
+
+metrics.gauge("db_pools", pool_stats)
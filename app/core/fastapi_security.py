@@ -3,15 +3,11 @@ import hashlib
 from fastapi import Security, HTTPException, status, Depends
 from fastapi.security import APIKeyHeader
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.api.deps import get_db
+from app.services.credential_cache import merchant_credentials
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
-def get_db():
-    db = SessionLocal()
-    try: yield db
-    finally: db.close()
-
 async def validate_api_key(
     api_key: str = Security(api_key_header),
     db: Session = Depends(get_db)
@@ -21,10 +17,7 @@ async def validate_api_key(
 
     hashed_input = hashlib.sha256(api_key.encode()).hexdigest()
 
-    merchant = db.execute(
-        text("SELECT id, name FROM ledger.merchants WHERE api_key_hashed = :h AND is_active = TRUE"),
-        {"h": hashed_input}
-    ).mappings().first()
+    merchant = merchant_credentials.get_by_key_hash(db, hashed_input)
 
     if not merchant:
         raise HTTPException(
@@ -0,0 +1,66 @@
+import threading
+from typing import Callable, Dict, Tuple
+
+
+def _key(name: str, labels: dict) -> Tuple:
+    return (name,) + tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Tiny in-process metrics store: counters, timings and callback gauges.
+
+    Snapshots are served as JSON from /api/admin/metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._timings: Dict[Tuple, Dict[str, float]] = {}
+        self._gauges: Dict[str, Callable[[], object]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            t = self._timings.setdefault(key, {"count": 0, "sum": 0.0, "max": 0.0})
+            t["count"] += 1
+            t["sum"] += seconds
+            t["max"] = max(t["max"], seconds)
+
+    def gauge(self, name: str, fn: Callable[[], object]):
+        """Registers a callback evaluated on every snapshot."""
+        with self._lock:
+            self._gauges[name] = fn
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {k: dict(v) for k, v in self._timings.items()}
+            gauges = dict(self._gauges)
+
+        def render(key):
+            name, *labels = key
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+        gauge_values = {}
+        for name, fn in gauges.items():
+            try:
+                gauge_values[name] = fn()
+            except Exception as e:
+                gauge_values[name] = f"error: {e}"
+
+        return {
+            "counters": {render(k): v for k, v in counters.items()},
+            "timings": {
+                render(k): {**v, "avg": v["sum"] / v["count"] if v["count"] else 0.0}
+                for k, v in timings.items()
+            },
+            "gauges": gauge_values,
+        }
+
+
+metrics = MetricsRegistry()
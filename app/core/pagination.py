@@ -0,0 +1,103 @@
+import json
+import base64
+from datetime import datetime
+from typing import Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from app.config import settings
+
+
+def encode_cursor(direction: str, created_at: datetime, row_id) -> str:
+    raw = json.dumps({"d": direction, "t": created_at.isoformat(), "i": str(row_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if data["d"] not in ("next", "prev"):
+            raise ValueError(data["d"])
+        return data["d"], datetime.fromisoformat(data["t"]), data["i"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class Keyset:
+    """Keyset pagination over (created_at, id), newest first.
+
+    Drop `where`, `order_by` and `params` into the list query, then pass the
+    fetched rows to page(). One extra row is fetched to know whether another
+    page exists. Pair with an index on (<filter column>, created_at DESC, id DESC).
+    """
+
+    def __init__(self, cursor: Optional[str], limit: int, created_col: str = "created_at", id_col: str = "id"):
+        self.limit = max(1, min(limit, settings.PAGINATION_MAX_LIMIT))
+        self.direction, self.position = "first", None
+        if cursor:
+            direction, created_at, row_id = decode_cursor(cursor)
+            self.direction, self.position = direction, (created_at, row_id)
+
+        self._cols = f"({created_col}, {id_col})"
+        self._created_col, self._id_col = created_col, id_col
+
+    @property
+    def where(self) -> str:
+        if self.direction == "next":
+            return f"AND {self._cols} < (:cursor_created_at, :cursor_id)"
+        if self.direction == "prev":
+            return f"AND {self._cols} > (:cursor_created_at, :cursor_id)"
+        return ""
+
+    @property
+    def order_by(self) -> str:
+        # Walking backwards reads the index in ascending order; page() flips it back
+        order = "ASC" if self.direction == "prev" else "DESC"
+        return f"{self._created_col} {order}, {self._id_col} {order}"
+
+    @property
+    def params(self) -> dict:
+        params = {"page_limit": self.limit + 1}
+        if self.position:
+            params["cursor_created_at"], params["cursor_id"] = self.position
+        return params
+
+    def page(self, rows: Sequence, created_attr: str = "created_at", id_attr: str = "id"):
+        """Trims the look-ahead row; returns (rows, next_cursor, prev_cursor)."""
+        rows = list(rows)
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if self.direction == "prev":
+            rows.reverse()
+
+        if not rows:
+            return rows, None, None
+
+        first, last = rows[0], rows[-1]
+        position = lambda row: (getattr(row, created_attr), getattr(row, id_attr))
+
+        # Older rows exist if the look-ahead found one, or if we came here walking backwards
+        older = has_more if self.direction != "prev" else True
+        # Newer rows exist unless this is the first page, or walking backwards ran out
+        newer = self.direction == "next" or (self.direction == "prev" and has_more)
+
+        return (
+            rows,
+            encode_cursor("next", *position(last)) if older else None,
+            encode_cursor("prev", *position(first)) if newer else None,
+        )
+
+
+def capped_count_query(from_where: str):
+    """COUNT(*) that stops after PAGINATION_COUNT_CAP + 1 rows.
+
+    Pair with capped_total() so large counts are reported as a lower bound.
+    """
+    return text(f"SELECT COUNT(*) FROM (SELECT 1 FROM {from_where} LIMIT {settings.PAGINATION_COUNT_CAP + 1}) capped")
+
+
+def capped_total(count: int) -> dict:
+    cap = settings.PAGINATION_COUNT_CAP
+    return {"total_count": min(count, cap), "total_is_estimate": count > cap}
@@ -0,0 +1,112 @@
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger("KwachaPoint.Indexes")
+
+# Indexes for tables created outside the ORM (app/models/account.sql) and for
+# ORM tables that already exist, where create_all won't add new indexes.
+INDEXES = {
+    # Keyset pagination: merchant filter, then the (created_at, id) sort key
+    "idx_transactions_merchant_created":
+        "ledger.transactions (merchant_id, created_at DESC, id DESC)",
+    "idx_payment_links_merchant_created":
+        "ledger.payment_links (merchant_id, created_at DESC, id DESC)",
+    "idx_invoices_merchant_created":
+        "ledger.invoices (merchant_id, created_at DESC, id DESC)",
+    # Store dashboard: a merchant's active products, newest first
+    "idx_products_merchant_active":
+        "ledger.products (merchant_id, created_at DESC) WHERE is_active = TRUE",
+    # Product attribution (typed column filled from metadata by ProductSalesService's trigger)
+    "idx_transactions_product_success":
+        "ledger.transactions (product_id) INCLUDE (amount) WHERE product_id IS NOT NULL AND status = 'SUCCESS'",
+    # Invoice PDFs: items per invoice, and a merchant's invoices by issue date for bulk export
+    "idx_invoice_items_invoice":
+        "ledger.invoice_items (invoice_id)",
+    "idx_invoices_merchant_issue":
+        "ledger.invoices (merchant_id, issue_date, id)",
+    # Invoice import: duplicate-number check per batch
+    "idx_invoices_merchant_number":
+        "ledger.invoices (merchant_id, invoice_number)",
+    # Incremental ledger verification walks entries by (created_at, id)
+    "idx_ledger_entries_created":
+        "ledger.ledger_entries (created_at, id)",
+    # Balance drift: per-account ledger sums over an account id range, index-only
+    "idx_ledger_entries_account":
+        "ledger.ledger_entries (account_id) INCLUDE (credit, debit)",
+    # Entries per transaction (from account.sql; re-declared so partitioned tables get it too)
+    "idx_ledger_transaction_id":
+        "ledger.ledger_entries (transaction_id)",
+    # Stale-transaction sweep: old open (PENDING/PROCESSING) rows in (created_at, id) chunks
+    "idx_transactions_open_created":
+        "ledger.transactions (created_at, id) WHERE status IN ('PENDING', 'PROCESSING')",
+    # Settlement reconciliation: one provider's day, index-only
+    "idx_transactions_provider_created":
+        "ledger.transactions (provider, created_at) INCLUDE (provider_reference, amount, status, id)",
+    # End-of-day settlement: successful transactions in a window, index-only
+    "idx_transactions_success_created":
+        "ledger.transactions (created_at) INCLUDE (id, merchant_id, provider, amount) WHERE status = 'SUCCESS'",
+}
+
+def ensure_indexes(engine):
+    """Builds missing indexes with CONCURRENTLY so live tables keep taking writes.
+
+    CONCURRENTLY can't run inside a transaction, hence the autocommit connection.
+    Partitioned tables can't be indexed concurrently as a whole: the parent
+    index is created ON ONLY the parent, each partition's index is built
+    concurrently, and each one is then attached. New partitions inherit the
+    parent's indexes when they are created.
+    """
+    from app.services.partitions import Partitions
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, definition in INDEXES.items():
+            table, columns = definition.split(" ", 1)
+            schema, relname = table.split(".")
+            if Partitions.is_partitioned(conn, relname):
+                _ensure_partitioned_index(conn, name, schema, relname, columns)
+                continue
+            try:
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+            except Exception as e:
+                # A failed concurrent build leaves an INVALID index behind; drop it so the next start retries
+                logger.error(f"Index {name} not built: {e}")
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS ledger.{name}"))
+
+def _ensure_partitioned_index(conn, name: str, schema: str, table: str, columns: str):
+    from app.services.partitions import Partitions
+
+    # CREATE INDEX ... ON ONLY takes a SHARE lock on the parent even when the index exists, so look first
+    if conn.execute(text("SELECT to_regclass(:index)"), {"index": f"{schema}.{name}"}).scalar() is None:
+        try:
+            _with_lock_timeout(conn, f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {schema}.{table} {columns}")
+        except Exception as e:
+            logger.error(f"Index {name} not created: {e}")
+            return
+    attached = set(conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_index x ON x.indexrelid = i.inhrelid
+        JOIN pg_class c ON c.oid = x.indrelid
+        WHERE i.inhparent = to_regclass(:index)
+    """), {"index": f"{schema}.{name}"}).scalars())
+
+    for partition, _ in Partitions.partitions(conn, table):
+        if partition in attached:
+            continue
+        child = f"{name}_{partition[len(table) + 1:]}"[:63]
+        try:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {schema}.{partition} {columns}"))
+            _with_lock_timeout(conn, f"ALTER INDEX {schema}.{name} ATTACH PARTITION {schema}.{child}")
+        except Exception as e:
+            logger.error(f"Index {child} not built: {e}")
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{child}"))
+
+def _with_lock_timeout(conn, statement: str):
+    """Runs a statement that locks a live table, giving up rather than queueing writers behind it.
+
+    The connection is in autocommit, so the setting is per session and is reset afterwards.
+    """
+    conn.execute(text("SET lock_timeout = '5s'"))
+    try:
+        conn.execute(text(statement))
+    finally:
+        conn.execute(text("RESET lock_timeout"))
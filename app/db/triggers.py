@@ -0,0 +1,31 @@
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger("KwachaPoint.Triggers")
+
+
+def ensure_trigger(conn, table: str, name: str, definition: str):
+    """Creates trigger `name` on `table` unless it already exists.
+
+    CREATE TRIGGER (and DROP TRIGGER) lock the table against writes, so
+    startup must not re-create triggers that are already installed. The
+    trigger functions are replaced with CREATE OR REPLACE FUNCTION, which
+    takes no table lock, so function changes still ship with a deploy. A
+    change to the trigger definition itself (timing, events, WHEN) needs a
+    new trigger name.
+    """
+    exists = conn.execute(text("""
+        SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(:table) AND tgname = :name AND NOT tgisinternal
+    """), {"table": table, "name": name}).scalar()
+    if exists:
+        return
+    conn.execute(text(f"CREATE TRIGGER {name} {definition}"))
+    logger.info(f"Created trigger {name} on {table}")
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    schema, relname = table.split(".")
+    return bool(conn.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = :schema AND table_name = :table AND column_name = :column
+    """), {"schema": schema, "table": relname, "column": column}).scalar())
@@ -1,9 +1,10 @@
-import httpx
 from .base import BasePaymentProvider, PaymentError
 from app.config import settings
 from decimal import Decimal
 
 class AirtelMoneyProvider(BasePaymentProvider):
+    PROVIDER_CODE = "AIRTEL"
+
     async def trigger_ussd_push(self, phone: str, amount: Decimal, tx_ref: str):
         self.logger.info(f"Initiating push for {phone} - Ref: {tx_ref}")
         
@@ -14,22 +15,21 @@ class AirtelMoneyProvider(BasePaymentProvider):
             "reference": tx_ref
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url, json=payload, timeout=10.0)
-                data = response.json()
-                
-                if response.status_code != 200:
-                    raise PaymentError("Airtel Gateway rejected request", "AIRTEL", data)
-                
-                return {
-                    "status": "SUCCESS",
-                    "provider_ref": data.get("provider_ref"),
-                    "message": "PIN prompt initiated"
-                }
-            except Exception as e:
-                self.logger.error(f"Airtel Connection Failed: {e}")
-                raise PaymentError("Could not connect to Airtel", "AIRTEL")
+        try:
+            response = await self.client.post(url, json=payload)
+            data = response.json()
+            
+            if response.status_code != 200:
+                raise PaymentError("Airtel Gateway rejected request", "AIRTEL", data)
+            
+            return {
+                "status": "SUCCESS",
+                "provider_ref": data.get("provider_ref"),
+                "message": "PIN prompt initiated"
+            }
+        except Exception as e:
+            self.logger.error(f"Airtel Connection Failed: {e}")
+            raise PaymentError("Could not connect to Airtel", "AIRTEL")
             
     async def verify_webhook(self, payload: dict, signature: str) -> bool:
         return True
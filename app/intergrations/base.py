@@ -2,6 +2,9 @@ from abc import ABC, abstractmethod
 from decimal import Decimal
 from typing import Dict, Any, Optional
 import logging
+import httpx
+
+from app.config import settings
 
 class PaymentError(Exception):
     def __init__(self, message: str, provider_code: str, raw_response: Any = None):
@@ -11,9 +14,61 @@ class PaymentError(Exception):
         super().__init__(self.message)
 
 class BasePaymentProvider(ABC):
+    PROVIDER_CODE = "BASE"
+
+    # Long-lived keep-alive clients, one per provider class (shared by all instances)
+    _clients: Dict[str, httpx.AsyncClient] = {}
+
     def __init__(self):
         self.logger = logging.getLogger(f"KwachaPoint.Provider.{self.__class__.__name__}")
 
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.__class__.get_client()
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """Returns this provider's pooled client, creating it on first use."""
+        client = BasePaymentProvider._clients.get(cls.PROVIDER_CODE)
+        if client is None or client.is_closed:
+            client = cls._build_client()
+            BasePaymentProvider._clients[cls.PROVIDER_CODE] = client
+        return client
+
+    @classmethod
+    def _build_client(cls) -> httpx.AsyncClient:
+        timeout = settings.PROVIDER_TIMEOUTS.get(cls.PROVIDER_CODE, 10.0)
+        limits = httpx.Limits(
+            max_connections=settings.PROVIDER_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PROVIDER_MAX_KEEPALIVE,
+            keepalive_expiry=settings.PROVIDER_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=settings.PROVIDER_CONNECT_TIMEOUT),
+            limits=limits,
+            http2=cls._http2_enabled(),
+        )
+
+    @staticmethod
+    def _http2_enabled() -> bool:
+        # HTTP/2 needs the optional 'h2' package; fall back to HTTP/1.1 without it
+        if not settings.PROVIDER_HTTP2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logging.getLogger("KwachaPoint.Provider").warning("PROVIDER_HTTP2 set but 'h2' is not installed; using HTTP/1.1")
+            return False
+        return True
+
+    @classmethod
+    async def close_clients(cls):
+        """Closes every pooled provider client. Called on app shutdown."""
+        clients = list(BasePaymentProvider._clients.values())
+        BasePaymentProvider._clients.clear()
+        for client in clients:
+            await client.aclose()
+
     @abstractmethod
     async def trigger_ussd_push(self, phone: str, amount: Decimal, tx_ref: str) -> Dict[str, Any]:
         pass
@@ -28,4 +83,4 @@ class BasePaymentProvider(ABC):
 
     def normalize_phone(self, phone: str) -> str:
         clean = phone.replace("+265", "").replace(" ", "").lstrip("0")
-        return f"265{clean}"
\ No newline at end of file
+        return f"265{clean}"
@@ -1,25 +1,52 @@
 import os
+import asyncio
+import hashlib
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 # Internal Imports
-from app.api.deps import get_db
+from app.api.deps import get_db, get_async_db
 from app.api.webhooks import router as webhook_router
 from app.api.checkout import router as checkout_router
 from app.api.dashboard import router as dashboard_router
 from app.auth.router import router as auth_router
-from app.core.database import engine, Base
+from app.core.database import engine, async_engine, Base
 from app.api import links, store
 from app.api import invoices
+from app.api import exports
+from app.api import merchant
+from app.intergrations.base import BasePaymentProvider
+from app.services.provider_factory import PROVIDER_CLASSES
+from app.services.payment_queue import PaymentWorker
+from app.services.webhook_inbox import WebhookInboxConsumer
+from app.services.system_accounts import SystemAccounts
+from app.db.indexes import ensure_indexes
+from app.services.merchant_stats import MerchantStatsService
+from app.services.platform_rollups import PlatformRollups, RollupFolder
+from app.services.product_sales import ProductSalesService
+from app.services.invoice_pdf import invoice_pdfs
+from app.config import settings
+from app.core.assets import assets, router as assets_router
+from app.core.http_cache import validator_headers, is_not_modified, not_modified_response
+from app.services.payment_link_cache import payment_links
 
 def init_db():
     with engine.connect() as connection:
         connection.execute(text("CREATE SCHEMA IF NOT EXISTS ledger"))
         connection.commit()
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        # Startup DDL must not queue behind long queries on live tables (and block writers behind it)
+        connection.execute(text("SET LOCAL lock_timeout = '5s'"))
+        SystemAccounts.ensure_schema(connection)
+        MerchantStatsService.ensure_schema(connection)
+        PlatformRollups.ensure_schema(connection)
+        ProductSalesService.ensure_schema(connection)
+    ensure_indexes(engine)
 
 init_db()
 
@@ -40,11 +67,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- LIFECYCLE HOOKS ---
+@app.on_event("startup")
+async def open_provider_clients():
+    """Warms one keep-alive HTTP client per payment provider."""
+    for provider_cls in PROVIDER_CLASSES:
+        provider_cls.get_client()
+
+@app.on_event("startup")
+async def build_assets():
+    """Fingerprints and precompresses static/ once per process."""
+    assets.build()
+
+@app.on_event("startup")
+async def start_payment_worker():
+    if settings.RUN_PAYMENT_WORKERS:
+        app.state.payment_worker = PaymentWorker()
+        app.state.payment_worker_task = asyncio.create_task(app.state.payment_worker.run_forever())
+
+@app.on_event("startup")
+async def start_webhook_consumer():
+    if settings.WEBHOOK_INBOX_MODE and settings.RUN_WEBHOOK_CONSUMER:
+        app.state.webhook_consumer = WebhookInboxConsumer()
+        app.state.webhook_consumer_task = asyncio.create_task(app.state.webhook_consumer.run_forever())
+
+@app.on_event("startup")
+async def start_rollup_folder():
+    if settings.RUN_ROLLUP_FOLDER:
+        app.state.rollup_folder = RollupFolder()
+        app.state.rollup_folder_task = asyncio.create_task(app.state.rollup_folder.run_forever())
+
+@app.on_event("shutdown")
+async def stop_rollup_folder():
+    if getattr(app.state, "rollup_folder", None):
+        app.state.rollup_folder.stop()
+        await app.state.rollup_folder_task
+
+@app.on_event("shutdown")
+async def stop_webhook_consumer():
+    if getattr(app.state, "webhook_consumer", None):
+        app.state.webhook_consumer.stop()
+        await app.state.webhook_consumer_task
+
+@app.on_event("shutdown")
+async def stop_payment_worker():
+    if getattr(app.state, "payment_worker", None):
+        app.state.payment_worker.stop()
+        await app.state.payment_worker_task
+
+@app.on_event("shutdown")
+async def close_provider_clients():
+    await BasePaymentProvider.close_clients()
+
+@app.on_event("shutdown")
+async def stop_pdf_renderers():
+    invoice_pdfs.shutdown()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await async_engine.dispose()
+
 # --- API ROUTERS ---
 app.include_router(auth_router, tags=["Authentication"])
 app.include_router(checkout_router, prefix="/v1/checkout", tags=["Checkout"])
 app.include_router(webhook_router, prefix="/v1/webhooks", tags=["Webhooks"])
 app.include_router(dashboard_router, prefix="/api/merchant", tags=["Merchant Dashboard"])
+app.include_router(merchant.router, tags=["Merchant"])
 app.include_router(
     links.router, 
     tags=["Payments"]
@@ -56,6 +144,11 @@ app.include_router(
 app.include_router(
     invoices.router
 )
+app.include_router(
+    exports.router,
+    tags=["Exports"]
+)
+app.include_router(assets_router)
 
 # --- ROOT REDIRECT ---
 @app.get("/")
@@ -67,22 +160,29 @@ async def root():
 from fastapi.templating import Jinja2Templates
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+templates.env.globals["asset_url"] = assets.url
+
+# Part of every checkout ETag (with assets.version), so a deploy invalidates browser copies
+with open(os.path.join(BASE_DIR, "templates", "checkout_page.html"), "rb") as template_file:
+    CHECKOUT_TEMPLATE_VERSION = hashlib.sha256(template_file.read()).hexdigest()[:8]
 
 @app.get("/pay/{short_code}", response_class=HTMLResponse)
-async def public_checkout_page(short_code: str, request: Request, db: Session = Depends(get_db)):
-    query = text("""
-        SELECT l.amount, l.description, l.status, m.business_name as merchant_name
-        FROM ledger.payment_links l
-        JOIN ledger.users m ON l.merchant_id = m.id
-        WHERE l.short_code = :code
-    """)
-    link = db.execute(query, {"code": short_code}).fetchone()
+async def public_checkout_page(short_code: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Cached by short code; the session only opens a connection on a cache miss
+    link = await payment_links.resolve(db, short_code)
 
     if not link:
         raise HTTPException(status_code=404, detail="Payment link not found")
     
     if link.status == 'PAID':
-        return templates.TemplateResponse("error_paid.html", {"request": request})
+        return templates.TemplateResponse("error_paid.html", {"request": request}, headers={"Cache-Control": "no-store"})
+
+    # Repeat visitors revalidate and get a 304 without a query or a render
+    # ETag only: payment_links has no updated_at, and created_at would hide later changes
+    etag = f'"{link.version}-{CHECKOUT_TEMPLATE_VERSION}-{assets.version}"'
+    headers = validator_headers(etag, cache_control="public, no-cache")
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
 
     return templates.TemplateResponse("checkout_page.html", {
         "request": request,
@@ -90,7 +190,7 @@ async def public_checkout_page(short_code: str, request: Request, db: Session =
         "amount": f"{link.amount:,.2f}",
         "description": link.description,
         "short_code": short_code
-    })
+    }, headers=headers)
 
 # --- GLOBAL ERROR HANDLER ---
 @app.exception_handler(404)
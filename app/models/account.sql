@@ -37,6 +37,8 @@ CREATE TABLE ledger.accounts (
 );
 
 --  Transactions Table
+-- transactions and ledger_entries are converted to monthly partitions on created_at by
+-- `python -m app.services.partitions migrate` (see app/services/partitions.py)
 CREATE TABLE ledger.transactions (
     id VARCHAR(50) PRIMARY KEY,
     merchant_id UUID REFERENCES ledger.merchants(id),
@@ -47,6 +49,8 @@ CREATE TABLE ledger.transactions (
     provider_reference VARCHAR(255),
     idempotency_key VARCHAR(255) UNIQUE,
     metadata JSONB DEFAULT '{}'::jsonb,
+    -- Filled from metadata->>'product_id' by a trigger (app/services/product_sales.py)
+    product_id UUID,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
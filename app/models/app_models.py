@@ -1,9 +1,9 @@
 import enum
 import uuid
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import Column, String, Boolean, Enum, DateTime, Numeric, Text, ForeignKey
+from sqlalchemy import Column, String, Boolean, Enum, Date, DateTime, Numeric, Text, ForeignKey, Integer, BigInteger, Index, func, text
 from decimal import Decimal as PyDecimal
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.core.database import Base
 
 class UserRole(str, enum.Enum):
@@ -56,4 +56,228 @@ class PaymentLink(Base):
     amount = Column(Numeric(12, 2), nullable=False)
     description = Column(Text)
     status = Column(String(20), default="ACTIVE")
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class PaymentJob(Base):
+    """A pending provider push, claimed by workers with FOR UPDATE SKIP LOCKED."""
+    __tablename__ = "payment_jobs"
+    __table_args__ = (
+        Index("idx_payment_jobs_due", "status", "run_after"),
+        {"schema": "ledger"},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    transaction_id = Column(String(50), unique=True, nullable=False)
+    provider = Column(String(20), nullable=False)
+    destination = Column(String(50), nullable=False)
+    amount = Column(Numeric(20, 4), nullable=False)
+    status = Column(String(20), nullable=False, default="QUEUED")  # QUEUED, RUNNING, DONE, FAILED, PARKED
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String(100))
+    locked_until = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class WebhookInboxEntry(Base):
+    """Raw provider callback, appended on receipt and stamped once consumed."""
+    __tablename__ = "webhook_inbox"
+    __table_args__ = (
+        Index("idx_webhook_inbox_unprocessed", "id", postgresql_where=text("processed_at IS NULL")),
+        {"schema": "ledger"},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    provider = Column(String(20), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    received_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    processed_at = Column(DateTime(timezone=True))
+    outcome = Column(String(30))
+
+
+class SystemAccountSlot(Base):
+    """One of N balance slots for a high fan-in system account (revenue, provider expense)."""
+    __tablename__ = "system_account_slots"
+    __table_args__ = {"schema": "ledger"}
+
+    account_id = Column(UUID(as_uuid=True), primary_key=True)
+    slot = Column(Integer, primary_key=True)
+    balance = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+
+
+class MerchantStatsDaily(Base):
+    """Per-merchant, per-day, per-provider counters, kept current by a trigger on ledger.transactions."""
+    __tablename__ = "merchant_stats_daily"
+    __table_args__ = {"schema": "ledger"}
+
+    merchant_id = Column(UUID(as_uuid=True), primary_key=True)
+    day = Column(Date, primary_key=True)
+    provider = Column(String(20), primary_key=True)
+    total_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    success_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    failed_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    success_amount = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+
+
+class MerchantStats(Base):
+    """Lifetime per-merchant, per-provider counters (same trigger as MerchantStatsDaily)."""
+    __tablename__ = "merchant_stats"
+    __table_args__ = {"schema": "ledger"}
+
+    merchant_id = Column(UUID(as_uuid=True), primary_key=True)
+    provider = Column(String(20), primary_key=True)
+    total_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    success_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    failed_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    success_amount = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+
+
+class PlatformRollupDelta(Base):
+    """Append-only change row from the transactions trigger, waiting to be folded into PlatformRollup."""
+    __tablename__ = "platform_rollup_deltas"
+    __table_args__ = {"schema": "ledger"}
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    bucket = Column(DateTime(timezone=True), nullable=False)  # created_at truncated to the minute
+    provider = Column(String(20), nullable=False)
+    status = Column(String(20), nullable=False)
+    tx_count = Column(Integer, nullable=False)
+    amount = Column(Numeric(precision=20, scale=4), nullable=False)
+
+
+class PlatformRollup(Base):
+    """Platform volume and counts per minute/hour/day bucket, provider and status."""
+    __tablename__ = "platform_rollups"
+    __table_args__ = {"schema": "ledger"}
+
+    granularity = Column(String(10), primary_key=True)  # minute, hour, day
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    provider = Column(String(20), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    tx_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    amount = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+
+
+class ProductSales(Base):
+    """Successful sales per store product, kept current by a trigger on ledger.transactions."""
+    __tablename__ = "product_sales"
+    __table_args__ = {"schema": "ledger"}
+
+    product_id = Column(UUID(as_uuid=True), primary_key=True)
+    sales_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    revenue = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+
+
+class LedgerCheckpoint(Base):
+    """Watermark of the last ledger entry a verifier has folded in, as (created_at, id)."""
+    __tablename__ = "ledger_checkpoints"
+    __table_args__ = {"schema": "ledger"}
+
+    name = Column(String(50), primary_key=True)
+    watermark_created_at = Column(DateTime(timezone=True))
+    watermark_id = Column(UUID(as_uuid=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class LedgerPeriodTotal(Base):
+    """Running debit/credit totals per account per period (hour), built incrementally."""
+    __tablename__ = "ledger_period_totals"
+    __table_args__ = {"schema": "ledger"}
+
+    account_id = Column(UUID(as_uuid=True), primary_key=True)
+    period_start = Column(DateTime(timezone=True), primary_key=True)
+    debit = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+    credit = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+    entries = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+class LedgerIntegrityFinding(Base):
+    """An imbalance found by the verifier: the transaction or period, and the account(s) involved."""
+    __tablename__ = "ledger_integrity_findings"
+    __table_args__ = (
+        Index("idx_integrity_findings_period", "period_start"),
+        {"schema": "ledger"},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    detected_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    kind = Column(String(20), nullable=False)  # TRANSACTION, PERIOD
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    period_end = Column(DateTime(timezone=True), nullable=False)
+    transaction_id = Column(String(50))
+    account_id = Column(UUID(as_uuid=True))
+    imbalance = Column(Numeric(precision=20, scale=4), nullable=False)  # credit - debit
+
+
+class ArchivedAccountTotal(Base):
+    """Per-account ledger sums of ledger_entries partitions detached into ledger_archive."""
+    __tablename__ = "archived_account_totals"
+    __table_args__ = {"schema": "ledger"}
+
+    account_id = Column(UUID(as_uuid=True), primary_key=True)
+    debit = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+    credit = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+    entries = Column(BigInteger, nullable=False, default=0, server_default="0")
+    archived_through = Column(DateTime(timezone=True))
+
+
+class SettlementBatch(Base):
+    """One end-of-day settlement run over a [window_start, window_end) window, with platform totals."""
+    __tablename__ = "settlement_batches"
+    __table_args__ = (
+        Index("uq_settlement_batches_window", "window_start", "window_end", unique=True),
+        {"schema": "ledger"},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    window_start = Column(DateTime(timezone=True), nullable=False)
+    window_end = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String(20), nullable=False, default="RUNNING")  # RUNNING, COMPLETED
+    merchant_count = Column(Integer, nullable=False, default=0, server_default="0")
+    transaction_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    gross_total = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+    fee_total = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+    provider_cost_total = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+    net_total = Column(Numeric(precision=20, scale=4), nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True))
+
+
+class Settlement(Base):
+    """A merchant's statement header for one batch: what is owed to them."""
+    __tablename__ = "settlements"
+    __table_args__ = (
+        Index("idx_settlements_merchant", "merchant_id", "batch_id"),
+        {"schema": "ledger"},
+    )
+
+    batch_id = Column(BigInteger, primary_key=True)
+    merchant_id = Column(UUID(as_uuid=True), primary_key=True)
+    transaction_count = Column(Integer, nullable=False)
+    gross = Column(Numeric(precision=20, scale=4), nullable=False)
+    fees = Column(Numeric(precision=20, scale=4), nullable=False)
+    provider_costs = Column(Numeric(precision=20, scale=4), nullable=False)
+    net_payable = Column(Numeric(precision=20, scale=4), nullable=False)
+    status = Column(String(20), nullable=False, default="PAYABLE", server_default="PAYABLE")  # PAYABLE, PAID
+
+
+class SettlementLine(Base):
+    """One settled transaction on a merchant's statement. The primary key stops a transaction being settled twice."""
+    __tablename__ = "settlement_lines"
+    __table_args__ = (
+        Index("idx_settlement_lines_batch_merchant", "batch_id", "merchant_id"),
+        {"schema": "ledger"},
+    )
+
+    transaction_id = Column(String(50), primary_key=True)
+    batch_id = Column(BigInteger, nullable=False)
+    merchant_id = Column(UUID(as_uuid=True), nullable=False)
+    provider = Column(String(20))
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    amount = Column(Numeric(precision=20, scale=4), nullable=False)
+    fee = Column(Numeric(precision=20, scale=4), nullable=False)
+    provider_cost = Column(Numeric(precision=20, scale=4), nullable=False)
+    net = Column(Numeric(precision=20, scale=4), nullable=False)
@@ -1,3 +1,4 @@
+import uuid
 from pydantic import BaseModel
 from typing import Dict
 
@@ -8,4 +9,4 @@ class MerchantStatsResponse(BaseModel):
     success_rate: float
     provider_split: Dict[str, float]
     role: str
-    id: int
\ No newline at end of file
+    id: uuid.UUID
\ No newline at end of file
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import uuid
+import logging
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.database import get_engine
+from app.core.metrics import metrics
+from app.services.system_accounts import SystemAccounts
+
+logger = logging.getLogger("KwachaPoint.BalanceDrift")
+
+# Stored balances vs. the ledger, for every account id in [lo, hi).
+# Slotted system accounts keep most of their balance in slots, so they are checked separately.
+SHARD_SQL = text("""
+    WITH entries AS (
+        -- Live entries plus the folded sums of archived ledger_entries partitions
+        SELECT account_id, SUM(balance) AS balance, SUM(entries) AS entries
+        FROM (
+            SELECT account_id, SUM(credit) - SUM(debit) AS balance, COUNT(*) AS entries
+            FROM ledger.ledger_entries
+            WHERE account_id >= CAST(:lo AS UUID)
+              AND (CAST(:hi AS UUID) IS NULL OR account_id < CAST(:hi AS UUID))
+            GROUP BY account_id
+            UNION ALL
+            SELECT account_id, credit - debit, entries
+            FROM ledger.archived_account_totals
+            WHERE account_id >= CAST(:lo AS UUID)
+              AND (CAST(:hi AS UUID) IS NULL OR account_id < CAST(:hi AS UUID))
+        ) live_and_archived
+        GROUP BY account_id
+    ),
+    accounts AS (
+        SELECT id FROM ledger.users
+        WHERE id >= CAST(:lo AS UUID) AND (CAST(:hi AS UUID) IS NULL OR id < CAST(:hi AS UUID))
+        UNION
+        SELECT id FROM ledger.merchants
+        WHERE id >= CAST(:lo AS UUID) AND (CAST(:hi AS UUID) IS NULL OR id < CAST(:hi AS UUID))
+        UNION
+        SELECT account_id FROM entries
+    )
+    SELECT a.id,
+           u.balance AS user_balance,
+           m.balance AS merchant_balance,
+           COALESCE(e.balance, 0) AS ledger_balance,
+           COALESCE(e.entries, 0) AS entries
+    FROM accounts a
+    LEFT JOIN ledger.users u ON u.id = a.id
+    LEFT JOIN ledger.merchants m ON m.id = a.id
+    LEFT JOIN entries e ON e.account_id = a.id
+    WHERE a.id <> ALL(CAST(:system AS UUID[]))
+""")
+
+
+def shard_ranges(shards: int) -> List[Tuple[str, Optional[str]]]:
+    """Splits the UUID space into `shards` contiguous [lo, hi) ranges; the last is open-ended."""
+    step = (1 << 128) // shards
+    bounds = [str(uuid.UUID(int=i * step)) for i in range(shards)]
+    return [(lo, bounds[i + 1] if i + 1 < shards else None) for i, lo in enumerate(bounds)]
+
+
+def check_shard(bounds: Tuple[str, Optional[str]]) -> dict:
+    """Recomputes one shard's balances from the ledger. Module-level so it runs in a worker process.
+
+    One READ ONLY, REPEATABLE READ transaction on the reporting engine: a
+    consistent snapshot (a posting updates its balance and entries in one
+    commit), plain reads only, so no row locks on the hot tables.
+    """
+    lo, hi = bounds
+    started = time.perf_counter()
+    engine = get_engine("reporting")
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True) as conn:
+        rows = conn.execute(SHARD_SQL, {"lo": lo, "hi": hi, "system": list(SystemAccounts.SLOTTED)}).fetchall()
+        conn.rollback()
+
+    drifts = []
+    for row in rows:
+        user_drift = None if row.user_balance is None else row.user_balance - row.ledger_balance
+        merchant_drift = None if row.merchant_balance is None else row.merchant_balance - row.ledger_balance
+        if user_drift or merchant_drift or (row.user_balance is None and row.merchant_balance is None):
+            drifts.append({
+                "account_id": str(row.id),
+                "user_balance": _num(row.user_balance),
+                "merchant_balance": _num(row.merchant_balance),
+                "ledger_balance": _num(row.ledger_balance),
+                "user_drift": _num(user_drift),
+                "merchant_drift": _num(merchant_drift),
+                "entries": row.entries,
+            })
+    return {"lo": lo, "hi": hi, "accounts": len(rows), "drifts": drifts,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def check_system_accounts() -> List[dict]:
+    """Slotted accounts: the rolled-up balance plus open slots, against the ledger."""
+    engine = get_engine("reporting")
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True) as conn:
+        rows = conn.execute(text("""
+            SELECT b.account_id, b.balance AS stored_balance,
+                   COALESCE((SELECT SUM(credit) - SUM(debit) FROM ledger.ledger_entries e
+                             WHERE e.account_id = b.account_id), 0)
+                   + COALESCE((SELECT credit - debit FROM ledger.archived_account_totals a
+                               WHERE a.account_id = b.account_id), 0) AS ledger_balance
+            FROM ledger.system_account_balances b
+        """)).fetchall()
+        conn.rollback()
+    return [{
+        "account_id": str(row.account_id),
+        "stored_balance": _num(row.stored_balance),
+        "ledger_balance": _num(row.ledger_balance),
+        "drift": _num(row.stored_balance - row.ledger_balance),
+    } for row in rows if row.stored_balance != row.ledger_balance]
+
+
+def _num(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+class BalanceDriftDetector:
+    """Compares every merchant's stored balances with the sum of its ledger entries.
+
+    Three figures must agree per account: ledger.users.balance (shown on the
+    dashboard), ledger.merchants.balance (credited by LedgerService) and
+    SUM(credit) - SUM(debit) over ledger.ledger_entries. The id space is cut
+    into DRIFT_SHARDS ranges and checked in DRIFT_WORKERS processes against
+    the reporting engine (a replica when DATABASE_REPORTING_URL is set). The
+    JSON report lists only the accounts that differ.
+    """
+
+    def __init__(self, shards: int = None, workers: int = None, report_dir: str = None):
+        self.shards = shards or settings.DRIFT_SHARDS
+        self.workers = workers or settings.DRIFT_WORKERS
+        self.report_dir = report_dir or settings.DRIFT_REPORT_DIR
+
+    def run(self) -> dict:
+        started = time.perf_counter()
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "shards": self.shards,
+            "accounts_checked": 0,
+            "drifts": [],
+            "system_accounts": [],
+        }
+
+        # spawn: workers open their own connections instead of inheriting the parent's sockets
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(check_shard, bounds) for bounds in shard_ranges(self.shards)]
+            for done, future in enumerate(as_completed(futures), start=1):
+                shard = future.result()
+                report["accounts_checked"] += shard["accounts"]
+                report["drifts"].extend(shard["drifts"])
+                logger.info(
+                    f"Shard {done}/{self.shards} [{shard['lo']}, {shard['hi'] or 'end'}): "
+                    f"{shard['accounts']} accounts, {len(shard['drifts'])} drifted, {shard['seconds']}s"
+                )
+
+        report["system_accounts"] = check_system_accounts()
+        report["drifts"].sort(key=lambda d: d["account_id"])
+        report["seconds"] = round(time.perf_counter() - started, 3)
+
+        metrics.inc("balance_drift_accounts_total", len(report["drifts"]))
+        path = self.write_report(report)
+        if report["drifts"] or report["system_accounts"]:
+            logger.error(
+                f"BALANCE DRIFT: {len(report['drifts'])} merchant accounts and "
+                f"{len(report['system_accounts'])} system accounts differ from the ledger (report: {path})"
+            )
+        else:
+            logger.info(f"No balance drift across {report['accounts_checked']} accounts (report: {path})")
+        return report
+
+    def write_report(self, report: dict) -> str:
+        os.makedirs(self.report_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(self.report_dir, f"balance_drift_{stamp}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return path
+
+
+if __name__ == "__main__":
+    # python -m app.services.balance_drift [shards] [workers]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    args = [int(a) for a in sys.argv[1:3]]
+    BalanceDriftDetector(*args).run()
@@ -1,5 +1,4 @@
 import uuid
-import asyncio
 from decimal import Decimal
 from sqlalchemy.orm import Session
 from sqlalchemy import text
@@ -7,7 +6,8 @@ from sqlalchemy import text
 from app.intergrations.airtel import AirtelMoneyProvider
 from app.intergrations.tnm import TNMMpambaProvider
 from app.intergrations.bank import BankDirectProvider
-from app.services.commision_service import CommissionService
+from app.services.partitions import ACTIVE_TRANSACTIONS
+from app.services.provider_factory import integration_code
 
 class CheckoutService:
     def __init__(self, db: Session):
@@ -33,55 +33,32 @@ class CheckoutService:
         self.db.commit()
         return tx_ref
 
-    async def process_with_retry(self, tx_id: str, provider_name: str, destination: str, amount: Decimal, attempt: int = 1):
-        MAX_RETRIES = 3
-        provider = self.providers.get(provider_name.lower())
+    def get_provider(self, provider_name: str):
+        return self.providers.get(integration_code(provider_name).lower())
 
-        if not provider:
-            print(f"Error: Unsupported provider {provider_name}")
-            return
+    async def push(self, tx_id: str, provider_name: str, destination: str, amount: Decimal):
+        """Single push attempt. Retries are scheduled by PaymentQueue, not here."""
+        provider = self.get_provider(provider_name)
 
-        try:
-            print(f"[Attempt {attempt}] Calling {provider_name} for {tx_id}...")
-            
-            # 1. Trigger the actual USSD/Bank API
-            result = await provider.trigger_ussd_push(destination, amount, tx_id)
+        if not provider:
+            raise ValueError(f"Unsupported provider {provider_name}")
 
-            # 2. Check Result
-            if result.get("status") == "SUCCESS":
-                # Get merchant info to apply commission
-                tx_record = self.db.execute(
-                    text("SELECT merchant_id FROM ledger.transactions WHERE id = :id"), 
-                    {"id": tx_id}
-                ).fetchone()
+        print(f"Calling {provider_name} for {tx_id}...")
+        return await provider.trigger_ussd_push(destination, amount, tx_id)
 
-                CommissionService.apply_commission(
-                    self.db, 
-                    transaction_id=tx_id, 
-                    merchant_id=tx_record.merchant_id, 
-                    provider=provider_name.upper(), 
-                    total_amount=amount
-                )
-                print(f"{tx_id} fully processed and split.")
-            
-            else:
-                # API responded but transaction is waiting for User PIN
-                self.db.execute(text(
-                    "UPDATE ledger.transactions SET status = 'PROCESSING' WHERE id = :id"
-                ), {"id": tx_id})
-                self.db.commit()
-                print(f"{tx_id} waiting for user PIN.")
+    def record_push_result(self, tx_id: str, provider_name: str, amount: Decimal, result: dict):
+        """A push only starts the payment (the customer still has to enter their PIN).
 
-        except Exception as e:
-            if attempt < MAX_RETRIES:
-                # Exponential Backoff: 30s, 60s, 90s
-                wait_time = 30 * attempt 
-                print(f"{tx_id} API failure: {str(e)}. Retrying in {wait_time}s...")
-                await asyncio.sleep(wait_time)
-                await self.process_with_retry(tx_id, provider_name, destination, amount, attempt + 1)
-            else:
-                print(f"{tx_id} failed after {MAX_RETRIES} attempts.")
-                self.db.execute(text(
-                    "UPDATE ledger.transactions SET status = 'FAILED' WHERE id = :id"
-                ), {"id": tx_id})
-                self.db.commit()
\ No newline at end of file
+        The transaction moves to PROCESSING; the ledger is posted when the
+        provider confirms it (webhook, webhook inbox or stale sweep).
+        """
+        # The provider's reference is what its settlement statement lists (see SettlementReconciler).
+        # It is stored even if the confirmation beat us here; the status only moves forward.
+        self.db.execute(text(f"""
+            UPDATE ledger.transactions
+            SET status = CASE WHEN status = 'PENDING' THEN 'PROCESSING' ELSE status END,
+                provider_reference = COALESCE(:ref, provider_reference)
+            WHERE id = :id AND {ACTIVE_TRANSACTIONS}
+        """), {"id": tx_id, "ref": result.get("provider_ref")})
+        self.db.commit()
+        print(f"{tx_id} waiting for user PIN.")
@@ -1,45 +1,26 @@
-from decimal import Decimal, ROUND_HALF_UP
-from sqlalchemy import text
+from decimal import Decimal
 from sqlalchemy.orm import Session
+from app.services.fee_schedule import FeeSchedule
+from app.services.ledger_service import LedgerService
 
 class CommissionService:
-    MERCHANT_FEE_RATE = Decimal("0.0285")
-
-    PROVIDER_RATES = {
-        "AIRTEL": Decimal("0.012"),
-        "TNM": Decimal("0.012"),
-        "BANK_NBM": Decimal("0.005"),
-        "BANK_STD": Decimal("0.005"),
-    }
+    # Rates live in FeeSchedule; kept here for existing callers
+    MERCHANT_FEE_RATE = FeeSchedule.MERCHANT_FEE_RATE
+    PROVIDER_RATES = FeeSchedule.PROVIDER_RATES
 
     @staticmethod
     def apply_commission(db: Session, transaction_id: str, merchant_id: str, provider: str, total_amount: Decimal):
-        # Math remains the same
-        gross_commission = (total_amount * CommissionService.MERCHANT_FEE_RATE).quantize(Decimal("0.01"))
-        net_to_merchant = total_amount - gross_commission
-        rate = CommissionService.PROVIDER_RATES.get(provider, Decimal("0.01"))
-        external_fee = (total_amount * rate).quantize(Decimal("0.01"))
-
-
-        db.execute(text("""
-            INSERT INTO ledger.ledger_entries (transaction_id, account_id, credit, debit)
-            VALUES (:tx_id, :m_id, :amt, 0)
-        """), {"tx_id": transaction_id, "m_id": merchant_id, "amt": net_to_merchant})
+        """Posts a provider-confirmed payment. Returns False if it was no longer open.
 
-        # 2. Credit KP Gross Revenue (+2%)
-        db.execute(text("""
-            INSERT INTO ledger.ledger_entries (transaction_id, account_id, credit, debit)
-            VALUES (:tx_id, '00000000-0000-0000-0000-000000000000', :amt, 0) -- Use a valid UUID for your revenue account
-        """), {"tx_id": transaction_id, "amt": gross_commission})
-        # 3. Debit Provider Expense (-variable%)
-        db.execute(text("""
-            INSERT INTO ledger.ledger_entries (transaction_id, account_id, credit, debit)
-            VALUES (:tx_id, '00000000-0000-0000-0000-000000000001', 0, :amt) -- Use a valid UUID for provider expense
-        """), {"tx_id": transaction_id, "amt": external_fee})
+        Same posting as the webhooks (LedgerService.post_successful_payment):
+        only an open transaction moves, so a retried call posts nothing.
+        """
+        fees = FeeSchedule.for_amount(total_amount, provider)
+        if not LedgerService.post_successful_payment(db, transaction_id, total_amount, provider):
+            db.rollback()
+            print(f"{transaction_id} not open; commission already applied or payment failed")
+            return False
 
-        db.execute(text("""
-            UPDATE ledger.transactions SET status = 'SUCCESS' WHERE id = :id
-        """), {"id": transaction_id})
-        
         db.commit()
-        print(f"Reconciled: Merchant (+{net_to_merchant}) | KP Gross (+{gross_commission}) | Provider Cost (-{external_fee})")
\ No newline at end of file
+        print(f"Reconciled: Merchant (+{fees['net']}) | KP Gross (+{fees['fee']}) | Provider Cost (-{fees['provider_cost']})")
+        return True
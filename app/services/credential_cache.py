@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.cache import TTLCache
+
+@dataclass(frozen=True)
+class MerchantCredential:
+    id: str
+    name: Optional[str]
+    api_key_hashed: Optional[str]
+    is_active: bool
+    role: Optional[str] = None
+
+
+class MerchantCredentialCache:
+    """Caches what signature and API-key checks need, so they skip the DB on a hit.
+
+    Lookups are keyed by merchant id (checkout HMAC) and by API-key hash
+    (X-API-Key). invalidate() must be called whenever keys or active status
+    change; other processes pick the change up within the TTL.
+    """
+
+    def __init__(self):
+        self._by_id = TTLCache("merchant_credentials_by_id", settings.CREDENTIAL_CACHE_SIZE, settings.CREDENTIAL_CACHE_TTL)
+        self._by_key = TTLCache("merchant_credentials_by_key", settings.CREDENTIAL_CACHE_SIZE, settings.CREDENTIAL_CACHE_TTL)
+
+    async def get_merchant(self, db: AsyncSession, merchant_id) -> Optional[MerchantCredential]:
+        key = str(merchant_id)
+        cred = self._by_id.get(key)
+        if cred is None:
+            row = (await db.execute(text("""
+                SELECT id, business_name, api_key_hashed, is_active, role
+                FROM ledger.users WHERE id = :id
+            """), {"id": key})).fetchone()
+            if not row:
+                return None
+            cred = MerchantCredential(
+                id=str(row.id), name=row.business_name, api_key_hashed=row.api_key_hashed,
+                is_active=bool(row.is_active), role=row.role
+            )
+            self._by_id.set(key, cred)
+        return cred
+
+    def get_by_key_hash(self, db: Session, key_hash: str) -> Optional[MerchantCredential]:
+        cred = self._by_key.get(key_hash)
+        if cred is None:
+            row = db.execute(
+                text("SELECT id, name FROM ledger.merchants WHERE api_key_hashed = :h AND is_active = TRUE"),
+                {"h": key_hash}
+            ).fetchone()
+            if not row:
+                return None
+            cred = MerchantCredential(id=str(row.id), name=row.name, api_key_hashed=key_hash, is_active=True)
+            self._by_key.set(key_hash, cred)
+        return cred
+
+    def invalidate(self, merchant_id):
+        key = str(merchant_id)
+        self._by_id.pop(key)
+        self._by_key.pop_where(lambda cred: cred.id == key)
+
+
+merchant_credentials = MerchantCredentialCache()
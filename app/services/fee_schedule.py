@@ -0,0 +1,61 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+from app.config import settings
+
+CENTS = Decimal("0.01")
+
+
+class FeeSchedule:
+    """The platform's single fee schedule, used by postings and by settlement.
+
+    Per transaction, each figure is rounded to cents with ROUND_HALF_UP:
+        fee           = round(amount * MERCHANT_FEE_RATE)
+        provider_cost = round(amount * provider rate)
+        net           = amount - fee
+        revenue       = fee - provider_cost
+    Batch totals are sums of these per-transaction figures, never rounded
+    again. sql_params() gives the same rates to set-based SQL. Postgres'
+    ROUND(numeric, 2) also rounds halves away from zero, so both sides agree
+    to the cent.
+    """
+    MERCHANT_FEE_RATE = Decimal(settings.MERCHANT_FEE_RATE)
+
+    PROVIDER_RATES = {
+        "AIRTEL": Decimal("0.012"),
+        "TNM": Decimal("0.012"),
+        "BANK_NBM": Decimal("0.005"),
+        "BANK_STD": Decimal("0.005"),
+    }
+    DEFAULT_PROVIDER_RATE = Decimal("0.01")
+
+    @staticmethod
+    def round(amount: Decimal) -> Decimal:
+        return amount.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def provider_rate(provider: Optional[str]) -> Decimal:
+        return FeeSchedule.PROVIDER_RATES.get((provider or "").upper(), FeeSchedule.DEFAULT_PROVIDER_RATE)
+
+    @staticmethod
+    def for_amount(amount: Decimal, provider: Optional[str] = None) -> dict:
+        amount = Decimal(amount)
+        fee = FeeSchedule.round(amount * FeeSchedule.MERCHANT_FEE_RATE)
+        provider_cost = FeeSchedule.round(amount * FeeSchedule.provider_rate(provider))
+        return {
+            "gross": amount,
+            "fee": fee,
+            "provider_cost": provider_cost,
+            "net": amount - fee,
+            "revenue": fee - provider_cost,
+        }
+
+    @staticmethod
+    def sql_params() -> dict:
+        """Bind parameters for the rates CTE in set-based queries (see Settlements)."""
+        return {
+            "merchant_fee_rate": FeeSchedule.MERCHANT_FEE_RATE,
+            "rate_providers": list(FeeSchedule.PROVIDER_RATES),
+            "rate_values": list(FeeSchedule.PROVIDER_RATES.values()),
+            "default_provider_rate": FeeSchedule.DEFAULT_PROVIDER_RATE,
+        }
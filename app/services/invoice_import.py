@@ -0,0 +1,251 @@
+import csv
+import uuid
+import logging
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+from typing import Iterable, Iterator, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("KwachaPoint.InvoiceImport")
+
+CSV_COLUMNS = (
+    "invoice_number", "client_name", "client_email", "client_phone",
+    "issue_date", "due_date", "notes", "description", "quantity", "rate",
+)
+
+CENTS = Decimal("0.01")
+# quantity, rate and amounts are DECIMAL(12, 2) columns
+MAX_AMOUNT = Decimal("9999999999.99")
+
+
+class InvoiceImport:
+    """Creates many invoices for one merchant in bounded, multi-row batches.
+
+    Input is validated in one streaming pass. Valid invoices are written
+    INVOICE_IMPORT_BATCH_SIZE at a time: one INSERT for the invoices and one
+    for all their items, each built from unnest() arrays, committed per
+    batch. A bad row is reported with its position and skipped. It never
+    aborts the rest of the import.
+    """
+
+    def __init__(self, db: Session, merchant_id):
+        self.db = db
+        self.merchant_id = merchant_id
+        self.created = 0
+        self.errors = []
+        self._seen_numbers = set()
+
+    # --- Input -----------------------------------------------------------
+
+    @staticmethod
+    def from_payloads(payloads: Iterable[dict]) -> Iterator[Tuple[int, dict]]:
+        """JSON bodies in the create_invoice shape, numbered from 1."""
+        return enumerate(payloads, start=1)
+
+    @staticmethod
+    def from_csv(lines: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+        """One CSV row per line item; consecutive rows with the same invoice_number form one invoice.
+
+        Yields (first line number, payload) in the create_invoice shape.
+        """
+        reader = csv.DictReader(lines)
+        missing = set(CSV_COLUMNS) - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+
+        # Line 1 is the header
+        numbered = ((line, row) for line, row in enumerate(reader, start=2))
+        for number, rows in groupby(numbered, key=lambda pair: (pair[1]["invoice_number"] or "").strip()):
+            rows = list(rows)
+            first_line, head = rows[0]
+            yield first_line, {
+                "invoiceNumber": number,
+                "clientName": head["client_name"],
+                "clientEmail": head["client_email"],
+                "clientPhone": head["client_phone"],
+                "issueDate": head["issue_date"],
+                "dueDate": head["due_date"],
+                "notes": head["notes"],
+                "items": [
+                    {"description": row["description"], "quantity": row["quantity"], "rate": row["rate"]}
+                    for _, row in rows
+                ],
+            }
+
+    # --- Validation ------------------------------------------------------
+
+    def validate(self, data: dict) -> dict:
+        """Returns a normalized invoice with its items, or raises ValueError."""
+        # JSON bodies can carry any shape; anything but ValueError would abort the import
+        if not isinstance(data, dict):
+            raise ValueError("each invoice must be an object")
+        number = str(data.get("invoiceNumber") or "").strip()
+        client = str(data.get("clientName") or "").strip()
+        if not number:
+            raise ValueError("invoiceNumber is required")
+        if not client:
+            raise ValueError("clientName is required")
+        if number in self._seen_numbers:
+            raise ValueError(f"duplicate invoiceNumber {number} in this import")
+
+        try:
+            issue = date.fromisoformat(str(data.get("issueDate")))
+            due = date.fromisoformat(str(data.get("dueDate")))
+        except ValueError:
+            raise ValueError("issueDate and dueDate must be YYYY-MM-DD")
+        if due < issue:
+            raise ValueError("dueDate is before issueDate")
+
+        items = []
+        raw_items = data.get("items") or []
+        if not isinstance(raw_items, list):
+            raise ValueError("items must be a list")
+        for item in raw_items:
+            if not isinstance(item, dict):
+                raise ValueError("each item must be an object")
+            description = str(item.get("description") or "").strip()
+            try:
+                quantity = Decimal(str(item.get("quantity")))
+                rate = Decimal(str(item.get("rate")))
+            except InvalidOperation:
+                raise ValueError("item quantity and rate must be numbers")
+            if not description:
+                raise ValueError("item description is required")
+            # NaN and Infinity parse, but would raise InvalidOperation on the comparisons below
+            if not quantity.is_finite() or not rate.is_finite():
+                raise ValueError("item quantity and rate must be finite numbers")
+            if quantity <= 0 or rate < 0:
+                raise ValueError("item quantity must be positive and rate not negative")
+            if max(quantity, rate, quantity * rate) > MAX_AMOUNT:
+                raise ValueError(f"item quantity, rate and amount must be at most {MAX_AMOUNT}")
+            items.append({
+                "description": description,
+                "quantity": quantity,
+                "rate": rate,
+                "amount": (quantity * rate).quantize(CENTS),
+            })
+        if not items:
+            raise ValueError("an invoice needs at least one item")
+        if sum(item["amount"] for item in items) > MAX_AMOUNT:
+            raise ValueError(f"invoice total must be at most {MAX_AMOUNT}")
+
+        self._seen_numbers.add(number)
+        return {
+            "id": uuid.uuid4(),
+            "invoice_number": number,
+            "client_name": client,
+            "client_email": data.get("clientEmail") or None,
+            "client_phone": data.get("clientPhone") or None,
+            "issue_date": issue,
+            "due_date": due,
+            "notes": data.get("notes") or None,
+            "total_amount": sum(item["amount"] for item in items),
+            "items": items,
+        }
+
+    # --- Writing ---------------------------------------------------------
+
+    def run(self, source: Iterable[Tuple[int, dict]]) -> dict:
+        batch = []
+        for position, data in source:
+            try:
+                batch.append((position, self.validate(data)))
+            except ValueError as e:
+                self._error(position, data.get("invoiceNumber") if isinstance(data, dict) else None, str(e))
+                continue
+            if len(batch) >= settings.INVOICE_IMPORT_BATCH_SIZE:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+
+        metrics.inc("invoices_imported_total", self.created)
+        logger.info(f"Imported {self.created} invoices for {self.merchant_id}, {len(self.errors)} rejected")
+        return {
+            "created": self.created,
+            "failed": len(self.errors),
+            "errors": self.errors[:settings.INVOICE_IMPORT_MAX_ERRORS],
+            "errors_truncated": len(self.errors) > settings.INVOICE_IMPORT_MAX_ERRORS,
+        }
+
+    def _write_batch(self, batch: List[Tuple[int, dict]]):
+        # 1. Numbers the merchant already has, checked for the whole batch at once
+        existing = set(self.db.execute(text("""
+            SELECT invoice_number FROM ledger.invoices
+            WHERE merchant_id = :mid AND invoice_number = ANY(:numbers)
+        """), {"mid": self.merchant_id, "numbers": [inv["invoice_number"] for _, inv in batch]}).scalars())
+
+        fresh = []
+        for position, inv in batch:
+            if inv["invoice_number"] in existing:
+                self._error(position, inv["invoice_number"], "invoiceNumber already exists")
+            else:
+                fresh.append((position, inv))
+        if not fresh:
+            return
+
+        # 2. Whole batch in two statements; on a DB error, retry row by row to isolate it
+        try:
+            with self.db.begin_nested():
+                self._insert([inv for _, inv in fresh])
+            self.db.commit()
+            self.created += len(fresh)
+        except Exception as e:
+            logger.warning(f"Batch insert failed ({e}); retrying {len(fresh)} invoices individually")
+            for position, inv in fresh:
+                try:
+                    with self.db.begin_nested():
+                        self._insert([inv])
+                    self.created += 1
+                except Exception as row_error:
+                    self._error(position, inv["invoice_number"], str(getattr(row_error, "orig", row_error)))
+            self.db.commit()
+
+    def _insert(self, invoices: List[dict]):
+        self.db.execute(text("""
+            INSERT INTO ledger.invoices
+                (id, merchant_id, invoice_number, client_name, client_email, client_phone,
+                 issue_date, due_date, notes, total_amount)
+            SELECT id, :mid, invoice_number, client_name, client_email, client_phone,
+                   issue_date, due_date, notes, total_amount
+            FROM unnest(
+                CAST(:ids AS UUID[]), CAST(:numbers AS TEXT[]), CAST(:clients AS TEXT[]),
+                CAST(:emails AS TEXT[]), CAST(:phones AS TEXT[]), CAST(:issued AS DATE[]),
+                CAST(:due AS DATE[]), CAST(:notes AS TEXT[]), CAST(:totals AS NUMERIC[])
+            ) AS v(id, invoice_number, client_name, client_email, client_phone,
+                   issue_date, due_date, notes, total_amount)
+        """), {
+            "mid": self.merchant_id,
+            "ids": [str(inv["id"]) for inv in invoices],
+            "numbers": [inv["invoice_number"] for inv in invoices],
+            "clients": [inv["client_name"] for inv in invoices],
+            "emails": [inv["client_email"] for inv in invoices],
+            "phones": [inv["client_phone"] for inv in invoices],
+            "issued": [inv["issue_date"] for inv in invoices],
+            "due": [inv["due_date"] for inv in invoices],
+            "notes": [inv["notes"] for inv in invoices],
+            "totals": [inv["total_amount"] for inv in invoices],
+        })
+
+        items = [(inv["id"], item) for inv in invoices for item in inv["items"]]
+        self.db.execute(text("""
+            INSERT INTO ledger.invoice_items (invoice_id, description, quantity, rate, amount)
+            SELECT * FROM unnest(
+                CAST(:invoice_ids AS UUID[]), CAST(:descriptions AS TEXT[]),
+                CAST(:quantities AS NUMERIC[]), CAST(:rates AS NUMERIC[]), CAST(:amounts AS NUMERIC[])
+            )
+        """), {
+            "invoice_ids": [str(invoice_id) for invoice_id, _ in items],
+            "descriptions": [item["description"] for _, item in items],
+            "quantities": [item["quantity"] for _, item in items],
+            "rates": [item["rate"] for _, item in items],
+            "amounts": [item["amount"] for _, item in items],
+        })
+
+    def _error(self, position: int, invoice_number, message: str):
+        self.errors.append({"row": position, "invoice_number": invoice_number, "error": message})
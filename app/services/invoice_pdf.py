@@ -0,0 +1,156 @@
+import io
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from fpdf import FPDF
+
+from app.config import settings
+from app.core.cache import TTLCache
+from app.core.metrics import metrics
+
+logger = logging.getLogger("KwachaPoint.InvoicePdf")
+
+# Only these columns reach the PDF, so only they decide the content version
+INVOICE_FIELDS = ("invoice_number", "issue_date", "due_date", "client_name", "client_email", "total_amount")
+ITEM_FIELDS = ("description", "quantity", "rate", "amount")
+
+
+def render_invoice_pdf(invoice: dict, items: List[dict]) -> bytes:
+    """Builds the invoice PDF. Module-level and DB-free so it can run in a worker process."""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 16)
+
+    pdf.cell(0, 10, f"INVOICE: {invoice['invoice_number']}", ln=True)
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(0, 10, f"Date: {invoice['issue_date']} | Due: {invoice['due_date']}", ln=True)
+    pdf.ln(10)
+
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "Bill To:", ln=True)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.cell(0, 10, f"{invoice['client_name']}", ln=True)
+    pdf.cell(0, 10, f"Email: {invoice['client_email'] or 'N/A'}", ln=True)
+    pdf.ln(10)
+
+    pdf.set_fill_color(240, 240, 240)
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.cell(100, 10, "Description", border=1, fill=True)
+    pdf.cell(30, 10, "Qty", border=1, fill=True)
+    pdf.cell(30, 10, "Rate", border=1, fill=True)
+    pdf.cell(30, 10, "Total", border=1, fill=True, ln=True)
+
+    pdf.set_font("Helvetica", "", 10)
+    for item in items:
+        pdf.cell(100, 10, item['description'], border=1)
+        pdf.cell(30, 10, str(item['quantity']), border=1)
+        pdf.cell(30, 10, f"{item['rate']:,.2f}", border=1)
+        pdf.cell(30, 10, f"{item['amount']:,.2f}", border=1, ln=True)
+
+    pdf.ln(5)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(160, 10, "GRAND TOTAL (MWK):", align="R")
+    pdf.cell(30, 10, f"{invoice['total_amount']:,.2f}", align="R", ln=True)
+
+    return bytes(pdf.output())
+
+
+class InvoicePdfRenderer:
+    """Renders invoice PDFs in a process pool and caches them by content version.
+
+    The cache key is (invoice id, hash of the printed fields). Any edit to the
+    invoice or its items produces a new key, so no explicit invalidation is
+    needed; stale versions age out of the LRU.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache("invoice_pdfs", settings.PDF_CACHE_SIZE, settings.PDF_CACHE_TTL)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: workers start clean instead of inheriting DB sockets and threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @staticmethod
+    def content_version(invoice: dict, items: List[dict]) -> str:
+        printed = {
+            "invoice": [invoice[f] for f in INVOICE_FIELDS],
+            "items": [[item[f] for f in ITEM_FIELDS] for item in items],
+        }
+        return hashlib.sha256(json.dumps(printed, default=str).encode()).hexdigest()[:16]
+
+    async def render(self, invoice: dict, items: List[dict]) -> bytes:
+        key = (str(invoice["id"]), self.content_version(invoice, items))
+        pdf = self._cache.get(key)
+        if pdf is None:
+            printable = {f: invoice[f] for f in INVOICE_FIELDS}
+            printable_items = [{f: item[f] for f in ITEM_FIELDS} for item in items]
+            started = time.perf_counter()
+            pdf = await asyncio.get_running_loop().run_in_executor(
+                self.pool, render_invoice_pdf, printable, printable_items
+            )
+            metrics.observe("invoice_pdf_render_seconds", time.perf_counter() - started)
+            self._cache.set(key, pdf)
+        return pdf
+
+    async def zip_stream(self, fetch_window: Callable[[Optional[tuple]], Awaitable[list]]) -> AsyncIterator[bytes]:
+        """Yields a ZIP of invoice PDFs as it is built.
+
+        fetch_window(after) returns the next [(invoice, items), ...] window
+        following the `after` position (None for the first). Each window is
+        rendered in parallel across the pool; only one window is in memory.
+        """
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            after = None
+            while True:
+                window = await fetch_window(after)
+                if not window:
+                    break
+
+                pdfs = await asyncio.gather(*(self.render(invoice, items) for invoice, items in window))
+                for (invoice, _), pdf in zip(window, pdfs):
+                    archive.writestr(f"Invoice_{invoice['invoice_number']}_{str(invoice['id'])[:8]}.pdf", pdf)
+                    yield sink.drain()
+
+                last = window[-1][0]
+                after = (last["issue_date"], last["id"])
+        yield sink.drain()
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that ZipFile writes into and the response drains."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+invoice_pdfs = InvoicePdfRenderer()
@@ -0,0 +1,188 @@
+import io
+import csv
+import time
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.system_accounts import SystemAccounts
+
+logger = logging.getLogger("KwachaPoint.LedgerPoster")
+
+ZERO = Decimal("0")
+# ledger_entries amounts are NUMERIC(20, 4)
+PRECISION = Decimal("0.0001")
+
+
+class UnbalancedJournalError(ValueError):
+    pass
+
+
+class UnknownAccountError(ValueError):
+    """A line's account has no balance row (neither a merchant nor a system account slot)."""
+    pass
+
+
+@dataclass
+class JournalLine:
+    account_id: Optional[str]  # None: the transaction's merchant, resolved in SQL (see LedgerService)
+    debit: Decimal = ZERO
+    credit: Decimal = ZERO
+
+
+@dataclass
+class Journal:
+    """All the ledger lines of one transaction. Debits must equal credits."""
+    transaction_id: str
+    lines: List[JournalLine] = field(default_factory=list)
+
+    def debit(self, account_id, amount: Decimal):
+        self.lines.append(JournalLine(account_id, debit=Decimal(amount)))
+        return self
+
+    def credit(self, account_id, amount: Decimal):
+        self.lines.append(JournalLine(account_id, credit=Decimal(amount)))
+        return self
+
+    def validate(self):
+        if not self.lines:
+            raise UnbalancedJournalError(f"{self.transaction_id}: journal has no lines")
+        for line in self.lines:
+            if line.debit < 0 or line.credit < 0:
+                raise UnbalancedJournalError(f"{self.transaction_id}: negative amount on {line.account_id}")
+            if line.debit and line.credit:
+                raise UnbalancedJournalError(f"{self.transaction_id}: line both debits and credits {line.account_id}")
+            if line.debit != line.debit.quantize(PRECISION) or line.credit != line.credit.quantize(PRECISION):
+                raise UnbalancedJournalError(f"{self.transaction_id}: amount finer than 4 decimal places")
+        debits = sum((line.debit for line in self.lines), ZERO)
+        credits = sum((line.credit for line in self.lines), ZERO)
+        if debits != credits:
+            raise UnbalancedJournalError(
+                f"{self.transaction_id}: debits {debits} != credits {credits} (off by {credits - debits})"
+            )
+
+
+class LedgerPoster:
+    """Writes batches of balanced journals to ledger.ledger_entries in the caller's transaction.
+
+    Every journal is checked in memory before anything is written: debits
+    equal credits, no negative or mixed lines, at most 4 decimals. The batch
+    is then written in a fixed number of statements:
+    - entries: one multi-row INSERT from unnest() arrays, or COPY once the
+      batch reaches LEDGER_COPY_THRESHOLD lines;
+    - merchant balances: the rows are locked in id order, then one UPDATE;
+    - system accounts: one UPDATE of a random slot per account.
+    A line whose account has no balance row raises UnknownAccountError
+    rather than being dropped. Nothing is committed; the caller commits.
+    """
+
+    @staticmethod
+    def validate(journals: Iterable[Journal]) -> List[Journal]:
+        journals = list(journals)
+        for journal in journals:
+            journal.validate()
+        return journals
+
+    @staticmethod
+    def post(db, journals: Iterable[Journal], apply_balances: bool = True) -> int:
+        """Validates and writes the journals. Returns the number of entries written."""
+        journals = LedgerPoster.validate(journals)
+        lines = [(journal.transaction_id, line) for journal in journals for line in journal.lines]
+        if any(line.account_id is None for _, line in lines):
+            raise UnbalancedJournalError("every line needs an account_id when posting directly")
+        if not lines:
+            return 0
+
+        started = time.perf_counter()
+        if len(lines) >= settings.LEDGER_COPY_THRESHOLD:
+            LedgerPoster._copy(db, lines)
+        else:
+            db.execute(text(f"""
+                INSERT INTO ledger.ledger_entries (transaction_id, account_id, debit, credit)
+                {LedgerPoster.ENTRIES_SELECT}
+            """), LedgerPoster.entry_params(journals))
+
+        if apply_balances:
+            LedgerPoster.apply_balances(db, LedgerPoster.balance_deltas(journals))
+
+        metrics.inc("ledger_entries_posted_total", len(lines))
+        metrics.observe("ledger_post_seconds", time.perf_counter() - started)
+        return len(lines)
+
+    # --- Building blocks, also used inside LedgerService's posting statement ---
+
+    # Rows of the entry arrays; account_id is NULL where a line left it to SQL
+    ENTRIES_SELECT = """
+        SELECT e.transaction_id, e.account_id, e.debit, e.credit
+        FROM unnest(
+            CAST(:entry_tx_ids AS TEXT[]), CAST(:entry_accounts AS UUID[]),
+            CAST(:entry_debits AS NUMERIC[]), CAST(:entry_credits AS NUMERIC[])
+        ) AS e(transaction_id, account_id, debit, credit)
+    """
+
+    @staticmethod
+    def entry_params(journals: Iterable[Journal]) -> dict:
+        lines = [(journal.transaction_id, line) for journal in journals for line in journal.lines]
+        return {
+            "entry_tx_ids": [tx_id for tx_id, _ in lines],
+            "entry_accounts": [str(line.account_id) if line.account_id else None for _, line in lines],
+            "entry_debits": [line.debit for _, line in lines],
+            "entry_credits": [line.credit for _, line in lines],
+        }
+
+    @staticmethod
+    def balance_deltas(journals: Iterable[Journal]) -> Dict[str, Decimal]:
+        """Net (credit - debit) per account across the batch; lines without an account are skipped."""
+        deltas = defaultdict(lambda: ZERO)
+        for journal in journals:
+            for line in journal.lines:
+                if line.account_id is not None:
+                    deltas[str(line.account_id)] += line.credit - line.debit
+        return {account: delta for account, delta in deltas.items() if delta}
+
+    @staticmethod
+    def apply_balances(db, deltas: Dict[str, Decimal]):
+        system = {acc: d for acc, d in deltas.items() if acc in SystemAccounts.SLOTTED}
+        merchants = sorted((acc, d) for acc, d in deltas.items() if acc not in SystemAccounts.SLOTTED)
+
+        if merchants:
+            # Locked in id order, so concurrent posters can't deadlock on each other's merchants
+            found = set(str(acc) for acc in db.execute(text("""
+                SELECT id FROM ledger.merchants WHERE id = ANY(CAST(:accounts AS UUID[])) ORDER BY id FOR UPDATE
+            """), {"accounts": [acc for acc, _ in merchants]}).scalars())
+            missing = [acc for acc, _ in merchants if acc.lower() not in found]
+            if missing:
+                raise UnknownAccountError(f"no ledger.merchants row for {', '.join(missing)}")
+            db.execute(text("""
+                UPDATE ledger.merchants m
+                SET balance = m.balance + d.delta
+                FROM unnest(CAST(:accounts AS UUID[]), CAST(:deltas AS NUMERIC[])) AS d(account_id, delta)
+                WHERE m.id = d.account_id
+            """), {"accounts": [acc for acc, _ in merchants], "deltas": [d for _, d in merchants]})
+        if system and SystemAccounts.adjust_many(db, system) != len(system):
+            raise UnknownAccountError(f"missing balance slots for one of {', '.join(sorted(system))}")
+
+    @staticmethod
+    def _copy(db, lines):
+        """COPY through the session's own DBAPI connection, so it stays in the caller's transaction."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for tx_id, line in lines:
+            writer.writerow((tx_id, line.account_id, line.debit, line.credit))
+        buffer.seek(0)
+
+        connection = db.connection() if isinstance(db, Session) else db
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY ledger.ledger_entries (transaction_id, account_id, debit, credit) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
@@ -1,72 +1,162 @@
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from sqlalchemy import text
-import uuid
+from app.services.system_accounts import SystemAccounts
+from app.services.fee_schedule import FeeSchedule
+from app.services.ledger_poster import Journal, LedgerPoster, UnknownAccountError
+from app.services.partitions import ACTIVE_OR_SINCE, ACTIVE_TRANSACTIONS
+
+# A transaction stays open until a confirmation (webhook, inbox, stale sweep)
+# settles it: PENDING before the push, PROCESSING once the provider has
+# prompted the customer. Only open transactions are posted or failed.
+OPEN_STATUSES = ("PENDING", "PROCESSING")
+AWAITING_CONFIRMATION = "status IN ('PENDING', 'PROCESSING')"
 
 class FeeService:
     @staticmethod
-    def calculate_fees(amount: Decimal):
-        # 1.5% Total Fee
-        total_fee = (amount * Decimal("0.015")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        # 0.5% Provider Cost (what Airtel/TNM charges)
-        provider_cost = (amount * Decimal("0.005")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        
-        merchant_credit = amount - total_fee
-        our_revenue = total_fee - provider_cost
-        
+    def calculate_fees(amount: Decimal, provider: str = None):
+        """Posting view of FeeSchedule: what the merchant, the platform and the provider each get."""
+        fees = FeeSchedule.for_amount(amount, provider)
         return {
-            "merchant_credit": merchant_credit,
-            "our_commission": our_revenue,
-            "provider_expense": provider_cost
+            "merchant_credit": fees["net"],
+            "our_commission": fees["revenue"],
+            "provider_expense": fees["provider_cost"]
         }
 
 class LedgerService:
+    REVENUE_ACC_ID = SystemAccounts.REVENUE
+
+    # Status transition, balance updates and the payment's journal in one
+    # statement: one network round trip, row locks held for a single statement.
+    # Only an open transaction moves, so a replayed webhook posts nothing.
+    # The journal comes from LedgerPoster's arrays; its merchant lines carry a
+    # NULL account, filled in here from the transaction's merchant_id.
+    POST_PAYMENT_SQL = text(f"""
+        WITH tx AS (
+            UPDATE ledger.transactions
+            SET status = 'SUCCESS',
+                completed_at = CURRENT_TIMESTAMP
+            WHERE id = :tx_id AND {AWAITING_CONFIRMATION} AND {ACTIVE_OR_SINCE}
+            RETURNING id, merchant_id
+        ),
+        merchant_credit AS (
+            UPDATE ledger.merchants m
+            SET balance = m.balance + CAST(:merchant_credit AS NUMERIC)
+            FROM tx
+            WHERE m.id = tx.merchant_id
+            RETURNING m.id
+        ),
+        system_balances AS (
+            -- A random slot of each system account, not one platform-wide hot row
+            UPDATE ledger.system_account_slots s
+            SET balance = s.balance + d.delta
+            FROM unnest(
+                CAST(:system_accounts AS UUID[]), CAST(:system_deltas AS NUMERIC[]), CAST(:system_slots AS INT[])
+            ) AS d(account_id, delta, slot)
+            WHERE s.account_id = d.account_id AND s.slot = d.slot
+              AND EXISTS (SELECT 1 FROM tx)
+            RETURNING s.account_id
+        ),
+        entries AS (
+            INSERT INTO ledger.ledger_entries (transaction_id, account_id, debit, credit)
+            SELECT tx.id, COALESCE(e.account_id, tx.merchant_id), e.debit, e.credit
+            FROM ({LedgerPoster.ENTRIES_SELECT}) e
+            JOIN tx ON tx.id = e.transaction_id
+            RETURNING id
+        )
+        SELECT tx.merchant_id,
+               (SELECT COUNT(*) FROM merchant_credit) AS merchants_credited,
+               (SELECT COUNT(*) FROM system_balances) AS system_accounts_credited,
+               (SELECT COUNT(*) FROM entries) AS entries_written
+        FROM tx
+    """)
+
     @staticmethod
-    def record_successful_payment(db, transaction_id: str, amount: Decimal):
-        fees = FeeService.calculate_fees(amount)
-        REVENUE_ACC_ID = '00000000-0000-0000-0000-000000000000'
-        
-        try:
-            db.execute(text("""
-                UPDATE ledger.transactions 
-                SET status = 'SUCCESS', 
-                    completed_at = CURRENT_TIMESTAMP
-                WHERE id = :id AND status = 'PENDING'
-            """), {"id": transaction_id})
+    def payment_journal(transaction_id: str, amount: Decimal, provider: str = None, merchant_id=None) -> Journal:
+        """The balanced journal of a successful payment.
 
-            result = db.execute(text(
-                "SELECT merchant_id FROM ledger.transactions WHERE id = :id"
-            ), {"id": transaction_id}).fetchone()
-            
-            if not result:
-                raise ValueError(f"Transaction {transaction_id} not found")
-            
-            merchant_id = result.merchant_id
+        Without merchant_id the merchant line has account None, for POST_PAYMENT_SQL to fill in.
 
-            db.execute(text("""
-                UPDATE ledger.merchants 
-                SET balance = balance + :amt 
-                WHERE id = :m_id
-            """), {"amt": fees['merchant_credit'], "m_id": merchant_id})
+        The provider collected the gross into clearing. The merchant is owed
+        the net, and the platform earns the fee. The provider's cut is an
+        expense, taken out of clearing.
+        """
+        fees = FeeSchedule.for_amount(amount, provider)
+        journal = Journal(transaction_id)
+        journal.debit(SystemAccounts.PROVIDER_CLEARING, fees["gross"])
+        journal.credit(merchant_id, fees["net"])
+        if fees["fee"]:
+            journal.credit(SystemAccounts.REVENUE, fees["fee"])
+        if fees["provider_cost"]:
+            journal.debit(SystemAccounts.PROVIDER_EXPENSE, fees["provider_cost"])
+            journal.credit(SystemAccounts.PROVIDER_CLEARING, fees["provider_cost"])
+        return journal
 
-            db.execute(text("""
-                UPDATE ledger.merchants 
-                SET balance = balance + :rev_amt 
-                WHERE id = :rev_id
-            """), {"rev_amt": fees['our_commission'], "rev_id": REVENUE_ACC_ID})
+    @staticmethod
+    def post_successful_payment(db, transaction_id: str, amount: Decimal, provider: str = None, created_at=None):
+        """Runs the posting statement without committing; returns the posted row or None.
+
+        Without created_at only transactions inside the active window are found.
+        """
+        journal = LedgerService.payment_journal(transaction_id, amount, provider)
+        journal.validate()
+        system = sorted(LedgerPoster.balance_deltas([journal]).items())
+        return db.execute(LedgerService.POST_PAYMENT_SQL, {
+            "tx_id": transaction_id,
+            "created_at": created_at,
+            "merchant_credit": FeeSchedule.for_amount(amount, provider)["net"],
+            "system_accounts": [acc for acc, _ in system],
+            "system_deltas": [delta for _, delta in system],
+            "system_slots": [SystemAccounts.random_slot() for _ in system],
+            **LedgerPoster.entry_params([journal]),
+        }).fetchone()
+
+    @staticmethod
+    def post_successful_payments(db, payments) -> set:
+        """Batch form of post_successful_payment for (transaction_id, amount, provider) tuples.
+
+        Every still-open transaction moves to SUCCESS in one statement, and
+        their journals go through LedgerPoster together. Returns the ids that
+        were posted. Nothing is committed.
+        """
+        payments = {tx_id: (amount, provider) for tx_id, amount, provider in payments}
+        if not payments:
+            return set()
+        # Row locks in id order, so concurrent batches can't deadlock on a shared transaction
+        db.execute(text(f"""
+            SELECT id FROM ledger.transactions
+            WHERE id = ANY(:ids) AND {AWAITING_CONFIRMATION} AND {ACTIVE_TRANSACTIONS}
+            ORDER BY id
+            FOR UPDATE
+        """), {"ids": list(payments)})
+        settled = db.execute(text(f"""
+            UPDATE ledger.transactions
+            SET status = 'SUCCESS',
+                completed_at = CURRENT_TIMESTAMP
+            WHERE id = ANY(:ids) AND {AWAITING_CONFIRMATION} AND {ACTIVE_TRANSACTIONS}
+            RETURNING id, merchant_id
+        """), {"ids": list(payments)}).fetchall()
 
-            db.execute(text("""
-                INSERT INTO ledger.ledger_entries (transaction_id, account_id, credit, debit)
-                VALUES (:tx_id, :acc_id, :amt, 0)
-            """), {"tx_id": transaction_id, "acc_id": merchant_id, "amt": fees['merchant_credit']})
+        orphans = [row.id for row in settled if row.merchant_id is None]
+        if orphans:
+            raise UnknownAccountError(f"no merchant on {', '.join(orphans)}")
+        LedgerPoster.post(db, [
+            LedgerService.payment_journal(row.id, *payments[row.id], merchant_id=str(row.merchant_id))
+            for row in settled
+        ])
+        return {row.id for row in settled}
+
+    @staticmethod
+    def record_successful_payment(db, transaction_id: str, amount: Decimal, provider: str = None):
+        """Posts a successful payment. Returns False if the transaction was no longer open."""
+        fees = FeeService.calculate_fees(amount, provider)
+        
+        try:
+            posted = LedgerService.post_successful_payment(db, transaction_id, amount, provider)
 
-            db.execute(text("""
-                INSERT INTO ledger.ledger_entries (transaction_id, account_id, credit, debit)
-                VALUES (:tx_id, :acc_id, :amt, 0)
-            """), {
-                "tx_id": transaction_id, 
-                "acc_id": REVENUE_ACC_ID,
-                "amt": fees['our_commission']
-            })
+            if not posted:
+                db.rollback()
+                print(f"Ledger: {transaction_id} not found or already processed")
+                return False
 
             db.commit()
             print(f"Balances Synced: Merchant +{fees['merchant_credit']}, Revenue +{fees['our_commission']}")
@@ -75,4 +165,4 @@ class LedgerService:
         except Exception as e:
             db.rollback()
             print(f"Ledger Error: {e}")
-            raise e
\ No newline at end of file
+            raise e
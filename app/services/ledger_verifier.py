@@ -0,0 +1,202 @@
+import logging
+from datetime import timedelta
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.database import get_engine
+from app.core.metrics import metrics
+
+logger = logging.getLogger("KwachaPoint.LedgerVerifier")
+
+CHECKPOINT = "ledger_integrity"
+
+class LedgerVerifier:
+    """Checkpointed double-entry verification of ledger.ledger_entries.
+
+    Each run handles only the entries after the stored (created_at, id)
+    watermark:
+    1. It folds them into per-account, per-period running totals
+       (ledger.ledger_period_totals).
+    2. It flags every transaction in the batch whose credits and debits
+       differ, with the net per account.
+    3. It re-checks each period the batch touched.
+    Findings go to ledger.ledger_integrity_findings, naming the account and
+    period window. Batches end on a created_at boundary, and entries newer
+    than LEDGER_VERIFY_SETTLE_SECONDS wait for the next run. That way a
+    transaction's entries are never split across batches.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine("background")
+        self.period = settings.LEDGER_VERIFY_PERIOD
+
+    def run(self) -> dict:
+        """Verifies batches until caught up to the settle horizon."""
+        report = {"entries": 0, "batches": 0, "findings": []}
+        while True:
+            with self.engine.begin() as conn:
+                batch = self.verify_batch(conn)
+            if batch is None:
+                break
+            report["entries"] += batch["entries"]
+            report["batches"] += 1
+            report["findings"].extend(batch["findings"])
+
+        metrics.inc("ledger_entries_verified_total", report["entries"])
+        if report["findings"]:
+            for finding in report["findings"]:
+                logger.error(
+                    f"CRITICAL INTEGRITY FAILURE: {finding['kind']} {finding.get('transaction_id') or ''} "
+                    f"account {finding.get('account_id') or '*'} "
+                    f"[{finding['period_start']} .. {finding['period_end']}) off by {finding['imbalance']} MWK"
+                )
+        else:
+            logger.info(f"Ledger Integrity Verified: {report['entries']} new entries balanced")
+        return report
+
+    def verify_batch(self, conn):
+        """One batch in the caller's transaction. Returns None when there is nothing to verify."""
+        # 1. Checkpoint row, locked so two verifiers never fold the same entries
+        conn.execute(text("""
+            INSERT INTO ledger.ledger_checkpoints (name) VALUES (:name) ON CONFLICT DO NOTHING
+        """), {"name": CHECKPOINT})
+        mark = conn.execute(text("""
+            SELECT watermark_created_at, watermark_id FROM ledger.ledger_checkpoints
+            WHERE name = :name FOR UPDATE
+        """), {"name": CHECKPOINT}).fetchone()
+
+        after = "(created_at, id) > (:wm_created_at, :wm_id)" if mark.watermark_created_at else "TRUE"
+        params = {
+            "wm_created_at": mark.watermark_created_at,
+            "wm_id": mark.watermark_id,
+            "settle": timedelta(seconds=settings.LEDGER_VERIFY_SETTLE_SECONDS),
+            "batch": settings.LEDGER_VERIFY_BATCH_SIZE,
+            "period": self.period,
+        }
+
+        # 2. Batch upper bound: the created_at of the Nth pending entry, all of its ties included
+        bound = conn.execute(text(f"""
+            SELECT
+                (SELECT created_at FROM ledger.ledger_entries
+                 WHERE {after} AND created_at < NOW() - :settle
+                 ORDER BY created_at, id OFFSET :batch - 1 LIMIT 1) AS nth,
+                NOW() - :settle AS horizon
+        """), params).fetchone()
+        if bound.nth is not None:
+            window = f"{after} AND created_at <= :upper"
+            params["upper"] = bound.nth
+        else:
+            window = f"{after} AND created_at < :upper"
+            params["upper"] = bound.horizon
+
+        # 3. Fold the batch into running totals and advance the watermark, in one statement
+        folded = conn.execute(text(f"""
+            WITH batch AS (
+                SELECT id, account_id, created_at, debit, credit
+                FROM ledger.ledger_entries
+                WHERE {window}
+            ),
+            totals AS (
+                INSERT INTO ledger.ledger_period_totals AS t (account_id, period_start, debit, credit, entries)
+                SELECT account_id, date_trunc(:period, created_at), SUM(debit), SUM(credit), COUNT(*)
+                FROM batch
+                GROUP BY 1, 2
+                ORDER BY 1, 2
+                ON CONFLICT (account_id, period_start) DO UPDATE SET
+                    debit = t.debit + EXCLUDED.debit,
+                    credit = t.credit + EXCLUDED.credit,
+                    entries = t.entries + EXCLUDED.entries
+                RETURNING period_start
+            ),
+            last AS (
+                SELECT created_at, id FROM batch ORDER BY created_at DESC, id DESC LIMIT 1
+            ),
+            advanced AS (
+                UPDATE ledger.ledger_checkpoints c
+                SET watermark_created_at = last.created_at, watermark_id = last.id, updated_at = NOW()
+                FROM last
+                WHERE c.name = :name
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM batch) AS entries,
+                   (SELECT array_agg(DISTINCT period_start) FROM totals) AS periods,
+                   (SELECT COUNT(*) FROM advanced) AS advanced
+        """), {**params, "name": CHECKPOINT}).fetchone()
+
+        if not folded.entries:
+            return None
+
+        findings = self._unbalanced_transactions(conn, window, params) + \
+            self._unbalanced_periods(conn, folded.periods or [])
+        self._record(conn, findings)
+        return {"entries": folded.entries, "findings": findings}
+
+    def _unbalanced_transactions(self, conn, window: str, params: dict) -> list:
+        """Each transaction must net to zero; report every account it touched when it doesn't."""
+        rows = conn.execute(text(f"""
+            WITH batch AS (
+                SELECT transaction_id, account_id, created_at, debit, credit
+                FROM ledger.ledger_entries
+                WHERE {window}
+            ),
+            off AS (
+                SELECT transaction_id FROM batch
+                GROUP BY transaction_id
+                HAVING SUM(credit) <> SUM(debit)
+                LIMIT 1000
+            )
+            SELECT b.transaction_id, b.account_id,
+                   date_trunc(:period, MIN(b.created_at)) AS period_start,
+                   SUM(b.credit) - SUM(b.debit) AS imbalance
+            FROM batch b JOIN off USING (transaction_id)
+            GROUP BY b.transaction_id, b.account_id
+            ORDER BY period_start, b.transaction_id
+        """), params).fetchall()
+        return [self._finding("TRANSACTION", row.period_start, row.imbalance,
+                              transaction_id=row.transaction_id, account_id=row.account_id) for row in rows]
+
+    def _unbalanced_periods(self, conn, periods: list) -> list:
+        """A touched period must net to zero across all accounts; name the accounts that don't."""
+        if not periods:
+            return []
+        rows = conn.execute(text("""
+            WITH off AS (
+                SELECT period_start FROM ledger.ledger_period_totals
+                WHERE period_start = ANY(:periods)
+                GROUP BY period_start
+                HAVING SUM(credit) <> SUM(debit)
+            )
+            SELECT t.period_start, t.account_id, t.credit - t.debit AS imbalance
+            FROM ledger.ledger_period_totals t JOIN off USING (period_start)
+            WHERE t.credit <> t.debit
+            ORDER BY t.period_start, ABS(t.credit - t.debit) DESC
+        """), {"periods": periods}).fetchall()
+        return [self._finding("PERIOD", row.period_start, row.imbalance, account_id=row.account_id) for row in rows]
+
+    def _finding(self, kind: str, period_start, imbalance, transaction_id=None, account_id=None) -> dict:
+        return {
+            "kind": kind,
+            "period_start": period_start,
+            "period_end": period_start + self._period_length(),
+            "transaction_id": transaction_id,
+            "account_id": account_id,
+            "imbalance": imbalance,
+        }
+
+    def _period_length(self) -> timedelta:
+        return {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}[self.period]
+
+    @staticmethod
+    def _record(conn, findings: list):
+        if findings:
+            conn.execute(text("""
+                INSERT INTO ledger.ledger_integrity_findings
+                    (kind, period_start, period_end, transaction_id, account_id, imbalance)
+                VALUES (:kind, :period_start, :period_end, :transaction_id, :account_id, :imbalance)
+            """), findings)
+
+
+if __name__ == "__main__":
+    # python -m app.services.ledger_verifier  (first run folds the whole history, batch by batch)
+    logging.basicConfig(level=logging.INFO)
+    LedgerVerifier().run()
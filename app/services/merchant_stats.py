@@ -0,0 +1,175 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_engine
+from app.db.triggers import ensure_trigger
+
+logger = logging.getLogger("KwachaPoint.MerchantStats")
+
+class MerchantStatsService:
+    """Projection of ledger.transactions behind the merchant stats endpoints.
+
+    A row trigger adds deltas to ledger.merchant_stats_daily (per day and
+    provider) and ledger.merchant_stats (lifetime per provider) when a
+    transaction is inserted or its status changes. The stats endpoints then
+    read a handful of counter rows instead of scanning the merchant's history.
+    """
+    # The mobile money providers the dashboard always charts, even at 0
+    EMPTY_SPLIT = {"AIRTEL": 0, "TNM": 0}
+
+    @staticmethod
+    def ensure_schema(conn):
+        """Installs the trigger functions and triggers (idempotent)."""
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION ledger.merchant_stats_bump(
+                p_merchant UUID, p_day DATE, p_provider TEXT,
+                p_total INT, p_success INT, p_failed INT, p_amount NUMERIC
+            ) RETURNS void AS $$
+            BEGIN
+                INSERT INTO ledger.merchant_stats_daily AS s
+                    (merchant_id, day, provider, total_count, success_count, failed_count, success_amount)
+                VALUES (p_merchant, p_day, p_provider, p_total, p_success, p_failed, p_amount)
+                ON CONFLICT (merchant_id, day, provider) DO UPDATE SET
+                    total_count = s.total_count + EXCLUDED.total_count,
+                    success_count = s.success_count + EXCLUDED.success_count,
+                    failed_count = s.failed_count + EXCLUDED.failed_count,
+                    success_amount = s.success_amount + EXCLUDED.success_amount;
+
+                INSERT INTO ledger.merchant_stats AS s
+                    (merchant_id, provider, total_count, success_count, failed_count, success_amount)
+                VALUES (p_merchant, p_provider, p_total, p_success, p_failed, p_amount)
+                ON CONFLICT (merchant_id, provider) DO UPDATE SET
+                    total_count = s.total_count + EXCLUDED.total_count,
+                    success_count = s.success_count + EXCLUDED.success_count,
+                    failed_count = s.failed_count + EXCLUDED.failed_count,
+                    success_amount = s.success_amount + EXCLUDED.success_amount;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION ledger.merchant_stats_on_transaction() RETURNS trigger AS $$
+            DECLARE
+                was_success INT := 0;
+                was_failed INT := 0;
+                was_amount NUMERIC := 0;
+            BEGIN
+                IF NEW.merchant_id IS NULL THEN
+                    RETURN NULL;
+                END IF;
+
+                -- A status change moves the row between buckets; the total only grows on insert
+                IF TG_OP = 'UPDATE' THEN
+                    was_success := (OLD.status = 'SUCCESS')::int;
+                    was_failed := (OLD.status = 'FAILED')::int;
+                    was_amount := CASE WHEN OLD.status = 'SUCCESS' THEN OLD.amount ELSE 0 END;
+                END IF;
+
+                PERFORM ledger.merchant_stats_bump(
+                    NEW.merchant_id,
+                    CAST(COALESCE(NEW.created_at, NOW()) AS DATE),
+                    COALESCE(NEW.provider, 'UNKNOWN'),
+                    (TG_OP = 'INSERT')::int,
+                    (NEW.status = 'SUCCESS')::int - was_success,
+                    (NEW.status = 'FAILED')::int - was_failed,
+                    CASE WHEN NEW.status = 'SUCCESS' THEN NEW.amount ELSE 0 END - was_amount
+                );
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        ensure_trigger(conn, "ledger.transactions", "trg_merchant_stats_insert", """
+            AFTER INSERT ON ledger.transactions
+            FOR EACH ROW EXECUTE FUNCTION ledger.merchant_stats_on_transaction()
+        """)
+        ensure_trigger(conn, "ledger.transactions", "trg_merchant_stats_status", """
+            AFTER UPDATE OF status ON ledger.transactions
+            FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+            EXECUTE FUNCTION ledger.merchant_stats_on_transaction()
+        """)
+
+    @staticmethod
+    def backfill(conn, merchant_id=None):
+        """Rebuilds the counters from ledger.transactions (all merchants, or one).
+
+        Takes a SHARE lock on ledger.transactions so no trigger delta lands
+        between the wipe and the rebuild; writers wait until it commits.
+        """
+        scope = "WHERE merchant_id = :mid" if merchant_id else ""
+        params = {"mid": str(merchant_id)} if merchant_id else {}
+
+        conn.execute(text("LOCK TABLE ledger.transactions IN SHARE MODE"))
+        conn.execute(text(f"DELETE FROM ledger.merchant_stats_daily {scope}"), params)
+        conn.execute(text(f"DELETE FROM ledger.merchant_stats {scope}"), params)
+
+        # 1. Daily buckets straight from the transactions
+        daily = conn.execute(text(f"""
+            INSERT INTO ledger.merchant_stats_daily
+                (merchant_id, day, provider, total_count, success_count, failed_count, success_amount)
+            SELECT merchant_id,
+                   CAST(created_at AS DATE),
+                   COALESCE(provider, 'UNKNOWN'),
+                   COUNT(*),
+                   COUNT(*) FILTER (WHERE status = 'SUCCESS'),
+                   COUNT(*) FILTER (WHERE status = 'FAILED'),
+                   COALESCE(SUM(amount) FILTER (WHERE status = 'SUCCESS'), 0)
+            FROM ledger.transactions
+            WHERE merchant_id IS NOT NULL {"AND merchant_id = :mid" if merchant_id else ""}
+            GROUP BY 1, 2, 3
+        """), params).rowcount
+
+        # 2. Lifetime counters folded from the daily buckets
+        conn.execute(text(f"""
+            INSERT INTO ledger.merchant_stats
+                (merchant_id, provider, total_count, success_count, failed_count, success_amount)
+            SELECT merchant_id, provider, SUM(total_count), SUM(success_count), SUM(failed_count), SUM(success_amount)
+            FROM ledger.merchant_stats_daily
+            {scope}
+            GROUP BY merchant_id, provider
+        """), params)
+
+        logger.info(f"Backfilled {daily} daily stat buckets")
+        return daily
+
+    @staticmethod
+    async def read(db: AsyncSession, merchant_id) -> dict:
+        """Today's sales, lifetime success rate and provider split from the counters."""
+        rows = (await db.execute(text("""
+            SELECT s.provider, s.total_count, s.success_count,
+                   (SELECT COALESCE(SUM(d.success_amount), 0)
+                    FROM ledger.merchant_stats_daily d
+                    WHERE d.merchant_id = :mid AND d.day = CURRENT_DATE) AS sales_today
+            FROM ledger.merchant_stats s
+            WHERE s.merchant_id = :mid
+        """), {"mid": merchant_id})).fetchall()
+
+        total = sum(row.total_count for row in rows)
+        succeeded = sum(row.success_count for row in rows)
+
+        # Keyed by provider code as stored on the transaction (AIRTEL, TNM, BANK_NBM, ...)
+        split = dict(MerchantStatsService.EMPTY_SPLIT)
+        for row in rows:
+            if row.success_count:
+                code = (row.provider or "UNKNOWN").upper()
+                split[code] = split.get(code, 0) + row.success_count / succeeded * 100
+
+        return {
+            "sales": float(rows[0].sales_today) if rows else 0.0,
+            "success_rate": round(succeeded / total * 100, 1) if total else 0.0,
+            "provider_split": {code: round(share, 1) for code, share in split.items()}
+        }
+
+    @staticmethod
+    async def transaction_count(db: AsyncSession, merchant_id) -> int:
+        """Lifetime transaction count, for list totals without a COUNT(*) scan."""
+        count = (await db.execute(text("""
+            SELECT COALESCE(SUM(total_count), 0) FROM ledger.merchant_stats WHERE merchant_id = :mid
+        """), {"mid": merchant_id})).scalar()
+        return int(count)
+
+
+if __name__ == "__main__":
+    # One-off rebuild after installing the trigger: python -m app.services.merchant_stats
+    logging.basicConfig(level=logging.INFO)
+    with get_engine("background").begin() as conn:
+        MerchantStatsService.backfill(conn)
@@ -0,0 +1,303 @@
+import re
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.database import get_engine
+
+logger = logging.getLogger("KwachaPoint.Partitions")
+
+PARTITIONED_TABLES = ("transactions", "ledger_entries")
+
+# Transactions only change state shortly after creation (PENDING rows are expired
+# within STALE_TX_HARD_EXPIRE_HOURS), so id lookups on the write paths are bounded
+# to this window; on the partitioned table that prunes to the latest one or two months.
+ACTIVE_TRANSACTIONS = f"created_at >= NOW() - INTERVAL '{settings.TRANSACTION_ACTIVE_DAYS} days'"
+# The same bound for a statement that may also touch an older row: a caller that
+# read the row (e.g. the stale sweep) passes its created_at as :created_at.
+ACTIVE_OR_SINCE = (
+    f"created_at >= COALESCE(CAST(:created_at AS TIMESTAMPTZ), NOW() - INTERVAL '{settings.TRANSACTION_ACTIVE_DAYS} days')"
+)
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    index = moment.year * 12 + moment.month - 1 + months
+    return moment.replace(year=index // 12, month=index % 12 + 1)
+
+
+class Partitions:
+    """Monthly range partitions on created_at for ledger.transactions and ledger.ledger_entries.
+
+    migrate() converts a live table: the existing table becomes the
+    <table>_legacy partition holding everything before next month, and
+    monthly <table>_pYYYY_MM partitions follow. ensure_schema() keeps
+    PARTITION_PREMAKE_MONTHS months created ahead; it runs from the cron
+    entry point below, not at startup, since CREATE TABLE ... PARTITION OF
+    locks the parent and a lock timeout must not abort a boot. archive_expired()
+    detaches months older than PARTITION_RETAIN_MONTHS into the
+    ledger_archive schema. Before a ledger_entries month is archived, its
+    per-account sums are folded into ledger.archived_account_totals, so
+    balances recomputed from the ledger still add up.
+    """
+
+    # --- Introspection -----------------------------------------------------
+
+    @staticmethod
+    def is_partitioned(conn, table: str) -> bool:
+        return conn.execute(text("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table p
+                JOIN pg_class c ON c.oid = p.partrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'ledger' AND c.relname = :table
+            )
+        """), {"table": table}).scalar()
+
+    @staticmethod
+    def partitions(conn, table: str) -> List[Tuple[str, Optional[datetime]]]:
+        """(partition name, exclusive upper bound) for each partition, oldest first."""
+        rows = conn.execute(text("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:parent)
+        """), {"parent": f"ledger.{table}"}).fetchall()
+        bounds = []
+        for name, bound in rows:
+            match = _UPPER_BOUND.search(bound or "")
+            bounds.append((name, datetime.fromisoformat(match.group(1)) if match else None))
+        return sorted(bounds, key=lambda p: p[1] or datetime.max.replace(tzinfo=timezone.utc))
+
+    # --- Upkeep ------------------------------------------------------------
+
+    @staticmethod
+    def ensure_schema(conn):
+        """Creates upcoming months for each partitioned table (idempotent). Unpartitioned tables are left alone."""
+        conn.execute(text("CREATE SCHEMA IF NOT EXISTS ledger_archive"))
+        for table in PARTITIONED_TABLES:
+            if Partitions.is_partitioned(conn, table):
+                Partitions.ensure_partitions(conn, table)
+            else:
+                logger.info(f"ledger.{table} is not partitioned; run `python -m app.services.partitions migrate`")
+
+    @staticmethod
+    def ensure_partitions(conn, table: str, months_ahead: int = None):
+        months_ahead = settings.PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+        # Creating a partition briefly locks the parent; give up rather than queue behind long queries
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        # Months already covered (by monthly partitions or the legacy one) are skipped
+        covered_until = max((upper for _, upper in Partitions.partitions(conn, table) if upper), default=None)
+        current = month_start(datetime.now(timezone.utc))
+        for offset in range(months_ahead + 1):
+            start = add_months(current, offset)
+            if covered_until and start < covered_until:
+                continue
+            name = f"{table}_p{start:%Y_%m}"
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS ledger.{name}
+                PARTITION OF ledger.{table}
+                FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')
+            """))
+            logger.info(f"Created partition ledger.{name}")
+
+    @staticmethod
+    def archive_expired(engine=None, retain_months: int = None) -> List[str]:
+        """Detaches every partition that ends before the retention cutoff into ledger_archive.
+
+        Partitions go whole. The <table>_legacy partition from migrate() ends
+        at the migration month, so pre-migration history stays in the live
+        table until that month expires, PARTITION_RETAIN_MONTHS after the
+        migration, and is then archived in one step.
+        """
+        engine = engine or get_engine("background")
+        retain_months = settings.PARTITION_RETAIN_MONTHS if retain_months is None else retain_months
+        cutoff = add_months(month_start(datetime.now(timezone.utc)), -retain_months)
+        archived = []
+        for table in PARTITIONED_TABLES:
+            with engine.connect() as conn:
+                if not Partitions.is_partitioned(conn, table):
+                    continue
+                expired = [name for name, upper in Partitions.partitions(conn, table) if upper and upper <= cutoff]
+            for name in expired:
+                # One transaction per partition: totals folded and partition detached atomically
+                with engine.begin() as conn:
+                    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+                    if table == "ledger_entries":
+                        Partitions._fold_archived_totals(conn, name)
+                    conn.execute(text(f"ALTER TABLE ledger.{table} DETACH PARTITION ledger.{name}"))
+                    conn.execute(text(f"ALTER TABLE ledger.{name} SET SCHEMA ledger_archive"))
+                logger.info(f"Archived ledger.{name} to ledger_archive.{name}")
+                archived.append(name)
+        return archived
+
+    @staticmethod
+    def _fold_archived_totals(conn, partition: str):
+        conn.execute(text(f"""
+            INSERT INTO ledger.archived_account_totals AS t (account_id, debit, credit, entries, archived_through)
+            SELECT account_id, SUM(debit), SUM(credit), COUNT(*), MAX(created_at)
+            FROM ledger.{partition}
+            GROUP BY account_id
+            ON CONFLICT (account_id) DO UPDATE SET
+                debit = t.debit + EXCLUDED.debit,
+                credit = t.credit + EXCLUDED.credit,
+                entries = t.entries + EXCLUDED.entries,
+                archived_through = GREATEST(t.archived_through, EXCLUDED.archived_through)
+        """))
+
+    # --- Migration ---------------------------------------------------------
+
+    @staticmethod
+    def migrate(engine=None, table: str = "transactions"):
+        """Converts ledger.<table> into a partitioned table without copying its rows.
+
+        1. Online: NOT VALID checks (created_at NOT NULL, before next month)
+           are validated without blocking writes, and a unique (id,
+           created_at) index is built concurrently.
+        2. One short transaction: the table is renamed to <table>_legacy and
+           a partitioned parent takes its name. The legacy table is attached
+           as the partition up to next month, with no scan because the checks
+           prove the bound. Months ahead are created, and the triggers move to
+           the parent.
+        3. ensure_indexes() then builds the INDEXES entries per partition.
+
+        Foreign keys that reference ledger.transactions(id) are dropped: a
+        partitioned table's unique keys must include created_at.
+
+        The history is not split by month, since that would mean copying
+        it. archive_expired() can therefore only archive the legacy partition
+        as a whole, once its last month passes the retention cutoff.
+        """
+        from app.db.indexes import ensure_indexes
+        from app.services.merchant_stats import MerchantStatsService
+        from app.services.platform_rollups import PlatformRollups
+        from app.services.product_sales import ProductSalesService
+
+        engine = engine or get_engine("background")
+        legacy = f"{table}_legacy"
+        boundary = add_months(month_start(datetime.now(timezone.utc)), 1)
+
+        with engine.connect() as conn:
+            if Partitions.is_partitioned(conn, table):
+                logger.info(f"ledger.{table} is already partitioned")
+                return
+
+        # 1. Online preparation
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"""
+                ALTER TABLE ledger.{table} ADD CONSTRAINT {table}_created_not_null
+                CHECK (created_at IS NOT NULL) NOT VALID
+            """))
+            conn.execute(text(f"""
+                ALTER TABLE ledger.{table} ADD CONSTRAINT {table}_legacy_bound
+                CHECK (created_at < '{boundary.isoformat()}') NOT VALID
+            """))
+            conn.execute(text(f"ALTER TABLE ledger.{table} VALIDATE CONSTRAINT {table}_created_not_null"))
+            conn.execute(text(f"ALTER TABLE ledger.{table} VALIDATE CONSTRAINT {table}_legacy_bound"))
+            conn.execute(text(f"""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {table}_id_created_key
+                ON ledger.{table} (id, created_at)
+            """))
+
+        # 2. The swap
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+            conn.execute(text(f"LOCK TABLE ledger.{table} IN ACCESS EXCLUSIVE MODE"))
+
+            for fk in conn.execute(text("""
+                SELECT conname, conrelid::regclass AS referencing FROM pg_constraint
+                WHERE contype = 'f' AND confrelid = to_regclass(:table)
+            """), {"table": f"ledger.{table}"}).fetchall():
+                conn.execute(text(f"ALTER TABLE {fk.referencing} DROP CONSTRAINT {fk.conname}"))
+                logger.warning(f"Dropped foreign key {fk.conname} on {fk.referencing}")
+
+            # Triggers are re-created on the parent and cloned onto every partition
+            for trigger in conn.execute(text("""
+                SELECT tgname FROM pg_trigger WHERE tgrelid = to_regclass(:table) AND NOT tgisinternal
+            """), {"table": f"ledger.{table}"}).scalars():
+                conn.execute(text(f"DROP TRIGGER {trigger} ON ledger.{table}"))
+
+            # Proven by the validated check, so no scan
+            conn.execute(text(f"ALTER TABLE ledger.{table} ALTER COLUMN created_at SET NOT NULL"))
+            conn.execute(text(f"ALTER TABLE ledger.{table} RENAME TO {legacy}"))
+            # Index names are schema-wide; the parent's indexes take the original names
+            for index in conn.execute(text("""
+                SELECT c.relname FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid
+                WHERE x.indrelid = to_regclass(:legacy)
+            """), {"legacy": f"ledger.{legacy}"}).scalars():
+                conn.execute(text(f"ALTER INDEX ledger.{index} RENAME TO {(index + '_legacy')[:63]}"))
+
+            conn.execute(text(f"""
+                CREATE TABLE ledger.{table}
+                (LIKE ledger.{legacy} INCLUDING DEFAULTS INCLUDING GENERATED)
+                PARTITION BY RANGE (created_at)
+            """))
+            conn.execute(text(f"ALTER TABLE ledger.{table} ADD PRIMARY KEY (id, created_at)"))
+            conn.execute(text(f"""
+                ALTER TABLE ledger.{table} ATTACH PARTITION ledger.{legacy}
+                FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')
+            """))
+            Partitions.ensure_partitions(conn, table)
+
+            if table == "transactions":
+                Partitions._install_idempotency_keys(conn, legacy)
+                MerchantStatsService.ensure_schema(conn)
+                PlatformRollups.ensure_schema(conn)
+                ProductSalesService.ensure_schema(conn)
+        logger.info(f"ledger.{table} is now partitioned by month; history lives in ledger.{legacy}")
+
+        # 3. Secondary indexes, partition by partition
+        ensure_indexes(engine)
+
+    @staticmethod
+    def _install_idempotency_keys(conn, legacy: str):
+        """idempotency_key can't stay UNIQUE across partitions, so a keys table enforces it."""
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS ledger.transaction_idempotency_keys (
+                idempotency_key VARCHAR(255) PRIMARY KEY,
+                transaction_id VARCHAR(50) NOT NULL
+            )
+        """))
+        conn.execute(text(f"""
+            INSERT INTO ledger.transaction_idempotency_keys (idempotency_key, transaction_id)
+            SELECT idempotency_key, id FROM ledger.{legacy} WHERE idempotency_key IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """))
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION ledger.transactions_claim_idempotency_key() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO ledger.transaction_idempotency_keys (idempotency_key, transaction_id)
+                VALUES (NEW.idempotency_key, NEW.id);
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text("DROP TRIGGER IF EXISTS trg_transactions_idempotency ON ledger.transactions"))
+        conn.execute(text("""
+            CREATE TRIGGER trg_transactions_idempotency
+            BEFORE INSERT ON ledger.transactions
+            FOR EACH ROW WHEN (NEW.idempotency_key IS NOT NULL)
+            EXECUTE FUNCTION ledger.transactions_claim_idempotency_key()
+        """))
+
+
+if __name__ == "__main__":
+    # python -m app.services.partitions migrate   (once, per table, in a quiet period)
+    # python -m app.services.partitions           (cron: create upcoming months, archive expired ones)
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine("background")
+    if sys.argv[1:2] == ["migrate"]:
+        for table in sys.argv[2:] or PARTITIONED_TABLES:
+            Partitions.migrate(engine, table)
+    else:
+        with engine.begin() as conn:
+            Partitions.ensure_schema(conn)
+        Partitions.archive_expired(engine)
@@ -0,0 +1,62 @@
+import hashlib
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.cache import TTLCache
+
+@dataclass(frozen=True)
+class CachedLink:
+    short_code: str
+    amount: Decimal
+    description: Optional[str]
+    status: str
+    merchant_name: Optional[str]
+
+    @property
+    def version(self) -> str:
+        """Changes whenever anything shown on the checkout page changes."""
+        raw = f"{self.short_code}|{self.amount}|{self.description}|{self.status}|{self.merchant_name}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+_NOT_FOUND = object()
+
+class PaymentLinkCache:
+    """Short-code -> link and merchant name, for the public checkout pages.
+
+    Unknown codes are cached too, so bots probing random codes don't reach
+    the DB. A status change made elsewhere (nothing in this service closes
+    links yet) shows within PAYMENT_LINK_CACHE_TTL; the pages' ETag is built
+    from the cached fields, so it changes with them.
+    """
+
+    def __init__(self):
+        self._links = TTLCache("payment_links", settings.PAYMENT_LINK_CACHE_SIZE, settings.PAYMENT_LINK_CACHE_TTL)
+
+    async def resolve(self, db: AsyncSession, short_code: str) -> Optional[CachedLink]:
+        link = self._links.get(short_code)
+        if link is None:
+            row = (await db.execute(text("""
+                SELECT l.short_code, l.amount, l.description, l.status,
+                       m.business_name as merchant_name
+                FROM ledger.payment_links l
+                JOIN ledger.users m ON l.merchant_id = m.id
+                WHERE l.short_code = :code
+            """), {"code": short_code})).fetchone()
+            if row is None:
+                # Short negative TTL: a code probed before it existed must not stay 404 for long
+                self._links.set(short_code, _NOT_FOUND, ttl=min(settings.PAYMENT_LINK_CACHE_TTL, 5))
+                return None
+            link = CachedLink(
+                short_code=row.short_code, amount=row.amount, description=row.description,
+                status=row.status, merchant_name=row.merchant_name
+            )
+            self._links.set(short_code, link)
+        return None if link is _NOT_FOUND else link
+
+
+payment_links = PaymentLinkCache()
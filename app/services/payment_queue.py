@@ -0,0 +1,215 @@
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from decimal import Decimal
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.database import BackgroundSessionLocal
+from app.services.checkout_service import CheckoutService
+from app.services.ledger_service import AWAITING_CONFIRMATION
+from app.services.partitions import ACTIVE_TRANSACTIONS
+
+logger = logging.getLogger("KwachaPoint.PaymentQueue")
+
+class PaymentQueue:
+    """Durable queue of provider pushes backed by ledger.payment_jobs."""
+
+    @staticmethod
+    def enqueue(db: Session, tx_id: str, provider: str, destination: str, amount: Decimal):
+        """Adds a push job. Caller commits, so the job lands atomically with its transaction."""
+        db.execute(text("""
+            INSERT INTO ledger.payment_jobs (transaction_id, provider, destination, amount, max_attempts)
+            VALUES (:tx_id, :provider, :dest, :amount, :max_attempts)
+            ON CONFLICT (transaction_id) DO NOTHING
+        """), {
+            "tx_id": tx_id,
+            "provider": provider,
+            "dest": destination,
+            "amount": amount,
+            "max_attempts": settings.PAYMENT_JOB_MAX_ATTEMPTS
+        })
+
+    @staticmethod
+    def claim(db: Session, worker_id: str, limit: int):
+        """Leases up to `limit` due jobs. Expired leases (crashed workers) are reclaimed."""
+        rows = db.execute(text("""
+            UPDATE ledger.payment_jobs j
+            SET status = 'RUNNING',
+                attempts = j.attempts + 1,
+                locked_by = :worker,
+                locked_until = NOW() + make_interval(secs => :lease),
+                updated_at = NOW()
+            FROM (
+                SELECT id FROM ledger.payment_jobs
+                WHERE (status = 'QUEUED' AND run_after <= NOW())
+                   OR (status = 'RUNNING' AND locked_until < NOW())
+                ORDER BY run_after
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            ) due
+            WHERE j.id = due.id
+            RETURNING j.id, j.transaction_id, j.provider, j.destination, j.amount, j.attempts, j.max_attempts
+        """), {"worker": worker_id, "lease": settings.PAYMENT_JOB_LEASE_SECONDS, "limit": limit}).fetchall()
+        db.commit()
+        return rows
+
+    @staticmethod
+    def mark_done(db: Session, job_id: int):
+        """Flags a job DONE. Caller commits together with the push result."""
+        db.execute(text("""
+            UPDATE ledger.payment_jobs
+            SET status = 'DONE', locked_by = NULL, locked_until = NULL, updated_at = NOW()
+            WHERE id = :id
+        """), {"id": job_id})
+
+    @staticmethod
+    def park(db: Session, job, result: dict, error: str):
+        """Takes a job whose push the provider accepted, but whose result could not be recorded, out of the queue.
+
+        It is never claimed (and pushed) again; the transaction stays open for
+        the provider's webhook or the stale sweep.
+        """
+        db.execute(text("""
+            UPDATE ledger.payment_jobs
+            SET status = 'PARKED', last_error = :err, locked_by = NULL, locked_until = NULL, updated_at = NOW()
+            WHERE id = :id
+        """), {"id": job.id, "err": f"push accepted (provider_ref {result.get('provider_ref')}), not recorded: {error}"})
+        db.commit()
+
+    @staticmethod
+    def retry_or_fail(db: Session, job, error: str):
+        """Schedules the next attempt by timestamp (30s, 60s, ...) or fails the payment."""
+        if job.attempts >= job.max_attempts:
+            db.execute(text("""
+                UPDATE ledger.payment_jobs
+                SET status = 'FAILED', last_error = :err, locked_by = NULL, locked_until = NULL, updated_at = NOW()
+                WHERE id = :id
+            """), {"id": job.id, "err": error})
+            db.execute(text(
+                f"UPDATE ledger.transactions SET status = 'FAILED' WHERE id = :id AND {AWAITING_CONFIRMATION} AND {ACTIVE_TRANSACTIONS}"
+            ), {"id": job.transaction_id})
+            db.commit()
+            logger.error(f"{job.transaction_id} failed after {job.attempts} attempts: {error}")
+            return
+
+        wait_time = settings.PAYMENT_JOB_RETRY_SECONDS * job.attempts
+        db.execute(text("""
+            UPDATE ledger.payment_jobs
+            SET status = 'QUEUED',
+                run_after = NOW() + make_interval(secs => :wait),
+                last_error = :err, locked_by = NULL, locked_until = NULL, updated_at = NOW()
+            WHERE id = :id
+        """), {"id": job.id, "wait": wait_time, "err": error})
+        db.commit()
+        logger.warning(f"{job.transaction_id} API failure: {error}. Retrying in {wait_time}s")
+
+
+class PaymentWorker:
+    """Polls the job table and runs provider pushes concurrently.
+
+    Any number of these can run across processes and nodes; SKIP LOCKED keeps
+    them from claiming the same job.
+    """
+
+    def __init__(self, concurrency: int = None, poll_interval: float = None):
+        self.concurrency = concurrency or settings.PAYMENT_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.PAYMENT_WORKER_POLL_INTERVAL
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        # Pushes run `concurrency` wide, but DB work is capped at the background
+        # pool's size so threads don't queue on (and time out waiting for) connections
+        self._db_slots = asyncio.Semaphore(settings.DB_BACKGROUND_POOL_SIZE)
+        self._stopping = False
+
+    def stop(self):
+        self._stopping = True
+
+    async def run_forever(self):
+        logger.info(f"Payment worker {self.worker_id} started")
+        while not self._stopping:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Payment worker loop error: {e}")
+                claimed = 0
+            if not claimed:
+                await asyncio.sleep(self.poll_interval)
+
+    async def run_once(self) -> int:
+        jobs = await self._db(self._claim)
+        if jobs:
+            await asyncio.gather(*(self._process(job) for job in jobs))
+        return len(jobs)
+
+    async def _db(self, fn, *args):
+        """DB work runs in a thread so the web process' event loop never blocks on it."""
+        async with self._db_slots:
+            return await asyncio.to_thread(fn, *args)
+
+    async def _process(self, job):
+        with BackgroundSessionLocal() as db:
+            service = CheckoutService(db)
+            try:
+                result = await service.push(job.transaction_id, job.provider, job.destination, job.amount)
+            except Exception as e:
+                # The provider did not take the push, so pushing again later is safe
+                try:
+                    await self._db(self._retry_or_fail, db, job, str(e))
+                except Exception as db_error:
+                    logger.error(f"{job.transaction_id} retry not scheduled ({db_error}); retried when its lease expires")
+                return
+
+            # The customer has a PIN prompt now: from here the job is never requeued
+            await self._record_accepted(service, job, result)
+
+    async def _record_accepted(self, service: CheckoutService, job, result: dict):
+        error = None
+        for attempt in range(1, settings.PAYMENT_RECORD_ATTEMPTS + 1):
+            try:
+                await self._db(self._record, service, job, result)
+                return
+            except Exception as e:
+                error = str(e)
+                logger.warning(f"{job.transaction_id} push accepted, recording failed (attempt {attempt}): {e}")
+                await asyncio.sleep(attempt)
+
+        try:
+            await self._db(self._park, service.db, job, result, error)
+            logger.error(f"{job.transaction_id} parked: push accepted but not recorded: {error}")
+        except Exception as e:
+            # Nothing left to write with; the lease expiring is the only way this job runs again
+            logger.critical(
+                f"{job.transaction_id} push accepted (provider_ref {result.get('provider_ref')}) "
+                f"but neither recorded nor parked: {e}"
+            )
+
+    def _claim(self):
+        with BackgroundSessionLocal() as db:
+            return PaymentQueue.claim(db, self.worker_id, self.concurrency)
+
+    @staticmethod
+    def _record(service: CheckoutService, job, result: dict):
+        try:
+            PaymentQueue.mark_done(service.db, job.id)
+            service.record_push_result(job.transaction_id, job.provider, job.amount, result)
+        except Exception:
+            service.db.rollback()
+            raise
+
+    @staticmethod
+    def _park(db: Session, job, result: dict, error: str):
+        db.rollback()
+        PaymentQueue.park(db, job, result, error)
+
+    @staticmethod
+    def _retry_or_fail(db: Session, job, error: str):
+        db.rollback()
+        PaymentQueue.retry_or_fail(db, job, error)
+
+if __name__ == "__main__":
+    # Standalone worker process: python -m app.services.payment_queue
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(PaymentWorker().run_forever())
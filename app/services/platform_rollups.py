@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.database import get_engine
+from app.core.metrics import metrics
+from app.db.triggers import ensure_trigger
+
+logger = logging.getLogger("KwachaPoint.PlatformRollups")
+
+GRANULARITIES = ("minute", "hour", "day")
+
+class PlatformRollups:
+    """Minute/hour/day buckets of platform volume per provider and status.
+
+    A trigger on ledger.transactions appends a delta row per insert or
+    status change. Deltas are appended rather than upserted so concurrent
+    payments don't queue on the same "current minute" row. fold() moves
+    them into ledger.platform_rollups in batches. Buckets follow the
+    transaction's created_at, with the transaction's current status.
+    """
+
+    @staticmethod
+    def ensure_schema(conn):
+        """Installs the delta trigger (idempotent)."""
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION ledger.platform_rollups_on_transaction() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' THEN
+                    INSERT INTO ledger.platform_rollup_deltas (bucket, provider, status, tx_count, amount)
+                    VALUES (date_trunc('minute', COALESCE(OLD.created_at, NOW())),
+                            COALESCE(OLD.provider, 'UNKNOWN'), COALESCE(OLD.status, 'UNKNOWN'),
+                            -1, -OLD.amount);
+                END IF;
+
+                INSERT INTO ledger.platform_rollup_deltas (bucket, provider, status, tx_count, amount)
+                VALUES (date_trunc('minute', COALESCE(NEW.created_at, NOW())),
+                        COALESCE(NEW.provider, 'UNKNOWN'), COALESCE(NEW.status, 'UNKNOWN'),
+                        1, NEW.amount);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        ensure_trigger(conn, "ledger.transactions", "trg_platform_rollups_insert", """
+            AFTER INSERT ON ledger.transactions
+            FOR EACH ROW EXECUTE FUNCTION ledger.platform_rollups_on_transaction()
+        """)
+        ensure_trigger(conn, "ledger.transactions", "trg_platform_rollups_status", """
+            AFTER UPDATE OF status ON ledger.transactions
+            FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+            EXECUTE FUNCTION ledger.platform_rollups_on_transaction()
+        """)
+
+    @staticmethod
+    def fold(conn, limit: int = None) -> int:
+        """Drains up to `limit` deltas into every granularity in one statement. Returns deltas folded."""
+        row = conn.execute(text("""
+            WITH drained AS (
+                DELETE FROM ledger.platform_rollup_deltas d
+                USING (
+                    SELECT id FROM ledger.platform_rollup_deltas
+                    ORDER BY id
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                ) batch
+                WHERE d.id = batch.id
+                RETURNING d.bucket, d.provider, d.status, d.tx_count, d.amount
+            ),
+            folded AS (
+                INSERT INTO ledger.platform_rollups AS r (granularity, bucket_start, provider, status, tx_count, amount)
+                SELECT g.granularity, date_trunc(g.granularity, d.bucket), d.provider, d.status,
+                       SUM(d.tx_count), SUM(d.amount)
+                FROM drained d
+                CROSS JOIN unnest(CAST(:granularities AS TEXT[])) AS g(granularity)
+                GROUP BY 1, 2, 3, 4
+                ORDER BY 1, 2, 3, 4
+                ON CONFLICT (granularity, bucket_start, provider, status) DO UPDATE SET
+                    tx_count = r.tx_count + EXCLUDED.tx_count,
+                    amount = r.amount + EXCLUDED.amount
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM drained) AS deltas, (SELECT COUNT(*) FROM folded) AS buckets
+        """), {
+            "limit": limit or settings.ROLLUP_FOLD_BATCH_SIZE,
+            "granularities": list(GRANULARITIES),
+        }).fetchone()
+
+        metrics.inc("rollup_deltas_folded_total", row.deltas)
+        return row.deltas
+
+    @staticmethod
+    def prune(conn):
+        """Drops fine-grained buckets past their retention; day buckets are kept forever."""
+        conn.execute(text("""
+            DELETE FROM ledger.platform_rollups
+            WHERE (granularity = 'minute' AND bucket_start < NOW() - make_interval(hours => :minute_hours))
+               OR (granularity = 'hour' AND bucket_start < NOW() - make_interval(days => :hour_days))
+        """), {
+            "minute_hours": settings.ROLLUP_MINUTE_RETENTION_HOURS,
+            "hour_days": settings.ROLLUP_HOUR_RETENTION_DAYS,
+        })
+
+    @staticmethod
+    def backfill(conn):
+        """Rebuilds every bucket from ledger.transactions.
+
+        Takes a SHARE lock on ledger.transactions so no delta is written
+        between the wipe and the rebuild; writers wait until it commits.
+        """
+        conn.execute(text("LOCK TABLE ledger.transactions IN SHARE MODE"))
+        conn.execute(text("DELETE FROM ledger.platform_rollup_deltas"))
+        conn.execute(text("DELETE FROM ledger.platform_rollups"))
+
+        total = 0
+        for granularity in GRANULARITIES:
+            total += conn.execute(text("""
+                INSERT INTO ledger.platform_rollups (granularity, bucket_start, provider, status, tx_count, amount)
+                SELECT :granularity,
+                       date_trunc(:granularity, COALESCE(created_at, NOW())),
+                       COALESCE(provider, 'UNKNOWN'),
+                       COALESCE(status, 'UNKNOWN'),
+                       COUNT(*),
+                       SUM(amount)
+                FROM ledger.transactions
+                GROUP BY 1, 2, 3, 4
+            """), {"granularity": granularity}).rowcount
+
+        PlatformRollups.prune(conn)
+        logger.info(f"Backfilled {total} rollup buckets")
+        return total
+
+    @staticmethod
+    def admin_stats(db: Session) -> dict:
+        """Lifetime successful volume and last-hour failures, read from the buckets only."""
+        row = db.execute(text("""
+            SELECT
+                (SELECT COALESCE(SUM(amount), 0) FROM ledger.platform_rollups
+                 WHERE granularity = 'day' AND status = 'SUCCESS') AS volume,
+                (SELECT COALESCE(SUM(tx_count), 0) FROM ledger.platform_rollups
+                 WHERE granularity = 'minute' AND status = 'FAILED'
+                   AND bucket_start > NOW() - INTERVAL '1 hour') AS recent_fails
+        """)).fetchone()
+        return {"volume": row.volume, "recent_fails": row.recent_fails}
+
+
+class RollupFolder:
+    """Background loop that folds deltas until the table is drained, then sleeps."""
+
+    def __init__(self, poll_interval: float = None):
+        self.poll_interval = poll_interval or settings.ROLLUP_FOLD_INTERVAL
+        self._stopping = False
+
+    def stop(self):
+        self._stopping = True
+
+    async def run_forever(self):
+        logger.info("Rollup folder started")
+        while not self._stopping:
+            try:
+                await asyncio.to_thread(self.fold_pending)
+            except Exception as e:
+                logger.error(f"Rollup fold error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def fold_pending(self) -> int:
+        engine = get_engine("background")
+        folded = 0
+        while True:
+            with engine.begin() as conn:
+                batch = PlatformRollups.fold(conn)
+            folded += batch
+            if batch < settings.ROLLUP_FOLD_BATCH_SIZE or self._stopping:
+                break
+
+        with engine.begin() as conn:
+            PlatformRollups.prune(conn)
+        return folded
+
+
+if __name__ == "__main__":
+    # python -m app.services.platform_rollups backfill   -> rebuild all buckets from history
+    # python -m app.services.platform_rollups            -> standalone folder process
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ["backfill"]:
+        with get_engine("background").begin() as conn:
+            PlatformRollups.backfill(conn)
+    else:
+        asyncio.run(RollupFolder().run_forever())
@@ -0,0 +1,148 @@
+import logging
+from sqlalchemy import text
+
+from app.core.database import get_engine
+from app.db.triggers import ensure_trigger, has_column
+
+logger = logging.getLogger("KwachaPoint.ProductSales")
+
+class ProductSalesService:
+    """Attributes successful payments to store products through an indexed link.
+
+    ledger.transactions gets a typed product_id column. A BEFORE INSERT
+    trigger fills it from metadata->>'product_id'. An AFTER trigger keeps
+    per-product sales count and revenue in ledger.product_sales as payments
+    enter or leave SUCCESS. The store dashboard then joins products to
+    product_sales on the primary key instead of scanning transactions.
+    """
+
+    @staticmethod
+    def migrate(engine=None):
+        """Adds ledger.transactions.product_id (one-off; the ALTER locks the table briefly)."""
+        engine = engine or get_engine("background")
+        with engine.begin() as conn:
+            if has_column(conn, "ledger.transactions", "product_id"):
+                return
+            # Adding a nullable column without a default is a catalog change, but it
+            # still needs ACCESS EXCLUSIVE: give up rather than queue behind long queries
+            conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            conn.execute(text("ALTER TABLE ledger.transactions ADD COLUMN product_id UUID"))
+            ProductSalesService.ensure_schema(conn)
+        logger.info("Added ledger.transactions.product_id")
+
+    @staticmethod
+    def ensure_schema(conn):
+        """Installs the functions and triggers (idempotent). Needs the column from migrate()."""
+        if not has_column(conn, "ledger.transactions", "product_id"):
+            logger.warning("ledger.transactions.product_id is missing; run `python -m app.services.product_sales`")
+            return
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION ledger.product_id_from_metadata(meta JSONB) RETURNS UUID AS $$
+                SELECT CASE
+                    WHEN meta->>'product_id' ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+                    THEN CAST(meta->>'product_id' AS UUID)
+                END
+            $$ LANGUAGE sql IMMUTABLE
+        """))
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION ledger.transactions_set_product_id() RETURNS trigger AS $$
+            BEGIN
+                NEW.product_id := COALESCE(NEW.product_id, ledger.product_id_from_metadata(NEW.metadata));
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION ledger.product_sales_on_transaction() RETURNS trigger AS $$
+            DECLARE
+                delta INT := (NEW.status = 'SUCCESS')::int;
+            BEGIN
+                IF TG_OP = 'UPDATE' THEN
+                    delta := delta - (OLD.status = 'SUCCESS')::int;
+                END IF;
+
+                INSERT INTO ledger.product_sales AS s (product_id, sales_count, revenue)
+                VALUES (NEW.product_id, delta, delta * NEW.amount)
+                ON CONFLICT (product_id) DO UPDATE SET
+                    sales_count = s.sales_count + EXCLUDED.sales_count,
+                    revenue = s.revenue + EXCLUDED.revenue;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+
+        ensure_trigger(conn, "ledger.transactions", "trg_transactions_product_id", """
+            BEFORE INSERT ON ledger.transactions
+            FOR EACH ROW EXECUTE FUNCTION ledger.transactions_set_product_id()
+        """)
+        ensure_trigger(conn, "ledger.transactions", "trg_product_sales_insert", """
+            AFTER INSERT ON ledger.transactions
+            FOR EACH ROW WHEN (NEW.product_id IS NOT NULL AND NEW.status = 'SUCCESS')
+            EXECUTE FUNCTION ledger.product_sales_on_transaction()
+        """)
+        ensure_trigger(conn, "ledger.transactions", "trg_product_sales_status", """
+            AFTER UPDATE OF status ON ledger.transactions
+            FOR EACH ROW WHEN (
+                NEW.product_id IS NOT NULL
+                AND OLD.status IS DISTINCT FROM NEW.status
+                AND (OLD.status = 'SUCCESS' OR NEW.status = 'SUCCESS')
+            )
+            EXECUTE FUNCTION ledger.product_sales_on_transaction()
+        """)
+
+    @staticmethod
+    def backfill(engine, batch_size: int = 5000):
+        """Fills product_id on historical rows, then rebuilds ledger.product_sales.
+
+        The column fill walks the primary key in short transactions. The
+        rebuild holds a SHARE lock on ledger.transactions so no trigger
+        delta lands between the wipe and the insert.
+        """
+        # 1. Typed column for rows inserted before the trigger existed
+        last_id, filled = "", 0
+        while True:
+            with engine.begin() as conn:
+                batch = conn.execute(text("""
+                    WITH batch AS (
+                        SELECT id FROM ledger.transactions
+                        WHERE id > :last_id AND product_id IS NULL AND metadata->>'product_id' IS NOT NULL
+                        ORDER BY id
+                        LIMIT :batch
+                    ),
+                    filled AS (
+                        UPDATE ledger.transactions t
+                        SET product_id = ledger.product_id_from_metadata(t.metadata)
+                        FROM batch
+                        WHERE t.id = batch.id
+                        RETURNING t.id
+                    )
+                    -- max() in SQL so the next batch starts under the DB's collation, not Python's
+                    SELECT (SELECT MAX(id) FROM batch) AS last_id, (SELECT COUNT(*) FROM filled) AS filled
+                """), {"last_id": last_id, "batch": batch_size}).fetchone()
+            if batch.last_id is None:
+                break
+            last_id, filled = batch.last_id, filled + batch.filled
+            logger.info(f"Attributed {filled} transactions so far")
+
+        # 2. Sales projection
+        with engine.begin() as conn:
+            conn.execute(text("LOCK TABLE ledger.transactions IN SHARE MODE"))
+            conn.execute(text("DELETE FROM ledger.product_sales"))
+            products = conn.execute(text("""
+                INSERT INTO ledger.product_sales (product_id, sales_count, revenue)
+                SELECT product_id, COUNT(*), SUM(amount)
+                FROM ledger.transactions
+                WHERE product_id IS NOT NULL AND status = 'SUCCESS'
+                GROUP BY product_id
+            """)).rowcount
+
+        logger.info(f"Backfilled sales for {products} products")
+        return products
+
+
+if __name__ == "__main__":
+    # One-off: adds the column and triggers, then attributes history: python -m app.services.product_sales
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine("background")
+    ProductSalesService.migrate(engine)
+    ProductSalesService.backfill(engine)
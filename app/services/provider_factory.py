@@ -1,6 +1,18 @@
 from app.intergrations.airtel import AirtelMoneyProvider
+from app.intergrations.tnm import TNMMpambaProvider
+from app.intergrations.bank import BankDirectProvider
 from app.config import settings
 
+# Every provider integration; each owns one pooled HTTP client
+PROVIDER_CLASSES = (AirtelMoneyProvider, TNMMpambaProvider, BankDirectProvider)
+
+def integration_code(provider: str) -> str:
+    """A transaction's provider -> its integration's PROVIDER_CODE.
+
+    Bank routes are stored as BANK_NBM, BANK_STD, ... and share one integration.
+    """
+    return (provider or "").upper().split("_")[0]
+
 class ProviderRouter:
     @staticmethod
     def get_provider(method: str = None, phone: str = None):
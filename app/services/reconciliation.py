@@ -1,8 +1,15 @@
+import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
-from decimal import Decimal
 from sqlalchemy import text
-from app.db.session import engine
+from app.config import settings
+from app.core.database import get_engine
+from app.core.metrics import metrics
+from app.intergrations.base import BasePaymentProvider
+from app.services.ledger_service import LedgerService, AWAITING_CONFIRMATION
+from app.services.provider_factory import PROVIDER_CLASSES, integration_code
+from app.services.ledger_verifier import LedgerVerifier
+from app.services.settlement_reconciliation import SettlementReconciler
 
 
 logging.basicConfig(level=logging.INFO)
@@ -22,38 +29,124 @@ class ReconciliationService:
         logger.info("--- Audit Complete ---")
 
     def check_ledger_integrity(self):
-        """The 'Golden Rule': All debits - all credits MUST equal zero."""
-        with self.engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT SUM(credit) - SUM(debit) as balance 
-                FROM ledger.ledger_entries
-            """)).fetchone()
-            
-            balance = result.balance or Decimal("0.0000")
-            
-            if balance != 0:
-                logger.error(f"CRITICAL INTEGRITY FAILURE: Ledger out of balance by {balance} MWK!")
-            else:
-                logger.info("Ledger Integrity Verified: Balanced at 0.0000")
+        """The 'Golden Rule': debits and credits must net to zero.
+
+        Checked incrementally: only entries after the verifier's watermark are
+        read, and an imbalance is reported per transaction, account and period.
+        """
+        return LedgerVerifier(self.engine).run()
 
     def cleanup_stale_transactions(self, timeout_minutes=15):
-        """Finds transactions stuck in 'PENDING' too long and marks them FAILED."""
-        cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=timeout_minutes)
-        
+        """Expires transactions stuck in PENDING or PROCESSING, asking the provider first.
+
+        Works in chunks of STALE_TX_CHUNK_SIZE: read a chunk, poll each
+        provider's get_transaction_status concurrently (at most
+        STALE_TX_POLL_CONCURRENCY in flight), then commit that chunk's outcome
+        in one short transaction. SUCCESS is posted to the ledger. FAILED, and
+        still pending, are marked FAILED. A transaction whose provider can't be
+        reached is left for the next run, until it passes
+        STALE_TX_HARD_EXPIRE_HOURS.
+        """
+        return asyncio.run(self._expire_stale(timeout_minutes))
+
+    async def _expire_stale(self, timeout_minutes: int) -> dict:
+        now = datetime.now(timezone.utc)
+        cutoff_time = now - timedelta(minutes=timeout_minutes)
+        hard_cutoff = now - timedelta(hours=settings.STALE_TX_HARD_EXPIRE_HOURS)
+        providers = {cls.PROVIDER_CODE: cls() for cls in PROVIDER_CLASSES}
+        semaphore = asyncio.Semaphore(settings.STALE_TX_POLL_CONCURRENCY)
+        totals = {"checked": 0, "recovered": 0, "failed": 0, "deferred": 0}
+
+        async def poll(tx):
+            provider = providers.get(integration_code(tx.provider))
+            if provider is None:
+                return tx, "PENDING"  # nobody to ask: expires as before
+            async with semaphore:
+                try:
+                    return tx, (await provider.get_transaction_status(tx.id) or "PENDING").upper()
+                except Exception as e:
+                    logger.warning(f"Status check for {tx.id} via {provider.PROVIDER_CODE} failed: {e}")
+                    return tx, None
+
+        position = None
+        try:
+            while True:
+                # 1. Next chunk, read without locks: nothing is held while providers answer
+                chunk = await asyncio.to_thread(self._stale_chunk, cutoff_time, position)
+                if not chunk:
+                    break
+                position = (chunk[-1].created_at, chunk[-1].id)
+
+                # 2. Ask the providers, bounded by the semaphore
+                statuses = await asyncio.gather(*(poll(tx) for tx in chunk))
+
+                # 3. Apply the chunk's outcome and commit
+                outcome = await asyncio.to_thread(self._apply_statuses, statuses, hard_cutoff)
+                totals["checked"] += len(chunk)
+                for key, value in outcome.items():
+                    totals[key] += value
+                logger.info(
+                    f"Stale sweep: {totals['checked']} checked, {totals['recovered']} recovered as SUCCESS, "
+                    f"{totals['failed']} failed, {totals['deferred']} deferred (provider unreachable)"
+                )
+        finally:
+            await BasePaymentProvider.close_clients()
+
+        metrics.inc("stale_transactions_recovered_total", totals["recovered"])
+        metrics.inc("stale_transactions_failed_total", totals["failed"])
+        if totals["failed"] > 0:
+            logger.warning(f"Cleaned up {totals['failed']} stale PENDING transactions.")
+        return totals
+
+    def reconcile_settlement_file(self, provider: str, day: datetime, path: str, columns: dict = None) -> dict:
+        """Matches a provider's daily settlement CSV against our transactions for that day."""
+        reconciler = SettlementReconciler(provider, day, day + timedelta(days=1), columns=columns, engine=self.engine)
+        with open(path, newline="") as statement:
+            return reconciler.run(statement, name=path)
+
+    def _stale_chunk(self, cutoff_time, position):
+        keyset = "AND (created_at, id) > (:last_created_at, :last_id)" if position else ""
+        params = {"cutoff": cutoff_time, "limit": settings.STALE_TX_CHUNK_SIZE}
+        if position:
+            params["last_created_at"], params["last_id"] = position
+        # No active-window bound: open rows of any age must expire (the partial
+        # index on open rows keeps this cheap on every partition)
+        with self.engine.connect() as conn:
+            return conn.execute(text(f"""
+                SELECT id, provider, amount, created_at
+                FROM ledger.transactions
+                WHERE {AWAITING_CONFIRMATION}
+                AND created_at < :cutoff {keyset}
+                ORDER BY created_at, id
+                LIMIT :limit
+            """), params).fetchall()
+
+    def _apply_statuses(self, statuses, hard_cutoff) -> dict:
+        """One transaction per chunk. Every write only touches open transactions, so a webhook that landed meanwhile wins."""
+        outcome = {"recovered": 0, "failed": 0, "deferred": 0}
+        to_fail = []
         with self.engine.begin() as conn:
-            result = conn.execute(text("""
-                UPDATE ledger.transactions 
-                SET status = 'FAILED', 
-                    metadata = metadata || '{"reason": "reconciliation_timeout"}'::jsonb
-                WHERE status = 'PENDING' 
-                AND created_at < :cutoff
-                RETURNING id
-            """), {"cutoff": cutoff_time})
-            
-            failed_count = len(result.fetchall())
-            if failed_count > 0:
-                logger.warning(f"Cleaned up {failed_count} stale PENDING transactions.")
+            for tx, status in statuses:
+                if status == "SUCCESS":
+                    if LedgerService.post_successful_payment(conn, tx.id, tx.amount, tx.provider, tx.created_at):
+                        outcome["recovered"] += 1
+                elif status is None and tx.created_at >= hard_cutoff:
+                    outcome["deferred"] += 1
+                else:
+                    to_fail.append(tx)
+
+            if to_fail:
+                result = conn.execute(text("""
+                    UPDATE ledger.transactions 
+                    SET status = 'FAILED', 
+                        metadata = metadata || '{"reason": "reconciliation_timeout"}'::jsonb
+                    WHERE id = ANY(:ids)
+                    AND status IN ('PENDING', 'PROCESSING')
+                    AND created_at >= :oldest
+                """), {"ids": [tx.id for tx in to_fail], "oldest": min(tx.created_at for tx in to_fail)})
+                outcome["failed"] = result.rowcount
+        return outcome
 
 if __name__ == "__main__":
-    service = ReconciliationService(engine)
+    service = ReconciliationService(get_engine("background"))
     service.run_full_audit()
@@ -0,0 +1,168 @@
+import os
+import csv
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.database import get_engine
+from app.core.metrics import metrics
+
+logger = logging.getLogger("KwachaPoint.SettlementRecon")
+
+# Statement header names for the fields we match on; override per file with columns=
+DEFAULT_COLUMNS = {"reference": "reference", "amount": "amount"}
+
+REPORT_COLUMNS = ("kind", "reference", "transaction_id", "statement_amount", "ledger_amount", "ledger_status", "line")
+
+
+def to_cents(amount) -> int:
+    """'1,500.00' / Decimal('1500.0000') -> 150000. Integers compare and hash faster than Decimals."""
+    return int((Decimal(str(amount).replace(",", "").strip()) * 100).to_integral_value())
+
+
+class SettlementReconciler:
+    """Matches one provider's daily settlement statement against ledger.transactions.
+
+    The ledger side is loaded once: a single streamed range query over the
+    provider's transactions for the statement window (plus
+    SETTLEMENT_MATCH_SLACK_HOURS either side, for late settlement) builds a
+    dict of provider_reference -> (amount in cents, id, status). The CSV is
+    then streamed line by line against it. Each matched reference is popped.
+    Whatever is left afterwards, inside the window and SUCCESS, is missing
+    from the statement. Findings are written to the report as they are
+    found, so memory holds the day's index and never the file.
+
+    Findings:
+    - MISSING: our SUCCESS transaction is absent from the statement;
+    - EXTRA: a statement line has no transaction, or repeats a reference;
+    - AMOUNT_MISMATCH: the amounts differ;
+    - STATUS_MISMATCH: the provider settled a transaction we don't have as SUCCESS.
+    """
+
+    def __init__(self, provider: str, start: datetime, end: datetime,
+                 columns: Optional[Dict[str, str]] = None, engine=None, report_dir: str = None):
+        self.provider = provider.upper()
+        self.start = start
+        self.end = end
+        self.columns = {**DEFAULT_COLUMNS, **(columns or {})}
+        self.engine = engine or get_engine("reporting")
+        self.report_dir = report_dir or settings.SETTLEMENT_REPORT_DIR
+        self.counts = {"lines": 0, "matched": 0, "missing": 0, "extra": 0,
+                       "amount_mismatch": 0, "status_mismatch": 0, "unparseable": 0}
+
+    def load_index(self) -> Dict[str, Tuple[int, str, str, bool]]:
+        """reference -> (amount_cents, transaction id, status, inside the statement window)."""
+        slack = timedelta(hours=settings.SETTLEMENT_MATCH_SLACK_HOURS)
+        index = {}
+        with self.engine.connect().execution_options(stream_results=True, yield_per=settings.SETTLEMENT_FETCH_ROWS) as conn:
+            result = conn.execute(text("""
+                SELECT provider_reference, amount, id, status,
+                       created_at >= :start AND created_at < :end AS in_window
+                FROM ledger.transactions
+                WHERE provider = :provider
+                AND created_at >= :from_ts AND created_at < :to_ts
+                AND provider_reference IS NOT NULL
+            """), {
+                "provider": self.provider, "start": self.start, "end": self.end,
+                "from_ts": self.start - slack, "to_ts": self.end + slack,
+            })
+            for reference, amount, tx_id, status, in_window in result:
+                index[reference] = (to_cents(amount), tx_id, status, in_window)
+        return index
+
+    def run(self, lines: Iterable[str], name: str = "statement") -> dict:
+        started = time.perf_counter()
+        index = self.load_index()
+        loaded = time.perf_counter()
+
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(
+            self.report_dir, f"settlement_{self.provider}_{self.start:%Y%m%d}_{datetime.now(timezone.utc):%H%M%S}.csv"
+        )
+        with open(path, "w", newline="") as report_file:
+            report = csv.writer(report_file)
+            report.writerow(REPORT_COLUMNS)
+            self._match(lines, index, report)
+
+            # Left in the index: never settled. Slack-only rows belong to neighbouring days.
+            for reference, (cents, tx_id, status, in_window) in index.items():
+                if in_window and status == "SUCCESS":
+                    self.counts["missing"] += 1
+                    report.writerow(("MISSING", reference, tx_id, "", _amount(cents), status, ""))
+
+        summary = {
+            "provider": self.provider,
+            "statement": name,
+            "window": [self.start.isoformat(), self.end.isoformat()],
+            **self.counts,
+            "report": path,
+            "index_seconds": round(loaded - started, 3),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        for kind in ("missing", "extra", "amount_mismatch", "status_mismatch"):
+            metrics.inc("settlement_discrepancies_total", self.counts[kind], provider=self.provider, kind=kind)
+        level = logging.WARNING if any(self.counts[k] for k in ("missing", "extra", "amount_mismatch", "status_mismatch")) else logging.INFO
+        logger.log(level, f"Settlement {self.provider} {name}: {summary}")
+        return summary
+
+    def _match(self, lines: Iterable[str], index: dict, report):
+        reader = csv.reader(lines)
+        header = [column.strip().lower() for column in next(reader, [])]
+        try:
+            ref_at = header.index(self.columns["reference"].lower())
+            amount_at = header.index(self.columns["amount"].lower())
+        except ValueError:
+            raise ValueError(f"Statement header must include {self.columns['reference']!r} and {self.columns['amount']!r}")
+
+        counts = self.counts
+        pop = index.pop
+        seen = set()
+        # Line 1 is the header
+        for line_no, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            counts["lines"] += 1
+            try:
+                reference = row[ref_at].strip()
+                cents = to_cents(row[amount_at])
+            except (IndexError, ValueError, ArithmeticError):
+                # ArithmeticError: InvalidOperation for non-numbers, OverflowError for 'Infinity'; ValueError for 'NaN'
+                counts["unparseable"] += 1
+                report.writerow(("UNPARSEABLE", "", "", "", "", "", line_no))
+                continue
+
+            entry = pop(reference, None)
+            if entry is None:
+                counts["extra"] += 1
+                report.writerow(("DUPLICATE" if reference in seen else "EXTRA", reference, "", _amount(cents), "", "", line_no))
+                continue
+            seen.add(reference)
+
+            ledger_cents, tx_id, status, _ = entry
+            if ledger_cents != cents:
+                counts["amount_mismatch"] += 1
+                report.writerow(("AMOUNT_MISMATCH", reference, tx_id, _amount(cents), _amount(ledger_cents), status, line_no))
+            elif status != "SUCCESS":
+                counts["status_mismatch"] += 1
+                report.writerow(("STATUS_MISMATCH", reference, tx_id, _amount(cents), _amount(ledger_cents), status, line_no))
+            else:
+                counts["matched"] += 1
+
+
+def _amount(cents: int) -> str:
+    return f"{Decimal(cents) / 100:.2f}"
+
+
+if __name__ == "__main__":
+    # python -m app.services.settlement_reconciliation AIRTEL 2026-01-31 statement.csv [reference_col] [amount_col]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    provider, day, path = sys.argv[1:4]
+    start = datetime.fromisoformat(day).replace(tzinfo=timezone.utc)
+    columns = dict(zip(("reference", "amount"), sys.argv[4:6]))
+    with open(path, newline="") as statement:
+        SettlementReconciler(provider, start, start + timedelta(days=1), columns=columns).run(statement, name=os.path.basename(path))
@@ -0,0 +1,173 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.database import get_engine
+from app.core.metrics import metrics
+from app.services.fee_schedule import FeeSchedule
+
+logger = logging.getLogger("KwachaPoint.Settlements")
+
+# 2. One statement line per eligible transaction, priced by FeeSchedule's rates.
+# The settlement_lines primary key makes "not settled yet" an ON CONFLICT, not a per-row check.
+LINES_SQL = text("""
+    WITH rates AS (
+        SELECT * FROM unnest(CAST(:rate_providers AS TEXT[]), CAST(:rate_values AS NUMERIC[])) AS r(provider, rate)
+    ),
+    priced AS (
+        SELECT t.id, t.merchant_id, t.provider, t.created_at, t.amount,
+               ROUND(t.amount * CAST(:merchant_fee_rate AS NUMERIC), 2) AS fee,
+               ROUND(t.amount * COALESCE(r.rate, CAST(:default_provider_rate AS NUMERIC)), 2) AS provider_cost
+        FROM ledger.transactions t
+        LEFT JOIN rates r ON r.provider = UPPER(t.provider)
+        WHERE t.status = 'SUCCESS'
+          AND t.merchant_id IS NOT NULL
+          AND t.created_at >= :lookback_start AND t.created_at < :window_end
+    )
+    INSERT INTO ledger.settlement_lines
+        (transaction_id, batch_id, merchant_id, provider, created_at, amount, fee, provider_cost, net)
+    SELECT id, :batch_id, merchant_id, provider, created_at, amount, fee, provider_cost, amount - fee
+    FROM priced
+    ON CONFLICT (transaction_id) DO NOTHING
+""")
+
+# 3. Per-merchant statement headers, straight from the batch's lines
+SETTLEMENTS_SQL = text("""
+    INSERT INTO ledger.settlements
+        (batch_id, merchant_id, transaction_count, gross, fees, provider_costs, net_payable)
+    SELECT batch_id, merchant_id, COUNT(*), SUM(amount), SUM(fee), SUM(provider_cost), SUM(net)
+    FROM ledger.settlement_lines
+    WHERE batch_id = :batch_id
+    GROUP BY batch_id, merchant_id
+""")
+
+# 4. Batch totals
+TOTALS_SQL = text("""
+    UPDATE ledger.settlement_batches b
+    SET status = 'COMPLETED',
+        completed_at = NOW(),
+        merchant_count = s.merchants,
+        transaction_count = s.transactions,
+        gross_total = s.gross,
+        fee_total = s.fees,
+        provider_cost_total = s.provider_costs,
+        net_total = s.net
+    FROM (
+        SELECT COUNT(*) AS merchants,
+               COALESCE(SUM(transaction_count), 0) AS transactions,
+               COALESCE(SUM(gross), 0) AS gross,
+               COALESCE(SUM(fees), 0) AS fees,
+               COALESCE(SUM(provider_costs), 0) AS provider_costs,
+               COALESCE(SUM(net_payable), 0) AS net
+        FROM ledger.settlements
+        WHERE batch_id = :batch_id
+    ) s
+    WHERE b.id = :batch_id
+    RETURNING b.id, b.merchant_count, b.transaction_count, b.gross_total, b.fee_total,
+              b.provider_cost_total, b.net_total
+""")
+
+
+class Settlements:
+    """End-of-day settlement: what every merchant is owed for a window, in four statements.
+
+    A run prices every successful transaction in the window with FeeSchedule
+    and writes one statement line per transaction (ledger.settlement_lines).
+    It then writes one statement header per merchant (ledger.settlements)
+    and the batch totals (ledger.settlement_batches). Everything happens in
+    one DB transaction. The statement count is fixed, whatever the number of
+    merchants. Successful transactions created up to SETTLEMENT_LOOKBACK_DAYS
+    before the window that were not settled yet (late successes) join the
+    batch. A transaction is never settled twice.
+    """
+
+    @staticmethod
+    def run(window_start: datetime, window_end: datetime, engine=None) -> dict:
+        engine = engine or get_engine("background")
+        started = datetime.now(timezone.utc)
+        with engine.begin() as conn:
+            # 1. The batch row; a completed window is not settled again
+            batch = conn.execute(text("""
+                INSERT INTO ledger.settlement_batches (window_start, window_end, status)
+                VALUES (:start, :end, 'RUNNING')
+                ON CONFLICT (window_start, window_end) DO UPDATE SET status = ledger.settlement_batches.status
+                RETURNING id, status
+            """), {"start": window_start, "end": window_end}).fetchone()
+            if batch.status == "COMPLETED":
+                logger.info(f"Settlement window {window_start} .. {window_end} already completed (batch {batch.id})")
+                return Settlements.summary(conn, batch.id)
+
+            lines = conn.execute(LINES_SQL, {
+                **FeeSchedule.sql_params(),
+                "batch_id": batch.id,
+                "lookback_start": window_start - timedelta(days=settings.SETTLEMENT_LOOKBACK_DAYS),
+                "window_end": window_end,
+            }).rowcount
+            conn.execute(SETTLEMENTS_SQL, {"batch_id": batch.id})
+            totals = conn.execute(TOTALS_SQL, {"batch_id": batch.id}).fetchone()
+
+        seconds = (datetime.now(timezone.utc) - started).total_seconds()
+        metrics.observe("settlement_batch_seconds", seconds)
+        logger.info(
+            f"Settlement batch {totals.id} [{window_start} .. {window_end}): {lines} transactions, "
+            f"{totals.merchant_count} merchants, gross {totals.gross_total}, fees {totals.fee_total}, "
+            f"provider costs {totals.provider_cost_total}, net payable {totals.net_total} MWK ({seconds:.1f}s)"
+        )
+        return dict(totals._mapping)
+
+    @staticmethod
+    def summary(conn, batch_id: int) -> dict:
+        row = conn.execute(text("""
+            SELECT id, merchant_count, transaction_count, gross_total, fee_total, provider_cost_total, net_total
+            FROM ledger.settlement_batches WHERE id = :id
+        """), {"id": batch_id}).fetchone()
+        return dict(row._mapping)
+
+    @staticmethod
+    async def statements(db: AsyncSession, merchant_id, limit: int = 30) -> list:
+        """A merchant's most recent settlement statements (headers)."""
+        rows = (await db.execute(text("""
+            SELECT s.batch_id, b.window_start, b.window_end, s.transaction_count,
+                   s.gross, s.fees, s.provider_costs, s.net_payable, s.status
+            FROM ledger.settlements s
+            JOIN ledger.settlement_batches b ON b.id = s.batch_id
+            WHERE s.merchant_id = :mid
+            ORDER BY s.batch_id DESC
+            LIMIT :limit
+        """), {"mid": merchant_id, "limit": limit})).fetchall()
+        return [dict(row._mapping) for row in rows]
+
+    @staticmethod
+    async def statement(db: AsyncSession, merchant_id, batch_id: int):
+        """One statement: its header plus a per-provider breakdown of its lines. None if absent."""
+        header = (await db.execute(text("""
+            SELECT s.batch_id, b.window_start, b.window_end, s.transaction_count,
+                   s.gross, s.fees, s.provider_costs, s.net_payable, s.status
+            FROM ledger.settlements s
+            JOIN ledger.settlement_batches b ON b.id = s.batch_id
+            WHERE s.merchant_id = :mid AND s.batch_id = :batch_id
+        """), {"mid": merchant_id, "batch_id": batch_id})).fetchone()
+        if header is None:
+            return None
+        providers = (await db.execute(text("""
+            SELECT COALESCE(provider, 'UNKNOWN') AS provider, COUNT(*) AS transaction_count,
+                   SUM(amount) AS gross, SUM(fee) AS fees, SUM(provider_cost) AS provider_costs, SUM(net) AS net
+            FROM ledger.settlement_lines
+            WHERE batch_id = :batch_id AND merchant_id = :mid
+            GROUP BY 1
+            ORDER BY 1
+        """), {"mid": merchant_id, "batch_id": batch_id})).fetchall()
+        return {**header._mapping, "providers": [dict(row._mapping) for row in providers]}
+
+
+if __name__ == "__main__":
+    # python -m app.services.settlements [YYYY-MM-DD]   (defaults to yesterday, UTC)
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1:
+        day = datetime.fromisoformat(sys.argv[1]).replace(tzinfo=timezone.utc)
+    else:
+        day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    Settlements.run(day, day + timedelta(days=1))
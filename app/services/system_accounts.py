@@ -0,0 +1,116 @@
+import random
+import logging
+from decimal import Decimal
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.database import get_engine
+
+logger = logging.getLogger("KwachaPoint.SystemAccounts")
+
+class SystemAccounts:
+    """High fan-in platform accounts, split into N balance slots.
+
+    Every payment touches the revenue account. With a single balance row,
+    every payment on the platform waits for that one row lock. Writers
+    instead add to a random slot in ledger.system_account_slots.
+    ledger.system_account_balances shows the total: the rolled-up balance on
+    ledger.merchants plus the sum of the slots.
+    """
+    REVENUE = '00000000-0000-0000-0000-000000000000'
+    PROVIDER_EXPENSE = '00000000-0000-0000-0000-000000000001'
+    # Money collected by the providers on our behalf, not yet paid out to us
+    PROVIDER_CLEARING = '00000000-0000-0000-0000-000000000002'
+    SLOTTED = (REVENUE, PROVIDER_EXPENSE, PROVIDER_CLEARING)
+
+    @staticmethod
+    def random_slot() -> int:
+        return random.randrange(settings.SYSTEM_ACCOUNT_SLOTS)
+
+    @staticmethod
+    def ensure_schema(conn):
+        """Creates the totals view and seeds the slot rows (idempotent)."""
+        conn.execute(text("""
+            CREATE OR REPLACE VIEW ledger.system_account_balances AS
+            SELECT s.account_id,
+                   COALESCE(m.balance, 0) + SUM(s.balance) AS balance,
+                   COUNT(*) AS slots
+            FROM ledger.system_account_slots s
+            LEFT JOIN ledger.merchants m ON m.id = s.account_id
+            GROUP BY s.account_id, m.balance
+        """))
+        conn.execute(text("""
+            INSERT INTO ledger.system_account_slots (account_id, slot, balance)
+            SELECT CAST(acc AS UUID), slot, 0
+            FROM unnest(CAST(:accounts AS TEXT[])) AS acc,
+                 generate_series(0, :slots - 1) AS slot
+            ON CONFLICT DO NOTHING
+        """), {"accounts": list(SystemAccounts.SLOTTED), "slots": settings.SYSTEM_ACCOUNT_SLOTS})
+
+    @staticmethod
+    def adjust(db, account_id: str, amount: Decimal):
+        """Adds (credit - debit) to one random slot. Caller commits."""
+        db.execute(text("""
+            UPDATE ledger.system_account_slots
+            SET balance = balance + :amt
+            WHERE account_id = :acc AND slot = :slot
+        """), {"amt": amount, "acc": account_id, "slot": SystemAccounts.random_slot()})
+
+    @staticmethod
+    def adjust_many(db, deltas: dict):
+        """adjust() for several accounts in one statement: {account_id: credit - debit}.
+
+        Returns the number of slots updated (one per account unless a slot is missing). Caller commits.
+        """
+        accounts = sorted(deltas)
+        return db.execute(text("""
+            UPDATE ledger.system_account_slots s
+            SET balance = s.balance + d.delta
+            FROM unnest(CAST(:accounts AS UUID[]), CAST(:deltas AS NUMERIC[]), CAST(:slots AS INT[]))
+                 AS d(account_id, delta, slot)
+            WHERE s.account_id = d.account_id AND s.slot = d.slot
+        """), {
+            "accounts": accounts,
+            "deltas": [deltas[acc] for acc in accounts],
+            "slots": [SystemAccounts.random_slot() for _ in accounts],
+        }).rowcount
+
+    @staticmethod
+    def roll_up(conn):
+        """Folds slot balances into the account's ledger.merchants row and zeroes the slots.
+
+        Accounts without a ledger.merchants row stay in their slots.
+        """
+        result = conn.execute(text("""
+            WITH drained AS (
+                UPDATE ledger.system_account_slots s
+                SET balance = 0
+                FROM (
+                    SELECT account_id, slot, balance
+                    FROM ledger.system_account_slots
+                    WHERE balance <> 0
+                      AND account_id IN (SELECT id FROM ledger.merchants)
+                    FOR UPDATE
+                ) old
+                WHERE s.account_id = old.account_id AND s.slot = old.slot
+                RETURNING old.account_id, old.balance
+            ),
+            totals AS (
+                SELECT account_id, SUM(balance) AS amount FROM drained GROUP BY account_id
+            )
+            UPDATE ledger.merchants m
+            SET balance = m.balance + t.amount
+            FROM totals t
+            WHERE m.id = t.account_id
+            RETURNING m.id, t.amount
+        """)).fetchall()
+        for row in result:
+            logger.info(f"Rolled up {row.amount} MWK into system account {row.id}")
+        return result
+
+
+if __name__ == "__main__":
+    # Periodic roll-up (cron): python -m app.services.system_accounts
+    logging.basicConfig(level=logging.INFO)
+    with get_engine("background").begin() as conn:
+        SystemAccounts.roll_up(conn)
@@ -0,0 +1,184 @@
+import json
+import asyncio
+import logging
+from decimal import Decimal
+from itertools import groupby
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.database import BackgroundSessionLocal
+from app.core.metrics import metrics
+from app.services.ledger_service import LedgerService, OPEN_STATUSES, AWAITING_CONFIRMATION
+from app.services.partitions import ACTIVE_TRANSACTIONS
+
+logger = logging.getLogger("KwachaPoint.WebhookInbox")
+
+class WebhookInbox:
+    """Append-only store of raw provider callbacks (ledger.webhook_inbox)."""
+
+    @staticmethod
+    def parse(provider: str, payload: dict):
+        """Normalizes a callback to (tx_id, succeeded, amount). amount is None when the DB amount applies."""
+        if provider == "bank":
+            amount = Decimal(payload.get("amount_cents", 0)) / 100
+            return payload.get("ext_ref"), payload.get("payment_status") == "COMPLETED", amount
+
+        tx = payload.get("transaction", {})
+        return tx.get("id"), tx.get("status") == "SUCCESS", None
+
+    @staticmethod
+    async def append(db: AsyncSession, provider: str, payload: dict):
+        await db.execute(text("""
+            INSERT INTO ledger.webhook_inbox (provider, payload)
+            VALUES (:provider, CAST(:payload AS JSONB))
+        """), {"provider": provider, "payload": json.dumps(payload)})
+        await db.commit()
+        metrics.inc("webhook_inbox_received_total", provider=provider)
+
+
+class WebhookInboxConsumer:
+    """Drains the inbox in batches, one DB transaction per batch.
+
+    The batch's successful payments are posted together through
+    LedgerService.post_successful_payments (LedgerPoster); failures, and a
+    batch whose posting fails, are applied one event at a time.
+    """
+
+    def __init__(self, batch_size: int = None, poll_interval: float = None):
+        self.batch_size = batch_size or settings.WEBHOOK_INBOX_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.WEBHOOK_INBOX_POLL_INTERVAL
+        self.backlog = {"depth": 0, "lag_seconds": 0.0}
+        self._stopping = False
+        metrics.gauge("webhook_inbox_backlog", lambda: dict(self.backlog))
+
+    def stop(self):
+        self._stopping = True
+
+    async def run_forever(self):
+        logger.info("Webhook inbox consumer started")
+        while not self._stopping:
+            try:
+                drained = await asyncio.to_thread(self.drain_once)
+            except Exception as e:
+                logger.error(f"Inbox consumer error: {e}")
+                drained = 0
+            if drained < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def drain_once(self) -> int:
+        with BackgroundSessionLocal() as db:
+            rows = db.execute(text("""
+                SELECT id, provider, payload, EXTRACT(EPOCH FROM NOW() - received_at) AS age
+                FROM ledger.webhook_inbox
+                WHERE processed_at IS NULL
+                ORDER BY id
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            """), {"limit": self.batch_size}).fetchall()
+
+            if rows:
+                self._process_batch(db, rows)
+                db.commit()
+                for row in rows:
+                    metrics.observe("webhook_inbox_lag_seconds", float(row.age), provider=row.provider)
+
+            self._measure_backlog(db)
+            return len(rows)
+
+    def _process_batch(self, db: Session, rows):
+        events = []
+        for row in rows:
+            tx_id, succeeded, amount = WebhookInbox.parse(row.provider, row.payload)
+            events.append({"inbox_id": row.id, "tx_id": tx_id, "succeeded": succeeded, "amount": amount})
+
+        # One lookup for the whole batch instead of one per callback
+        tx_ids = [e["tx_id"] for e in events if e["tx_id"]]
+        transactions = {
+            tx.id: tx for tx in db.execute(text(f"""
+                SELECT id, merchant_id, amount, status, provider FROM ledger.transactions
+                WHERE id = ANY(:ids) AND {ACTIVE_TRANSACTIONS}
+            """), {"ids": tx_ids}).fetchall()
+        } if tx_ids else {}
+
+        # 1. Classify in arrival order: the first callback for a transaction decides it
+        outcomes, successes, others, decided = [], [], [], set()
+        for event in events:
+            tx = transactions.get(event["tx_id"])
+            if tx is None:
+                outcomes.append((event["inbox_id"], "UNKNOWN_TRANSACTION"))
+            elif tx.status not in OPEN_STATUSES or tx.id in decided:
+                outcomes.append((event["inbox_id"], "ALREADY_PROCESSED"))
+            else:
+                decided.add(tx.id)
+                (successes if event["succeeded"] else others).append(event)
+
+        # 2. Successes are posted together: one status update, one LedgerPoster batch
+        try:
+            with db.begin_nested():
+                posted = LedgerService.post_successful_payments(db, [
+                    (event["tx_id"], self._amount(event, transactions[event["tx_id"]]), transactions[event["tx_id"]].provider)
+                    for event in successes
+                ])
+            outcomes += [
+                (event["inbox_id"], "SUCCESS_ACKNOWLEDGED" if event["tx_id"] in posted else "ALREADY_PROCESSED")
+                for event in successes
+            ]
+        except Exception as e:
+            # One bad payment fails the batch statement; post them one by one so only it is stamped ERROR
+            logger.warning(f"Batch posting of {len(successes)} payments failed ({e}); posting one by one")
+            others += successes
+
+        # 3. Failures, and the fallback: a savepoint each, grouped by merchant (stable
+        # order) so each merchant's balance row is locked in one consistent sequence
+        def merchant_key(event):
+            return str(transactions[event["tx_id"]].merchant_id)
+
+        for _, group in groupby(sorted(others, key=merchant_key), key=merchant_key):
+            for event in group:
+                outcomes.append((event["inbox_id"], self._apply(db, event, transactions[event["tx_id"]])))
+
+        db.execute(text("""
+            UPDATE ledger.webhook_inbox SET processed_at = NOW(), outcome = :outcome WHERE id = :id
+        """), [{"id": inbox_id, "outcome": outcome} for inbox_id, outcome in outcomes])
+
+    @staticmethod
+    def _amount(event: dict, tx) -> Decimal:
+        return event["amount"] if event["amount"] is not None else tx.amount
+
+    def _apply(self, db: Session, event: dict, tx) -> str:
+        if tx is None:
+            return "UNKNOWN_TRANSACTION"
+        if tx.status not in OPEN_STATUSES:
+            return "ALREADY_PROCESSED"
+
+        # Savepoint per event: one bad callback doesn't abort the batch
+        try:
+            with db.begin_nested():
+                if not event["succeeded"]:
+                    db.execute(text(
+                        f"UPDATE ledger.transactions SET status = 'FAILED' WHERE id = :id AND {AWAITING_CONFIRMATION} AND {ACTIVE_TRANSACTIONS}"
+                    ), {"id": tx.id})
+                    return "FAILED_ACKNOWLEDGED"
+
+                posted = LedgerService.post_successful_payment(db, tx.id, self._amount(event, tx), tx.provider)
+                return "SUCCESS_ACKNOWLEDGED" if posted else "ALREADY_PROCESSED"
+        except Exception as e:
+            # Stamped as ERROR rather than retried forever; requeue by clearing processed_at
+            logger.error(f"Inbox event {event['inbox_id']} failed: {e}")
+            return "ERROR"
+
+    def _measure_backlog(self, db: Session):
+        depth, lag = db.execute(text("""
+            SELECT COUNT(*), COALESCE(EXTRACT(EPOCH FROM NOW() - MIN(received_at)), 0)
+            FROM ledger.webhook_inbox
+            WHERE processed_at IS NULL
+        """)).fetchone()
+        self.backlog = {"depth": depth, "lag_seconds": float(lag)}
+
+
+if __name__ == "__main__":
+    # Standalone consumer process: python -m app.services.webhook_inbox
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(WebhookInboxConsumer().run_forever())
@@ -0,0 +1,37 @@
+document.getElementById('paymentForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const btn = document.getElementById('payBtn');
+    const loader = document.getElementById('loader');
+
+    // UI Feedback
+    btn.classList.add('hidden');
+    loader.classList.remove('hidden');
+
+    const payload = {
+        phone: document.getElementById('customer_phone').value,
+        provider: document.querySelector('input[name="provider"]:checked').value,
+        code: document.getElementById('short_code').value
+    };
+
+    try {
+        const response = await fetch('/v1/checkout/initiate-stk', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(payload)
+        });
+
+        if (response.ok) {
+            console.log("Push sent successfully");
+            // Optionally redirect or show success state here
+        } else {
+            // Reset UI if error occurs
+            btn.classList.remove('hidden');
+            loader.classList.add('hidden');
+            alert("System busy. Please try again.");
+        }
+    } catch (error) {
+        btn.classList.remove('hidden');
+        loader.classList.add('hidden');
+        console.error("Payment initiation failed", error);
+    }
+});
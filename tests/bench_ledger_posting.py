@@ -0,0 +1,91 @@
+"""Ledger posting throughput: six-statement path vs single-statement CTE.
+
+Run against a scratch database that has the ledger schema and at least one
+merchant row plus the revenue account in ledger.merchants:
+
+    DATABASE_URL=postgresql://... python -m tests.bench_ledger_posting 2000
+
+Everything runs inside one outer transaction that is rolled back at the end,
+so no test data is left behind.
+"""
+import sys
+import time
+import uuid
+from decimal import Decimal
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.services.ledger_service import LedgerService, FeeService
+
+REVENUE_ACC_ID = LedgerService.REVENUE_ACC_ID
+
+
+def legacy_record_successful_payment(db, transaction_id: str, amount: Decimal):
+    """The pre-CTE implementation: six round trips per posting."""
+    fees = FeeService.calculate_fees(amount)
+    db.execute(text("""
+        UPDATE ledger.transactions SET status = 'SUCCESS', completed_at = CURRENT_TIMESTAMP
+        WHERE id = :id AND status = 'PENDING'
+    """), {"id": transaction_id})
+    merchant_id = db.execute(text(
+        "SELECT merchant_id FROM ledger.transactions WHERE id = :id"
+    ), {"id": transaction_id}).fetchone().merchant_id
+    db.execute(text("UPDATE ledger.merchants SET balance = balance + :amt WHERE id = :m_id"),
+               {"amt": fees['merchant_credit'], "m_id": merchant_id})
+    db.execute(text("UPDATE ledger.merchants SET balance = balance + :amt WHERE id = :rev_id"),
+               {"amt": fees['our_commission'], "rev_id": REVENUE_ACC_ID})
+    db.execute(text("""
+        INSERT INTO ledger.ledger_entries (transaction_id, account_id, credit, debit)
+        VALUES (:tx_id, :acc_id, :amt, 0)
+    """), {"tx_id": transaction_id, "acc_id": merchant_id, "amt": fees['merchant_credit']})
+    db.execute(text("""
+        INSERT INTO ledger.ledger_entries (transaction_id, account_id, credit, debit)
+        VALUES (:tx_id, :acc_id, :amt, 0)
+    """), {"tx_id": transaction_id, "acc_id": REVENUE_ACC_ID, "amt": fees['our_commission']})
+    db.commit()
+
+
+def seed_pending(db, merchant_id, count: int):
+    ids = [f"BENCH-{uuid.uuid4().hex[:12].upper()}" for _ in range(count)]
+    db.execute(text("""
+        INSERT INTO ledger.transactions (id, merchant_id, amount, provider, status)
+        VALUES (:id, :mid, 1000, 'AIRTEL', 'PENDING')
+    """), [{"id": tx_id, "mid": merchant_id} for tx_id in ids])
+    db.commit()
+    return ids
+
+
+def bench(label: str, post, db, ids):
+    start = time.perf_counter()
+    for tx_id in ids:
+        post(db, tx_id, Decimal("1000"))
+    elapsed = time.perf_counter() - start
+    rate = len(ids) / elapsed
+    print(f"{label:<12} {len(ids)} postings in {elapsed:.2f}s -> {rate:,.0f} postings/sec")
+    return rate
+
+
+def run_benchmark(count: int = 1000):
+    with engine.connect() as conn:
+        outer = conn.begin()
+        # Service-level commits become savepoint releases inside the outer transaction
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            merchant_id = db.execute(text(
+                "SELECT id FROM ledger.merchants WHERE id <> :rev LIMIT 1"
+            ), {"rev": REVENUE_ACC_ID}).scalar()
+            if merchant_id is None:
+                print("Need at least one merchant row in ledger.merchants")
+                return
+
+            legacy = bench("six-stmt", legacy_record_successful_payment, db, seed_pending(db, merchant_id, count))
+            cte = bench("single-cte", LedgerService.record_successful_payment, db, seed_pending(db, merchant_id, count))
+            print(f"Speedup: {cte / legacy:.2f}x")
+        finally:
+            db.close()
+            outer.rollback()
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,70 @@
+"""Journal validation and payment journal balancing. Pure Python, no database needed:
+
+    python -m pytest tests/test_ledger_poster.py
+"""
+from decimal import Decimal
+
+import pytest
+
+from app.services.fee_schedule import FeeSchedule
+from app.services.ledger_poster import Journal, LedgerPoster, UnbalancedJournalError
+from app.services.ledger_service import LedgerService
+from app.services.system_accounts import SystemAccounts
+
+MERCHANT = "11111111-1111-1111-1111-111111111111"
+
+
+def test_balanced_journal_validates():
+    journal = Journal("KP-1").debit(SystemAccounts.PROVIDER_CLEARING, Decimal("100.00"))
+    journal.credit(MERCHANT, Decimal("97.15")).credit(SystemAccounts.REVENUE, Decimal("2.85"))
+    journal.validate()
+
+
+@pytest.mark.parametrize("journal, message", [
+    (Journal("KP-1"), "no lines"),
+    (Journal("KP-1").debit(MERCHANT, Decimal("10")).credit(SystemAccounts.REVENUE, Decimal("9.99")), "off by"),
+    (Journal("KP-1").debit(MERCHANT, Decimal("-5")).credit(SystemAccounts.REVENUE, Decimal("-5")), "negative"),
+    (Journal("KP-1").debit(MERCHANT, Decimal("0.00001")).credit(SystemAccounts.REVENUE, Decimal("0.00001")), "4 decimal"),
+])
+def test_invalid_journals_are_rejected(journal, message):
+    with pytest.raises(UnbalancedJournalError, match=message):
+        journal.validate()
+
+
+def test_line_cannot_both_debit_and_credit():
+    journal = Journal("KP-1").credit(SystemAccounts.REVENUE, Decimal("5"))
+    journal.debit(MERCHANT, Decimal("5")).lines[-1].credit = Decimal("1")
+    with pytest.raises(UnbalancedJournalError, match="both"):
+        journal.validate()
+
+
+def test_post_validates_the_whole_batch_before_writing():
+    class NoWrites:
+        def execute(self, *args, **kwargs):
+            raise AssertionError("nothing may be written for an invalid batch")
+
+    good = Journal("KP-1").debit(MERCHANT, Decimal("1")).credit(SystemAccounts.REVENUE, Decimal("1"))
+    bad = Journal("KP-2").debit(MERCHANT, Decimal("1"))
+    with pytest.raises(UnbalancedJournalError):
+        LedgerPoster.post(NoWrites(), [good, bad])
+
+
+@pytest.mark.parametrize("provider", ["AIRTEL", "TNM", "BANK_NBM", "BANK_STD", None, "unknown"])
+@pytest.mark.parametrize("amount", ["0.01", "1.00", "1234.57", "99999999.99"])
+def test_payment_journal_balances(provider, amount):
+    amount = Decimal(amount)
+    journal = LedgerService.payment_journal("KP-1", amount, provider)
+    journal.validate()
+
+    fees = FeeSchedule.for_amount(amount, provider)
+    deltas = LedgerPoster.balance_deltas([journal])
+    merchant_credit = sum(line.credit for line in journal.lines if line.account_id is None)
+    assert merchant_credit == fees["net"]
+    assert deltas.get(SystemAccounts.REVENUE, Decimal("0")) == fees["fee"]
+    assert deltas.get(SystemAccounts.PROVIDER_EXPENSE, Decimal("0")) == -fees["provider_cost"]
+    # No zero-amount lines (sub-cent fees round to nothing on small payments)
+    assert all(line.debit or line.credit for line in journal.lines)
+    # Clearing is debited the gross and credited back the provider's cut
+    assert deltas[SystemAccounts.PROVIDER_CLEARING] == -(amount - fees["provider_cost"])
+    # Everything the journal moves nets to zero across all accounts, merchant included
+    assert sum(deltas.values()) + merchant_credit == 0
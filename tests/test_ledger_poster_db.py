@@ -0,0 +1,117 @@
+"""LedgerPoster against Postgres: both entry-writing branches and the balance updates.
+
+Needs a scratch database with the ledger schema (as created by the app's
+startup) and at least one merchant row in ledger.merchants:
+
+    TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_ledger_poster_db.py
+
+Each test runs inside one outer transaction that is rolled back, so no test
+data is left behind. Skipped when TEST_DATABASE_URL is not set.
+"""
+import os
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services.fee_schedule import FeeSchedule
+from app.services.ledger_poster import Journal, LedgerPoster, UnknownAccountError
+from app.services.ledger_service import LedgerService
+from app.services.system_accounts import SystemAccounts
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+AMOUNT = Decimal("1000.00")
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        outer = conn.begin()
+        session = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            SystemAccounts.ensure_schema(conn)
+            yield session
+        finally:
+            session.close()
+            outer.rollback()
+    engine.dispose()
+
+
+@pytest.fixture
+def merchant_id(db):
+    merchant_id = db.execute(text(
+        "SELECT id FROM ledger.merchants WHERE NOT (id = ANY(CAST(:system AS UUID[]))) LIMIT 1"
+    ), {"system": list(SystemAccounts.SLOTTED)}).scalar()
+    if merchant_id is None:
+        pytest.skip("needs a merchant row in ledger.merchants")
+    return str(merchant_id)
+
+
+def seed_processing(db, merchant_id, count: int):
+    ids = [f"TEST-{uuid.uuid4().hex[:12].upper()}" for _ in range(count)]
+    db.execute(text("""
+        INSERT INTO ledger.transactions (id, merchant_id, amount, provider, status)
+        VALUES (:id, :mid, :amount, 'AIRTEL', 'PROCESSING')
+    """), [{"id": tx_id, "mid": merchant_id, "amount": AMOUNT} for tx_id in ids])
+    return ids
+
+
+def merchant_balance(db, merchant_id):
+    return db.execute(text("SELECT balance FROM ledger.merchants WHERE id = :id"), {"id": merchant_id}).scalar()
+
+
+def slot_total(db, account_id):
+    return db.execute(text(
+        "SELECT SUM(balance) FROM ledger.system_account_slots WHERE account_id = :id"
+    ), {"id": account_id}).scalar()
+
+
+@pytest.mark.parametrize("copy_threshold", [1_000_000, 1], ids=["insert", "copy"])
+def test_batch_posting_writes_entries_and_balances(db, merchant_id, monkeypatch, copy_threshold):
+    monkeypatch.setattr(settings, "LEDGER_COPY_THRESHOLD", copy_threshold)
+    ids = seed_processing(db, merchant_id, 3)
+    fees = FeeSchedule.for_amount(AMOUNT, "AIRTEL")
+    balance_before = merchant_balance(db, merchant_id)
+    revenue_before = slot_total(db, SystemAccounts.REVENUE)
+
+    posted = LedgerService.post_successful_payments(db, [(tx_id, AMOUNT, "AIRTEL") for tx_id in ids])
+
+    assert posted == set(ids)
+    entries = db.execute(text("""
+        SELECT transaction_id, SUM(credit) - SUM(debit) AS net, COUNT(*) AS lines
+        FROM ledger.ledger_entries WHERE transaction_id = ANY(:ids)
+        GROUP BY transaction_id
+    """), {"ids": ids}).fetchall()
+    expected_lines = len(LedgerService.payment_journal(ids[0], AMOUNT, "AIRTEL", merchant_id).lines)
+    assert {row.transaction_id for row in entries} == set(ids)
+    assert all(row.net == 0 and row.lines == expected_lines for row in entries)
+    assert merchant_balance(db, merchant_id) - balance_before == 3 * fees["net"]
+    assert slot_total(db, SystemAccounts.REVENUE) - revenue_before == 3 * fees["fee"]
+    statuses = db.execute(text(
+        "SELECT DISTINCT status FROM ledger.transactions WHERE id = ANY(:ids)"
+    ), {"ids": ids}).scalars().all()
+    assert statuses == ["SUCCESS"]
+
+
+def test_settled_payments_are_not_posted_twice(db, merchant_id):
+    ids = seed_processing(db, merchant_id, 2)
+    LedgerService.post_successful_payments(db, [(ids[0], AMOUNT, "AIRTEL")])
+    balance = merchant_balance(db, merchant_id)
+
+    posted = LedgerService.post_successful_payments(db, [(tx_id, AMOUNT, "AIRTEL") for tx_id in ids])
+
+    assert posted == {ids[1]}
+    assert merchant_balance(db, merchant_id) - balance == FeeSchedule.for_amount(AMOUNT, "AIRTEL")["net"]
+
+
+def test_unknown_account_raises(db, merchant_id):
+    [tx_id] = seed_processing(db, merchant_id, 1)
+    journal = Journal(tx_id).debit(SystemAccounts.PROVIDER_CLEARING, AMOUNT).credit(str(uuid.uuid4()), AMOUNT)
+    with pytest.raises(UnknownAccountError):
+        LedgerPoster.post(db, [journal])
@@ -0,0 +1,54 @@
+"""Stale-transaction sweep: which provider is asked about each row. No database needed:
+
+    python -m pytest tests/test_stale_sweep.py
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.services import reconciliation
+from app.services.provider_factory import integration_code
+from app.services.reconciliation import ReconciliationService
+
+Row = namedtuple("Row", "id provider amount created_at")
+
+
+class FakeBank:
+    PROVIDER_CODE = "BANK"
+    polled = []
+
+    async def get_transaction_status(self, tx_id):
+        FakeBank.polled.append(tx_id)
+        return "success"
+
+
+@pytest.mark.parametrize("provider, code", [
+    ("AIRTEL", "AIRTEL"), ("tnm", "TNM"), ("BANK_NBM", "BANK"), ("BANK_STD", "BANK"), (None, ""),
+])
+def test_integration_code(provider, code):
+    assert integration_code(provider) == code
+
+
+def test_bank_rows_are_checked_with_the_bank_integration(monkeypatch):
+    created = datetime.now(timezone.utc) - timedelta(hours=1)
+    rows = [Row("KP-BANK", "BANK_NBM", Decimal("500.00"), created), Row("KP-X", "PAYPAL", Decimal("1.00"), created)]
+    chunks = [rows, []]
+    applied = []
+
+    def apply_statuses(statuses, hard_cutoff):
+        applied.extend(statuses)
+        return {"recovered": 0, "failed": 0, "deferred": 0}
+
+    FakeBank.polled = []
+    monkeypatch.setattr(reconciliation, "PROVIDER_CLASSES", (FakeBank,))
+    service = ReconciliationService(None)
+    monkeypatch.setattr(service, "_stale_chunk", lambda cutoff, position: chunks.pop(0))
+    monkeypatch.setattr(service, "_apply_statuses", apply_statuses)
+
+    service.cleanup_stale_transactions()
+
+    assert FakeBank.polled == ["KP-BANK"]
+    # The bank's answer is applied; a provider without an integration still expires
+    assert applied == [(rows[0], "SUCCESS"), (rows[1], "PENDING")]